@@ -0,0 +1,436 @@
+"""Load test: concurrent engineer sessions against the DevUI server, ramped until the event loop saturates.
+
+Each simulated engineer opens a conversation and works through a North River scenario (SSH
+troubleshooting, policy lookup, VM status) turn by turn via /v1/responses, with think time between
+turns. Concurrency is ramped in stages; per stage the test reports throughput, turn latency and time to
+first token percentiles, errors, and the server's event-loop lag and CPU use.
+
+By default the server is started here as a subprocess (DevUI app with helper_agent, the scripted chat
+client and the in-memory Azure stand-in, plus an event-loop lag probe), so no credentials are needed.
+With --url the test runs against an already running server, for example the Docker image started with
+MCAT_CHAT_CLIENT=scripted and MCAT_AZURE_BACKEND=inmemory; loop lag is then estimated from /health latency.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --users 1,4,16,64 --stage-seconds 30 --think-ms 2000
+    python -m benchmarks.load_test --url http://localhost:8080 --no-stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+benchmark_dir = Path(__file__).resolve().parent
+repository_dir = benchmark_dir.parent
+default_plan = benchmark_dir / "plans" / "orchestration.json"
+lag_path = "/loadtest/lag"
+
+# Scenario's van een engineer: opeenvolgende vragen in één conversatie, met hun aandeel in de mix
+session_scenarios: Dict[str, Dict[str, Any]] = {
+    "ssh_troubleshooting": {
+        "weight": 3,
+        "turns": [
+            "Is VM-Authenticatie bereikbaar via SSH vanaf 203.0.113.10?",
+            "Welke regels heeft de NSG van VM-Authenticatie?",
+        ],
+    },
+    "policy_lookup": {"weight": 2, "turns": ["Wat zegt ons beleid over SSH toegang tot productie VMs?"]},
+    "vm_status": {"weight": 2, "turns": ["Wat is de status van VM-Authenticatie?"]},
+}
+
+
+def _percentile(samples: List[float], percent: int) -> Optional[float]:
+    if not samples:
+        return None
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+def _rounded(value: Optional[float], digits: int = 1) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+class LoopLagMonitor:
+    """Measure event-loop lag: how late a periodic timer fires, plus the process CPU time, since the last snapshot."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=100_000)
+        self._cpu_started = time.process_time()
+        self._wall_started = time.perf_counter()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(loop.time() - expected, 0.0) * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Lag percentiles and CPU use since the previous snapshot, then start a new window."""
+        samples = list(self._samples)
+        cpu, wall = time.process_time() - self._cpu_started, time.perf_counter() - self._wall_started
+        self._samples.clear()
+        self._cpu_started, self._wall_started = time.process_time(), time.perf_counter()
+        return {
+            "samples": len(samples),
+            "lag_p50_ms": _rounded(_percentile(samples, 50), 2),
+            "lag_p99_ms": _rounded(_percentile(samples, 99), 2),
+            "lag_max_ms": _rounded(max(samples), 2) if samples else None,
+            "cpu_share": round(cpu / wall, 3) if wall else None,
+        }
+
+
+def _server_environment(args: argparse.Namespace) -> Dict[str, str]:
+    """Offline server: scripted model and in-memory Azure with the requested latency, no caches or fast path."""
+    environment = {
+        "MCAT_CHAT_CLIENT": "scripted",
+        "MCAT_SCRIPTED_PLAN": args.plan,
+        "MCAT_AZURE_BACKEND": "inmemory",
+        "MCAT_INMEMORY_LATENCY_MS": str(args.azure_latency_ms),
+        "RESPONSE_CACHE_ENABLED": "0",
+        "FAST_PATH_ROUTER_ENABLED": "0",
+        "KNOWLEDGE_MIRROR_DIR": "",
+        "AI_SEARCH_PROJECT_CONNECTION_ID": os.environ.get("AI_SEARCH_PROJECT_CONNECTION_ID", "https://inmemory.search.windows.net"),
+        "AI_SEARCH_INDEX_NAME": os.environ.get("AI_SEARCH_INDEX_NAME", "north-river-knowledge"),
+    }
+    if args.first_token_ms is not None:
+        environment["MCAT_SCRIPTED_FIRST_TOKEN_MS"] = str(args.first_token_ms)
+    if args.token_latency_ms is not None:
+        environment["MCAT_SCRIPTED_TOKEN_LATENCY_MS"] = str(args.token_latency_ms)
+    return environment
+
+
+def serve(port: int) -> None:
+    """Run the DevUI app with helper_agent and a loop lag probe (the subprocess side of the load test)."""
+    import uvicorn
+    from agent_framework.devui import DevServer
+
+    from mcat_agents.agents import helper_agent
+
+    server = DevServer(port=port, host="127.0.0.1", ui_enabled=False)
+    server.register_entities([helper_agent])
+    app = server.get_app()
+    monitor = LoopLagMonitor()
+    app.add_api_route(lag_path, monitor.snapshot, methods=["GET"])
+
+    async def run() -> None:
+        probe = asyncio.create_task(monitor.run())
+        try:
+            config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+            await uvicorn.Server(config).serve()
+        finally:
+            probe.cancel()
+
+    asyncio.run(run())
+
+
+def _start_server(args: argparse.Namespace) -> subprocess.Popen:
+    environment = {**os.environ, **_server_environment(args)}
+    environment.pop("MCAT_RECORDING_DIR", None)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [str(repository_dir), environment.get("PYTHONPATH")]))
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--serve", str(args.port)],
+        cwd=repository_dir,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def _wait_until_ready(client: httpx.AsyncClient, server: Optional[subprocess.Popen], timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server gestopt met exit code {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("Server niet bereikbaar binnen de timeout")
+
+
+async def _entity_id(client: httpx.AsyncClient, entity: str) -> str:
+    response = await client.get("/v1/entities")
+    response.raise_for_status()
+    for info in response.json().get("entities", []):
+        if entity in (info.get("id"), info.get("name")):
+            return info["id"]
+    raise RuntimeError(f"Entity {entity} niet gevonden op de server")
+
+
+class StageResults:
+    """Turn and session outcomes of one ramp stage."""
+
+    def __init__(self) -> None:
+        self.turn_ms: List[float] = []
+        self.first_token_ms: List[float] = []
+        self.per_scenario: Dict[str, List[float]] = {name: [] for name in session_scenarios}
+        self.sessions = 0
+        self.errors: Dict[str, int] = {}
+        self.health_ms: List[float] = []
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+async def _turn(client: httpx.AsyncClient, body: Dict[str, Any], stream: bool, results: StageResults, scenario: str) -> bool:
+    """Send one turn and record its latency; False when the turn failed."""
+    started = time.perf_counter()
+    try:
+        if stream:
+            first_token: Optional[float] = None
+            failed = False
+            async with client.stream("POST", "/v1/responses", json={**body, "stream": True}) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    results.error(f"http_{response.status_code}")
+                    return False
+                async for line in response.aiter_lines():
+                    if first_token is None and "response.output_text.delta" in line:
+                        first_token = time.perf_counter()
+                    elif "response.failed" in line or '"type": "error"' in line:
+                        failed = True
+            if failed:
+                results.error("response_failed")
+                return False
+            if first_token is not None:
+                results.first_token_ms.append((first_token - started) * 1000)
+        else:
+            response = await client.post("/v1/responses", json=body)
+            if response.status_code != 200:
+                results.error(f"http_{response.status_code}")
+                return False
+            if response.json().get("status") == "failed":
+                results.error("response_failed")
+                return False
+    except httpx.HTTPError as e:
+        results.error(type(e).__name__)
+        return False
+    elapsed = (time.perf_counter() - started) * 1000
+    results.turn_ms.append(elapsed)
+    results.per_scenario[scenario].append(elapsed)
+    return True
+
+
+async def _engineer(
+    client: httpx.AsyncClient, entity_id: str, args: argparse.Namespace, deadline: float, results: StageResults, rng: random.Random
+) -> None:
+    """One simulated engineer: sessions back to back until the stage ends, with think time between turns."""
+    names = list(session_scenarios)
+    weights = [session_scenarios[name]["weight"] for name in names]
+    # Gespreide start, zodat niet alle engineers in dezelfde milliseconde beginnen
+    await asyncio.sleep(rng.uniform(0, args.think_ms / 1000))
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(names, weights)[0]
+        try:
+            created = await client.post("/v1/conversations", json={"metadata": {"agent_id": entity_id}})
+            created.raise_for_status()
+            conversation_id = created.json()["id"]
+        except (httpx.HTTPError, KeyError) as e:
+            results.error(f"conversation_{type(e).__name__}")
+            await asyncio.sleep(args.think_ms / 1000)
+            continue
+        results.sessions += 1
+        for question in session_scenarios[scenario]["turns"]:
+            body = {"metadata": {"entity_id": entity_id}, "input": question, "conversation": conversation_id}
+            if not await _turn(client, body, args.stream, results, scenario) or time.perf_counter() >= deadline:
+                break
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+
+async def _probe_health(client: httpx.AsyncClient, deadline: float, results: StageResults) -> None:
+    """Time /health while the stage runs: a trivial endpoint, so its latency is queueing on the server's loop."""
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            await client.get("/health")
+            results.health_ms.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError:
+            results.error("health")
+        await asyncio.sleep(0.1)
+
+
+async def _lag_snapshot(client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+    try:
+        response = await client.get(lag_path)
+    except httpx.HTTPError:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+async def run_stage(client: httpx.AsyncClient, entity_id: str, users: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run `users` engineers for one stage and summarise throughput, latency, errors and loop lag."""
+    results = StageResults()
+    await _lag_snapshot(client)
+    started = time.perf_counter()
+    deadline = started + args.stage_seconds
+    rng = random.Random(args.seed + users)
+    await asyncio.gather(
+        _probe_health(client, deadline, results),
+        *(_engineer(client, entity_id, args, deadline, results, random.Random(rng.random())) for _ in range(users)),
+    )
+    elapsed = time.perf_counter() - started
+    lag = await _lag_snapshot(client)
+
+    turns = len(results.turn_ms)
+    failed = sum(results.errors.values()) - results.errors.get("health", 0)
+    return {
+        "users": users,
+        "seconds": round(elapsed, 2),
+        "sessions": results.sessions,
+        "turns": turns,
+        "throughput_per_s": round(turns / elapsed, 3) if elapsed else 0.0,
+        "turn_p50_ms": _rounded(_percentile(results.turn_ms, 50)),
+        "turn_p95_ms": _rounded(_percentile(results.turn_ms, 95)),
+        "turn_p99_ms": _rounded(_percentile(results.turn_ms, 99)),
+        "first_token_p50_ms": _rounded(_percentile(results.first_token_ms, 50)),
+        "first_token_p95_ms": _rounded(_percentile(results.first_token_ms, 95)),
+        "scenario_p50_ms": {name: _rounded(_percentile(samples, 50)) for name, samples in results.per_scenario.items() if samples},
+        "error_rate": round(failed / (turns + failed), 4) if turns + failed else 0.0,
+        "errors": results.errors,
+        "health_p50_ms": _rounded(_percentile(results.health_ms, 50), 2),
+        "health_p99_ms": _rounded(_percentile(results.health_ms, 99), 2),
+        "loop": lag,
+    }
+
+
+def _saturation(stages: List[Dict[str, Any]], args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    """First stage where adding engineers stops paying off: throughput flat, loop lag or errors over the limit."""
+    for previous, stage in zip([None] + stages, stages):
+        loop = stage["loop"] or {}
+        lag_p99 = loop.get("lag_p99_ms") if loop else stage["health_p99_ms"]
+        reasons = []
+        if previous and stage["throughput_per_s"] < previous["throughput_per_s"] * (1 + args.min_gain):
+            reasons.append("throughput")
+        if lag_p99 is not None and lag_p99 > args.max_lag_ms:
+            reasons.append("loop_lag")
+        if stage["error_rate"] > args.max_error_rate:
+            reasons.append("errors")
+        if reasons:
+            return {"users": stage["users"], "reasons": reasons}
+    return None
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Ramp through the user stages against the server and collect the stage reports."""
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    server = _start_server(args) if not args.url else None
+    stages: List[Dict[str, Any]] = []
+    limits = httpx.Limits(max_connections=max(args.users) * 2 + 4, max_keepalive_connections=max(args.users) * 2 + 4)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+            await _wait_until_ready(client, server)
+            entity_id = await _entity_id(client, args.entity)
+            for users in args.users:
+                print(f"Stage met {users} engineers ({args.stage_seconds:g}s)...", file=sys.stderr)
+                stages.append(await run_stage(client, entity_id, users, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    return {
+        "python": sys.version.split()[0],
+        "url": url,
+        "managed_server": server is not None,
+        "stream": args.stream,
+        "think_ms": args.think_ms,
+        "latency": {
+            "first_token_ms": args.first_token_ms,
+            "token_latency_ms": args.token_latency_ms,
+            "azure_latency_ms": args.azure_latency_ms,
+        } if server is not None else None,
+        "stages": stages,
+        "saturation": _saturation(stages, args),
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    """Print the stage reports as a table."""
+    mode = "streaming" if report["stream"] else "sync"
+    print(f"Python {report['python']}, {report['url']}, {mode}, think time {report['think_ms']:g} ms\n")
+    print(
+        f"{'users':>5} {'turns':>6} {'turns/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'ttft p50':>9} "
+        f"{'errors':>7} {'lag p99':>8} {'lag max':>8} {'cpu':>6} {'health p99':>11}"
+    )
+
+    def cell(value: Any, width: int, fmt: str = ".1f") -> str:
+        return f"{value:{width}{fmt}}" if value is not None else f"{'-':>{width}}"
+
+    for stage in report["stages"]:
+        loop = stage["loop"] or {}
+        print(
+            f"{stage['users']:5d} {stage['turns']:6d} {stage['throughput_per_s']:8.2f} {cell(stage['turn_p50_ms'], 8)} "
+            f"{cell(stage['turn_p95_ms'], 8)} {cell(stage['turn_p99_ms'], 8)} {cell(stage['first_token_p50_ms'], 9)} "
+            f"{stage['error_rate']:7.1%} {cell(loop.get('lag_p99_ms'), 8)} {cell(loop.get('lag_max_ms'), 8)} "
+            f"{cell(loop.get('cpu_share'), 6, '.0%')} {cell(stage['health_p99_ms'], 11)}"
+        )
+    saturation = report["saturation"]
+    if saturation:
+        print(f"\nVerzadigd vanaf {saturation['users']} engineers ({', '.join(saturation['reasons'])})")
+    else:
+        print("\nGeen verzadiging binnen de ramp")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Run against this server instead of starting one (e.g. http://localhost:8080)")
+    parser.add_argument("--port", type=int, default=8091, help="Port for the server started by the load test")
+    parser.add_argument("--entity", default="helper_agent", help="Entity (id or name) the engineers talk to")
+    parser.add_argument("--users", default="1,2,4,8,16,32", help="Concurrent engineers per ramp stage, comma separated")
+    parser.add_argument("--stage-seconds", type=float, default=20.0, help="Duration of each ramp stage")
+    parser.add_argument("--think-ms", type=float, default=1000.0, help="Mean think time between turns of an engineer")
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="Use non-streaming responses")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout per request in seconds")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the scenario mix and think times")
+    parser.add_argument("--plan", default=str(default_plan), help="Scripted plan (JSON) or recordings (.jsonl glob) for the started server")
+    parser.add_argument("--first-token-ms", type=float, help="Simulated time to first token (default: from the plan)")
+    parser.add_argument("--token-latency-ms", type=float, help="Simulated time per output token (default: from the plan)")
+    parser.add_argument("--azure-latency-ms", type=float, default=25.0, help="Simulated round-trip per Azure call")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Throughput gain per stage below which the server counts as saturated")
+    parser.add_argument("--max-lag-ms", type=float, default=100.0, help="Loop lag p99 above which the server counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate above which the server counts as saturated")
+    parser.add_argument("--json", dest="json_path", help="Write the full report as JSON to this file ('-' for stdout)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return 0
+
+    args.users = [int(users) for users in args.users.split(",") if users.strip()]
+    try:
+        report = asyncio.run(run_load_test(args))
+    except RuntimeError as e:
+        print(f"Fout bij load test: {e}", file=sys.stderr)
+        return 1
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(report)
+        if args.json_path:
+            Path(args.json_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
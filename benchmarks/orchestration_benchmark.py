@@ -0,0 +1,223 @@
+"""Orchestration benchmark: helper → sub-agent → tool dispatch, fan-out, approvals and thread serialisation, offline.
+
+The chat client is the scripted stand-in (MCAT_CHAT_CLIENT=scripted) following a plan of tool calls
+with simulated model latency, and Azure is the in-memory stand-in (MCAT_AZURE_BACKEND=inmemory).
+Every scenario runs twice: with the configured model and Azure latency (end-to-end time), and with
+all simulated latency at zero (what is left is framework and tool-layer overhead). Model time and
+Azure wait are summed over all calls, so with fan-out they can exceed the wall-clock time.
+
+Run from the repository root:
+
+    python -m benchmarks.orchestration_benchmark
+    python -m benchmarks.orchestration_benchmark --token-latency-ms 30 --azure-latency-ms 40 --iterations 20
+    python -m benchmarks.orchestration_benchmark --plan "recordings/*.jsonl*" --scenario delegation
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+benchmark_dir = Path(__file__).resolve().parent
+default_plan = benchmark_dir / "plans" / "orchestration.json"
+
+# Vragen van de scenario's; ze moeten passen bij de `match` van de helper scripts in het plan
+delegation_question = "Is VM-Authenticatie bereikbaar via SSH vanaf 203.0.113.10?"
+fan_out_question = "Geef een overzicht van VM-Authenticatie: beleid, NSG regels en status."
+approval_task = "Start VM-Rapportage"
+
+
+def _environment(plan: str) -> Dict[str, str]:
+    """Offline environment: scripted model, in-memory Azure, and no caches or fast path that would skip the model."""
+    return {
+        "MCAT_CHAT_CLIENT": "scripted",
+        "MCAT_SCRIPTED_PLAN": plan,
+        "MCAT_AZURE_BACKEND": "inmemory",
+        "RESPONSE_CACHE_ENABLED": "0",
+        "FAST_PATH_ROUTER_ENABLED": "0",
+        "KNOWLEDGE_MIRROR_DIR": "",
+        "AI_SEARCH_PROJECT_CONNECTION_ID": os.environ.get("AI_SEARCH_PROJECT_CONNECTION_ID", "https://inmemory.search.windows.net"),
+        "AI_SEARCH_INDEX_NAME": os.environ.get("AI_SEARCH_INDEX_NAME", "north-river-knowledge"),
+    }
+
+
+async def _delegation(agents: Dict[str, Any], thread: Any) -> None:
+    await agents["helper_agent"].run(delegation_question, thread=thread)
+
+
+async def _fan_out(agents: Dict[str, Any], thread: Any) -> None:
+    await agents["helper_agent"].run(fan_out_question, thread=thread)
+
+
+async def _streaming(agents: Dict[str, Any], thread: Any) -> None:
+    async for _ in agents["helper_agent"].run_stream(delegation_question, thread=thread):
+        pass
+
+
+async def _approval(agents: Dict[str, Any], thread: Any) -> None:
+    from agent_framework import ChatMessage, Role
+
+    agent = agents["resource_agent"]
+    response = await agent.run(approval_task, thread=thread)
+    if not response.user_input_requests:
+        raise RuntimeError("resource_agent vroeg geen approval voor start_vm")
+    approvals = [request.create_response(True) for request in response.user_input_requests]
+    await agent.run(ChatMessage(role=Role.USER, contents=approvals), thread=thread)
+
+
+scenarios: Dict[str, Dict[str, Any]] = {
+    "delegation": {"agent": "helper_agent", "run": _delegation},
+    "fan_out": {"agent": "helper_agent", "run": _fan_out},
+    "streaming": {"agent": "helper_agent", "run": _streaming},
+    "approval": {"agent": "resource_agent", "run": _approval},
+}
+
+
+async def _measure(
+    run: Callable[[Dict[str, Any], Any], Awaitable[None]],
+    agents: Dict[str, Any],
+    agent: Any,
+    client: Any,
+    iterations: int,
+) -> Dict[str, List[float]]:
+    """Run a scenario on fresh threads; per iteration the wall time, model time, Azure calls and serialisation time."""
+    from mcat_agents.tools import inmemory_azure
+
+    samples: Dict[str, List[float]] = {
+        "total_ms": [], "model_ms": [], "serialize_ms": [], "azure_calls": [], "llm_calls": [], "unscripted": [],
+        "input_tokens": [], "cached_tokens": [],
+    }
+    for _ in range(iterations):
+        thread = agent.get_new_thread()
+        client.reset_stats()
+        with inmemory_azure.measure_calls() as calls:
+            started = time.perf_counter()
+            await run(agents, thread)
+            # DevUI bewaart de conversatie na elke beurt; dat hoort bij de kosten van een beurt
+            serialize_started = time.perf_counter()
+            await thread.serialize()
+            finished = time.perf_counter()
+        samples["total_ms"].append((finished - started) * 1000)
+        samples["serialize_ms"].append((finished - serialize_started) * 1000)
+        samples["model_ms"].append(client.stats["model_seconds"] * 1000)
+        samples["azure_calls"].append(sum(calls.values()))
+        samples["llm_calls"].append(client.stats["calls"])
+        samples["unscripted"].append(client.stats["unscripted"])
+        samples["input_tokens"].append(client.stats["input_tokens"])
+        samples["cached_tokens"].append(client.stats["cached_tokens"])
+    return samples
+
+
+def _percentile(samples: List[float], percent: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected scenarios with and without simulated latency and split the time per scenario."""
+    from mcat_agents import agents as agent_package
+    from mcat_agents.agents.client import get_chat_client
+    from mcat_agents.tools import inmemory_azure
+
+    agents = {name: getattr(agent_package, name) for name in ("helper_agent", "resource_agent")}
+    client = get_chat_client()
+    backend = inmemory_azure.backend()
+    latency = {
+        "first_token_ms": args.first_token_ms if args.first_token_ms is not None else client.first_token_ms,
+        "token_latency_ms": args.token_latency_ms if args.token_latency_ms is not None else client.token_latency_ms,
+        "azure_latency_ms": args.azure_latency_ms,
+    }
+
+    def set_latency(first_token: float, per_token: float, azure: float) -> None:
+        client.first_token_ms, client.token_latency_ms = first_token, per_token
+        backend.latency_ms = azure
+
+    report: Dict[str, Any] = {"python": sys.version.split()[0], "iterations": args.iterations, "latency": latency, "scenarios": {}}
+    for name in args.scenario or list(scenarios):
+        scenario = scenarios[name]
+        agent = agents[scenario["agent"]]
+        inmemory_azure.configure()
+
+        # Zonder gesimuleerde latency: warmup, daarna de overhead van framework en tool laag
+        set_latency(0, 0, 0)
+        await _measure(scenario["run"], agents, agent, client, args.warmup)
+        bare = await _measure(scenario["run"], agents, agent, client, args.iterations)
+
+        set_latency(latency["first_token_ms"], latency["token_latency_ms"], latency["azure_latency_ms"])
+        timed = await _measure(scenario["run"], agents, agent, client, args.iterations)
+
+        total_p50 = _percentile(timed["total_ms"], 50)
+        overhead_p50 = _percentile(bare["total_ms"], 50)
+        model_ms = statistics.fmean(timed["model_ms"])
+        input_tokens = statistics.fmean(timed["input_tokens"])
+        report["scenarios"][name] = {
+            "llm_calls": statistics.fmean(timed["llm_calls"]),
+            "azure_calls": statistics.fmean(timed["azure_calls"]),
+            "total_p50_ms": round(total_p50, 2),
+            "total_p95_ms": round(_percentile(timed["total_ms"], 95), 2),
+            "model_ms": round(model_ms, 2),
+            "azure_wait_ms": round(statistics.fmean(timed["azure_calls"]) * latency["azure_latency_ms"], 2),
+            "overhead_p50_ms": round(overhead_p50, 2),
+            "overhead_p95_ms": round(_percentile(bare["total_ms"], 95), 2),
+            "serialize_p50_ms": round(_percentile(bare["serialize_ms"], 50), 3),
+            "overhead_share": round(overhead_p50 / total_p50, 4) if total_p50 else None,
+            "input_tokens": round(input_tokens, 1),
+            "cache_hit_rate": round(statistics.fmean(timed["cached_tokens"]) / input_tokens, 4) if input_tokens else None,
+            "unscripted_steps": int(sum(bare["unscripted"]) + sum(timed["unscripted"])),
+        }
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    """Print the report as a table."""
+    latency = ", ".join(f"{k}={v}" for k, v in report["latency"].items())
+    print(f"Python {report['python']}, {report['iterations']} iteraties, {latency}\n")
+    print(f"{'scenario':12} {'llm':>5} {'azure':>6} {'total p50':>10} {'p95':>9} {'model':>9} {'azure wait':>11} {'overhead':>9} {'share':>7} {'serialize':>10} {'prompt':>8} {'cached':>7}")
+    for name, result in report["scenarios"].items():
+        print(
+            f"{name:12} {result['llm_calls']:5.1f} {result['azure_calls']:6.1f} {result['total_p50_ms']:10.1f} "
+            f"{result['total_p95_ms']:9.1f} {result['model_ms']:9.1f} {result['azure_wait_ms']:11.1f} "
+            f"{result['overhead_p50_ms']:9.2f} {result['overhead_share'] or 0:7.1%} {result['serialize_p50_ms']:10.3f} "
+            f"{result['input_tokens']:8.0f} {result['cache_hit_rate'] or 0:7.1%}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plan", default=str(default_plan), help="Scripted plan (JSON) or recordings (.jsonl glob) to follow")
+    parser.add_argument("--scenario", action="append", choices=list(scenarios), help="Only run this scenario (repeatable)")
+    parser.add_argument("--iterations", type=int, default=10, help="Measured runs per scenario and pass")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured runs per scenario")
+    parser.add_argument("--first-token-ms", type=float, help="Simulated time to first token (default: from the plan)")
+    parser.add_argument("--token-latency-ms", type=float, help="Simulated time per output token (default: from the plan)")
+    parser.add_argument("--azure-latency-ms", type=float, default=25.0, help="Simulated round-trip per Azure call")
+    parser.add_argument("--json", dest="json_path", help="Write the full report as JSON to this file ('-' for stdout)")
+    args = parser.parse_args()
+
+    # Vóór het laden van de agents: de client en de Azure clients worden bij de eerste import gekozen
+    os.environ.update(_environment(args.plan))
+    os.environ.pop("MCAT_RECORDING_DIR", None)
+
+    report = asyncio.run(run_benchmarks(args))
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(report)
+        if args.json_path:
+            Path(args.json_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    unscripted = [name for name, result in report["scenarios"].items() if result["unscripted_steps"]]
+    if unscripted:
+        print(f"\nStappen buiten het plan in: {', '.join(unscripted)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
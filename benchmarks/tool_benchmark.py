@@ -0,0 +1,379 @@
+"""Tool benchmark: latency, Azure calls and allocations per tool, against the in-memory Azure stand-in.
+
+Every @ai_function in cloud_resources, network_functions, ai_search and blob_storage is invoked the way
+the agents invoke it (argument validation included). Azure is replaced by mcat_agents.tools.inmemory_azure
+with a configurable scale and per-call latency, so runs are deterministic and need no credentials.
+
+Run from the repository root:
+
+    python -m benchmarks.tool_benchmark
+    python -m benchmarks.tool_benchmark --vms 200 --rules-per-nsg 100 --document-bytes 1048576
+    python -m benchmarks.tool_benchmark --update-baseline
+
+A run fails (exit code 1) when a tool makes more Azure calls, raises more errors or allocates more than
+the stored baseline (within the tolerance), or when a tool has no benchmark case. Latency depends on the
+machine, so it is only compared with --latency-tolerance, for a baseline recorded on the same machine:
+
+    python -m benchmarks.tool_benchmark --latency-tolerance 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Nooit echte Azure aanroepen: de stand-in moet gekozen zijn voordat azure_clients geïmporteerd wordt
+os.environ.update({
+    "MCAT_AZURE_BACKEND": "inmemory",
+    "KNOWLEDGE_MIRROR_DIR": "",
+    "KNOWLEDGE_INDEX_PUSH_DEBOUNCE": "0",
+})
+os.environ.setdefault("AI_SEARCH_PROJECT_CONNECTION_ID", "https://inmemory.search.windows.net")
+os.environ.setdefault("AI_SEARCH_INDEX_NAME", "north-river-knowledge")
+
+from agent_framework import AIFunction  # noqa: E402
+
+from mcat_agents.tools import inmemory_azure  # noqa: E402
+from mcat_agents.tools.knowledge import ai_search, blob_storage  # noqa: E402
+from mcat_agents.tools.network import network_functions  # noqa: E402
+from mcat_agents.tools.resource import cloud_resources  # noqa: E402
+
+benchmark_dir = Path(__file__).resolve().parent
+default_baseline = benchmark_dir / "baseline.json"
+tool_modules = [cloud_resources, network_functions, ai_search, blob_storage]
+
+# Een case: argumenten per iteratie, en optioneel voorbereiding buiten de meting (bijv. een blob om te verwijderen)
+Case = Dict[str, Callable[[int], Any]]
+
+
+def _cases(backend: inmemory_azure.InMemoryAzure) -> Dict[str, Case]:
+    """Benchmark case per tool name, with arguments that exercise the tool's main path at the configured scale."""
+    vms = backend.vm_names
+    nsgs = backend.nsg_names
+    blobs = backend.blob_names
+
+    def vm(i: int) -> str:
+        return vms[i % len(vms)]
+
+    def nsg(i: int) -> str:
+        return nsgs[i % len(nsgs)]
+
+    def blob_url(i: int) -> str:
+        return blob_storage._blob_url(blobs[i % len(blobs)])
+
+    def scratch_blob(i: int) -> str:
+        return f"Benchmark/scratch-{i:05d}.txt"
+
+    return {
+        # cloud_resources
+        "list_resource_groups": {"args": lambda i: {}},
+        "get_resources_in_resource_group": {"args": lambda i: {}},
+        "list_vms_in_resource_group": {"args": lambda i: {}},
+        "get_vm_status": {"args": lambda i: {"vm_name": vm(i)}},
+        "get_vm_network_info": {"args": lambda i: {"vm_name": vm(i)}},
+        "get_nsg_info": {"args": lambda i: {"nsg_name": nsg(i)}},
+        "list_nsgs": {"args": lambda i: {}},
+        "start_vm": {"args": lambda i: {"vm_name": vm(i)}},
+        "stop_vm": {"args": lambda i: {"vm_name": vm(i)}},
+        # network_functions
+        "list_nsgs_in_resource_group": {"args": lambda i: {}},
+        "get_nsg_rules": {"args": lambda i: {"nsg_name": nsg(i)}},
+        "list_vm_nsg_associations": {"args": lambda i: {"vm_name": vm(i)}},
+        "check_nsg_port_allow": {"args": lambda i: {"nsg_name": nsg(i), "port": 22, "source_ip": "203.0.113.10"}},
+        "check_vm_port_access": {"args": lambda i: {"vm_name": vm(i), "port": 443, "source_ip": "203.0.113.10"}},
+        "diagnose_vm_access": {"args": lambda i: {"vm_name": vm(i), "port": 22, "source_ip": "203.0.113.10"}},
+        "add_nsg_rule": {"args": lambda i: {
+            "nsg_name": nsg(i),
+            "rule_name": "benchmark-allow-https",
+            "priority": 4000,
+            "direction": "Inbound",
+            "access": "Allow",
+            "protocol": "Tcp",
+            "destination_ports": [443],
+            "source_prefixes": ["198.51.100.0/24"],
+        }},
+        "remove_nsg_rule": {"args": lambda i: {"nsg_name": nsg(i), "rule_name": "benchmark-allow-https"}},
+        # ai_search
+        "search_knowledge_base": {"args": lambda i: {"keyword": "firewall"}},
+        "search_knowledge_base_detailed": {"args": lambda i: {"keyword": "beleid poort 22", "top": 5}},
+        "get_document_by_title": {"args": lambda i: {"title": blobs[i % len(blobs)]}},
+        # blob_storage
+        "read_blob_file": {"args": lambda i: {"blob_url": blob_url(i)}},
+        "read_blob_range": {"args": lambda i: {"blob_url": blob_url(i), "offset": 1024, "length": 4096}},
+        "read_blob_lines": {"args": lambda i: {"blob_url": blob_url(i), "start_line": 40, "num_lines": 20}},
+        "replace_blob_file_content": {"args": lambda i: {"blob_url": blob_url(i), "new_content": f"Vervangen in iteratie {i}\n"}},
+        "append_to_blob_file": {"args": lambda i: {"blob_url": blob_url(i), "text_to_append": f"Aanvulling {i}\n"}},
+        "create_blob_file": {"args": lambda i: {"blob_path": scratch_blob(i), "content": f"Nieuw document {i}\n"}},
+        "list_blobs_in_container": {"args": lambda i: {"prefix": ""}},
+        "delete_blob_file": {
+            "setup": lambda i: backend.put_blob(scratch_blob(i), f"Te verwijderen {i}\n"),
+            "args": lambda i: {"blob_url": blob_storage._blob_url(scratch_blob(i))},
+        },
+    }
+
+
+def discover_tools() -> Dict[str, Any]:
+    """All @ai_function tools of the benchmarked modules, by tool name."""
+    tools: Dict[str, Any] = {}
+    for module in tool_modules:
+        for value in vars(module).values():
+            if isinstance(value, AIFunction):
+                tools[value.name] = (module.__name__.rsplit(".", 1)[-1], value)
+    return tools
+
+
+def _failed(result: Any) -> bool:
+    """Tools report failures as {"error": ...} (or a list holding one) instead of raising."""
+    if isinstance(result, list) and result:
+        result = result[0]
+    return isinstance(result, dict) and "error" in result
+
+
+def _percentile(samples: List[float], percent: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+async def _invoke(tool: Any, arguments: Dict[str, Any]) -> Any:
+    """Invoke a tool like the function-invocation loop does: validated arguments through AIFunction.invoke."""
+    return await tool.invoke(arguments=tool.input_model(**arguments))
+
+
+async def benchmark_tool(
+    tool: Any,
+    case: Case,
+    iterations: int,
+    warmup: int,
+    allocation_iterations: int,
+) -> Dict[str, Any]:
+    """Time a tool, count its Azure calls per invocation and measure its allocations."""
+    setup = case.get("setup")
+    samples: List[float] = []
+    calls_per_invocation: List[int] = []
+    operations: Dict[str, int] = {}
+    errors = 0
+    last_error: Optional[str] = None
+
+    for i in range(warmup + iterations):
+        if setup:
+            setup(i)
+        arguments = case["args"](i)
+        with inmemory_azure.measure_calls() as calls:
+            started = time.perf_counter()
+            result = await _invoke(tool, arguments)
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        samples.append(elapsed * 1000)
+        calls_per_invocation.append(sum(calls.values()))
+        for operation, count in calls.items():
+            operations[operation] = operations.get(operation, 0) + count
+        if _failed(result):
+            errors += 1
+            last_error = str(result if isinstance(result, dict) else result[0])[:200]
+
+    # Allocaties apart meten: tracemalloc vertraagt alles en zou de latency vertekenen
+    peaks: List[int] = []
+    retained: List[int] = []
+    tracemalloc.start()
+    try:
+        for i in range(allocation_iterations):
+            index = warmup + iterations + i
+            if setup:
+                setup(index)
+            arguments = case["args"](index)
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await _invoke(tool, arguments)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "invocations": iterations,
+        "errors": errors,
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p95_ms": round(_percentile(samples, 95), 3),
+        "p99_ms": round(_percentile(samples, 99), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "azure_calls_per_invocation": round(statistics.fmean(calls_per_invocation), 2),
+        "azure_operations": {op: round(count / iterations, 2) for op, count in sorted(operations.items())},
+        "peak_alloc_kib": round(statistics.median(peaks) / 1024, 1) if peaks else None,
+        "retained_kib": round(statistics.median(retained) / 1024, 1) if retained else None,
+    }
+    if last_error:
+        result["last_error"] = last_error
+    return result
+
+
+async def run_benchmarks(
+    scale: Dict[str, Any],
+    iterations: int,
+    warmup: int,
+    allocation_iterations: int,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Benchmark every discovered tool (or the selected ones), each from a freshly generated backend."""
+    tools = discover_tools()
+    backend = inmemory_azure.configure(**scale)
+    cases = _cases(backend)
+
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "scale": dict(backend.scale, latency_ms=backend.latency_ms),
+        "iterations": iterations,
+        "warmup": warmup,
+        "tools": {},
+        "missing_cases": sorted(set(tools) - set(cases)),
+    }
+    for name, (module, tool) in sorted(tools.items(), key=lambda item: (item[1][0], item[0])):
+        if name not in cases or (only and not any(o in name for o in only)):
+            continue
+        # Elke tool begint bij dezelfde toestand, ook na schrijvende tools
+        inmemory_azure.configure(**scale)
+        result = await benchmark_tool(tool, cases[name], iterations, warmup, allocation_iterations)
+        report["tools"][name] = dict(module=module, **result)
+    blob_storage.index_sync_queue.flush(timeout=10)
+    return report
+
+
+def compare_to_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    latency_tolerance: Optional[float],
+    latency_slack_ms: float,
+    allocation_tolerance: float,
+) -> List[str]:
+    """List regressions of a report against a baseline recorded with the same scale and iteration counts.
+
+    p50/p95 are only compared when a latency tolerance is given: absolute timings from another machine say nothing.
+    """
+    # Cache effecten (bijv. de regelindex van blobs) hangen af van het aantal iteraties, dus die moeten ook gelijk zijn
+    for key in ("scale", "iterations", "warmup"):
+        if baseline.get(key) != report[key]:
+            return [f"baseline is opgenomen met {key} {baseline.get(key)}, deze run met {report[key]}"]
+
+    regressions: List[str] = []
+    for name, current in report["tools"].items():
+        previous = baseline.get("tools", {}).get(name)
+        if previous is None:
+            continue
+        if current["azure_calls_per_invocation"] > previous["azure_calls_per_invocation"]:
+            regressions.append(
+                f"{name}: {current['azure_calls_per_invocation']} Azure calls per aanroep (baseline {previous['azure_calls_per_invocation']})"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: {current['errors']} fouten (baseline {previous['errors']}): {current.get('last_error')}")
+        for key in ("p50_ms", "p95_ms") if latency_tolerance is not None else ():
+            limit = previous[key] * (1 + latency_tolerance) + latency_slack_ms
+            if current[key] > limit:
+                regressions.append(f"{name}: {key} {current[key]:.3f} > {limit:.3f} (baseline {previous[key]:.3f})")
+        if previous.get("peak_alloc_kib") is not None and current.get("peak_alloc_kib") is not None:
+            limit = previous["peak_alloc_kib"] * (1 + allocation_tolerance) + 16
+            if current["peak_alloc_kib"] > limit:
+                regressions.append(
+                    f"{name}: piek allocatie {current['peak_alloc_kib']} KiB > {limit:.1f} KiB (baseline {previous['peak_alloc_kib']})"
+                )
+    return regressions
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    """Print the report as a table."""
+    scale = ", ".join(f"{k}={v}" for k, v in report["scale"].items())
+    print(f"Python {report['python']}, {report['iterations']} iteraties, {scale}\n")
+    print(f"{'tool':34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls':>7} {'peak KiB':>9} {'errors':>7}")
+    module = None
+    for name, result in report["tools"].items():
+        if result["module"] != module:
+            module = result["module"]
+            print(f"-- {module}")
+        print(
+            f"{name:34} {result['p50_ms']:9.3f} {result['p95_ms']:9.3f} {result['p99_ms']:9.3f} "
+            f"{result['azure_calls_per_invocation']:7.2f} {result['peak_alloc_kib'] or 0:9.1f} {result['errors']:7d}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vms", type=int, default=5, help="Number of VMs (each with its own NSG)")
+    parser.add_argument("--nics-per-vm", type=int, default=1, help="Network interfaces per VM")
+    parser.add_argument("--rules-per-nsg", type=int, default=20, help="Custom security rules per NSG")
+    parser.add_argument("--blobs", type=int, default=50, help="Documents in the knowledge container and search index")
+    parser.add_argument("--document-bytes", type=int, default=16384, help="Size of each generated document")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Simulated round-trip per Azure call")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed invocations per tool")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed invocations per tool before measuring")
+    parser.add_argument("--alloc-iterations", type=int, default=5, help="Invocations per tool measured with tracemalloc")
+    parser.add_argument("--tool", action="append", help="Only benchmark tools whose name contains this (repeatable)")
+    parser.add_argument("--json", dest="json_path", help="Write the full report as JSON to this file ('-' for stdout)")
+    parser.add_argument("--baseline", default=str(default_baseline), help="Baseline to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline instead of comparing")
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        help="Also fail on a relative p50/p95 increase over the baseline above this (only for a baseline from the same machine)",
+    )
+    parser.add_argument("--latency-slack-ms", type=float, default=1.0, help="Allowed absolute p50/p95 increase on top of the tolerance")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.25, help="Allowed relative peak allocation increase")
+    args = parser.parse_args()
+
+    scale = {
+        "vms": args.vms,
+        "nics_per_vm": args.nics_per_vm,
+        "rules_per_nsg": args.rules_per_nsg,
+        "blobs": args.blobs,
+        "document_bytes": args.document_bytes,
+        "latency_ms": args.latency_ms,
+    }
+    report = asyncio.run(run_benchmarks(scale, args.iterations, args.warmup, args.alloc_iterations, args.tool))
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(report)
+        if args.json_path:
+            Path(args.json_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if report["missing_cases"]:
+        print(f"\nGeen benchmark case voor: {', '.join(report['missing_cases'])}", file=sys.stderr)
+        return 1
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        if args.tool:
+            print("\n--update-baseline kan niet samen met --tool", file=sys.stderr)
+            return 2
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline opgeslagen in {baseline_path}", file=sys.stderr)
+        return 0
+    if not baseline_path.exists():
+        print(f"\nGeen baseline in {baseline_path}; opslaan met --update-baseline", file=sys.stderr)
+        return 0
+
+    regressions = compare_to_baseline(
+        report,
+        json.loads(baseline_path.read_text(encoding="utf-8")),
+        args.latency_tolerance,
+        args.latency_slack_ms,
+        args.alloc_tolerance,
+    )
+    if regressions:
+        print(f"\nRegressies ten opzichte van {baseline_path}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+    print(f"\nGeen regressies ten opzichte van {baseline_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
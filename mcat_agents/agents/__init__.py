@@ -1,7 +1,12 @@
-from .knowledge_agent import knowledge_agent
-from .network_agent import network_agent
-from .resource_agent import resource_agent
-from .helper_agent import helper_agent
+import sys
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .helper_agent import helper_agent
+    from .knowledge_agent import knowledge_agent
+    from .network_agent import network_agent
+    from .resource_agent import resource_agent
 
 __all__ = [
     "knowledge_agent",
@@ -9,3 +14,16 @@ __all__ = [
     "resource_agent",
     "helper_agent",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import an agent module (and with it its tools and SDKs) only when the agent is first accessed."""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import_module(f".{name}", __name__)
+    # Het importeren van een submodule zet het module object als attribuut; vervang dat door de agent
+    for agent_name in __all__:
+        module = sys.modules.get(f"{__name__}.{agent_name}")
+        if module is not None and hasattr(module, agent_name):
+            globals()[agent_name] = getattr(module, agent_name)
+    return globals()[name]
@@ -1,15 +1,47 @@
 import os
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.identity import DefaultAzureCredential
+from functools import lru_cache
+from typing import Any
+
 from dotenv import load_dotenv
 
+from ..credentials import cognitive_services_scope, shared_credential, warm_up
+
 load_dotenv()
 
-credential = DefaultAzureCredential()
+# "azure" (standaard), "replay": antwoorden uit opgenomen sessies (zie mcat_agents/replay.py),
+# of "scripted": een plan van tool calls en antwoorden met gesimuleerde latency (zie scripted_client.py)
+chat_client_kind = os.getenv("MCAT_CHAT_CLIENT", "azure").lower()
+
+
+@lru_cache(maxsize=1)
+def get_chat_client() -> Any:
+    """Create the shared chat client on first use: Azure OpenAI, the replay client or the scripted stand-in."""
+    if chat_client_kind == "replay":
+        from ..replay import ReplayChatClient
+
+        return ReplayChatClient()
+    if chat_client_kind == "scripted":
+        from .scripted_client import ScriptedChatClient
+
+        return ScriptedChatClient()
+
+    from agent_framework.azure import AzureOpenAIChatClient
+
+    # Tokens voor alle geconfigureerde services alvast op de achtergrond ophalen
+    warm_up()
+
+    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
+    return AzureOpenAIChatClient(
+        api_key=api_key,
+        # Zonder API key een token per request uit de gedeelde cache, in plaats van één token bij het opstarten
+        ad_token_provider=None if api_key else shared_credential().token_provider(cognitive_services_scope),
+        azure_deployment=os.environ.get("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
+        azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
+    )
+
 
-chat_client = AzureOpenAIChatClient(
-    credential=credential,
-    api_key=os.environ.get("AZURE_OPENAI_API_KEY"),
-    azure_deployment=os.environ.get("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
-    azure_endpoint=os.environ.get("AZURE_OPENAI_ENDPOINT"),
-)
+def __getattr__(name: str) -> Any:
+    """Keep `from .client import chat_client` working while creating the client lazily."""
+    if name == "chat_client":
+        return get_chat_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
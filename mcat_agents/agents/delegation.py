@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, List
+
+from agent_framework import (
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    AIFunction,
+    ChatAgent,
+    FunctionCallContent,
+    Role,
+    TextReasoningContent,
+)
+from pydantic import Field, create_model
+
+from ..middleware.progress import publish_update, report_progress, streaming_active
+from ..tools.helper.fan_out import AgentRunner
+from ..tools.mutations import MUTATING_TOOLS
+from .response_cache import cache_enabled, response_cache, state_fingerprints
+
+
+def mutating_calls(response: Any) -> List[str]:
+    """Return the names of mutating tools that were called while producing a response."""
+    return [
+        content.name
+        for message in response.messages
+        for content in message.contents
+        if isinstance(content, FunctionCallContent) and content.name in MUTATING_TOOLS
+    ]
+
+
+async def _run_streamed(agent: ChatAgent, task: str, **kwargs: Any) -> AgentRunResponse:
+    """Run a sub-agent with run_stream, forwarding its partial text to the engineer's session as it arrives."""
+    updates: List[AgentRunResponseUpdate] = []
+    async for update in agent.run_stream(task, **kwargs):
+        updates.append(update)
+        if update.text:
+            # Als reasoning doorsturen: zichtbaar tijdens het wachten, maar geen deel van het eindantwoord
+            publish_update(AgentRunResponseUpdate(
+                role=Role.ASSISTANT,
+                contents=[TextReasoningContent(text=update.text)],
+                author_name=agent.name,
+            ))
+    if any(update.text for update in updates):
+        publish_update(AgentRunResponseUpdate(role=Role.ASSISTANT, contents=[TextReasoningContent(text="\n")], author_name=agent.name))
+    return AgentRunResponse.from_agent_run_response_updates(updates)
+
+
+async def run_delegated(agent: ChatAgent, task: str, **kwargs: Any) -> str:
+    """Run a sub-agent task, answering from the response cache when the underlying state is unchanged."""
+    fingerprint = await asyncio.to_thread(state_fingerprints.get, agent.name) if cache_enabled else None
+    if fingerprint:
+        # Met een gedeelde cache (SQLite, Redis) is dit I/O: buiten de event loop
+        cached = await asyncio.to_thread(response_cache.get, agent.name, task, fingerprint)
+        if cached is not None:
+            report_progress("antwoord uit de cache", source=agent.name)
+            return cached
+
+    if streaming_active():
+        response = await _run_streamed(agent, task, **kwargs)
+    else:
+        response = await agent.run(task, **kwargs)
+
+    if mutating_calls(response):
+        # Na een wijziging zijn eerdere antwoorden van deze agent en alle fingerprints achterhaald
+        await asyncio.to_thread(response_cache.invalidate, agent.name)
+        state_fingerprints.reset()
+    elif fingerprint and response.text and not response.user_input_requests:
+        await asyncio.to_thread(response_cache.put, agent.name, task, fingerprint, response.text)
+    else:
+        response_cache.stats["bypassed"] += 1
+    return response.text
+
+
+def delegated_runner(agent: ChatAgent) -> AgentRunner:
+    """Runner for the parallel fan-out tool that goes through the same cached delegation path."""
+    async def run(task: str) -> str:
+        return await run_delegated(agent, task)
+
+    return run
+
+
+def delegate_tool(agent: ChatAgent) -> AIFunction:
+    """Expose a sub-agent as a tool like ChatAgent.as_tool(), but with the response cache in between."""
+    input_model = create_model(
+        f"{agent.name}_task",
+        task=(str, Field(..., description=f"Task for {agent.name}")),
+    )
+
+    async def agent_wrapper(**kwargs: Any) -> str:
+        task = kwargs.pop("task", "")
+        return await run_delegated(agent, task, **kwargs)
+
+    tool: AIFunction = AIFunction(
+        name=agent.name,
+        description=agent.description or "",
+        func=agent_wrapper,
+        input_model=input_model,
+    )
+    # Runtime kwargs van de helper doorgeven, net als as_tool()
+    tool._forward_runtime_kwargs = True
+    return tool
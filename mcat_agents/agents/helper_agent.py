@@ -1,9 +1,22 @@
 from agent_framework import ChatAgent
 
-from .client import chat_client
+from .client import get_chat_client
+from .delegation import delegate_tool, delegated_runner
 from .knowledge_agent import knowledge_agent
 from .network_agent import network_agent
 from .resource_agent import resource_agent
+from .router import fast_path_router
+from ..middleware.compaction import tool_result_compaction
+from ..middleware.history import history_compaction
+from ..middleware.progress import progress_streaming, tool_progress_events
+from ..telemetry import agent_telemetry
+from ..tools.helper.fan_out import make_parallel_consult_tool
+from ..tools.helper.retrieval import retrieve_tool_output
+
+consult_agents_parallel = make_parallel_consult_tool({
+    agent.name: delegated_runner(agent)
+    for agent in (knowledge_agent, network_agent, resource_agent)
+})
 
 helper_agent = ChatAgent(
     name="helper_agent",
@@ -35,14 +48,17 @@ helper_agent = ChatAgent(
     - knowledge_agent: Voor interne documentatie en beleid uit north-river-knowledge-base met behulp van deze agent kan je ook document aanpassen, aanmaken en verwijderen. 
     - network_agent: Voor NSG-configuraties en netwerkregels in North River
     - resource_agent: Voor VM-status en resource-informatie in north-river-resource-group
+    - consult_agents_parallel: Stel onafhankelijke vragen aan meerdere agents tegelijk (bijv. beleidsdocument, NSG-regels en VM-status voor een troubleshooting vraag). Alleen voor informatie, nooit voor wijzigingen.
+    - retrieve_tool_output: Oude resultaten in een lang gesprek worden samengevat; haal met de referentie uit de samenvatting het volledige resultaat op als je details nodig hebt.
 
     WORKFLOW:
     1. Begrijp het probleem (vraag door indien nodig)
-    2. Verzamel relevante informatie via de juiste agent
+    2. Verzamel relevante informatie via de juiste agent; gebruik consult_agents_parallel als je meerdere onafhankelijke vragen hebt
     3. Stel een oplossing voor
     4. Voer uit na bevestiging
     5. Rapporteer het resultaat""",
-    chat_client=chat_client,
+    chat_client=get_chat_client(),
     temperature=0.2,
-    tools=[knowledge_agent.as_tool(), network_agent.as_tool(), resource_agent.as_tool()],
+    middleware=[agent_telemetry, fast_path_router, progress_streaming, tool_result_compaction, tool_progress_events, history_compaction],
+    tools=[delegate_tool(knowledge_agent), delegate_tool(network_agent), delegate_tool(resource_agent), consult_agents_parallel, retrieve_tool_output],
 )
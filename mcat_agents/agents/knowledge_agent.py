@@ -1,5 +1,9 @@
 from agent_framework import ChatAgent
-from .client import chat_client
+from .client import get_chat_client
+from ..middleware.compaction import tool_result_compaction
+from ..middleware.progress import tool_progress_events
+from ..middleware.tool_profiles import ToolProfile, ToolProfiles
+from ..telemetry import agent_telemetry
 from ..tools.knowledge.ai_search import (
     search_knowledge_base,
     search_knowledge_base_detailed,
@@ -7,12 +11,51 @@ from ..tools.knowledge.ai_search import (
 )
 from ..tools.knowledge.blob_storage import (
     read_blob_file,
+    read_blob_range,
+    read_blob_lines,
     replace_blob_file_content,
     append_to_blob_file,
     create_blob_file,
     list_blobs_in_container,
     delete_blob_file,
 )
+from ..tools.knowledge.grep_search import grep_knowledge_base
+from ..tools.knowledge.semantic_search import semantic_search_knowledge_base
+
+# Tools per soort opdracht; geen match betekent alle tools (zie middleware/tool_profiles.py)
+knowledge_tool_profiles = ToolProfiles([
+    ToolProfile(
+        "search",
+        r"\b(zoek\w*|beleid\w*|procedure\w*|richtlijn\w*|documentatie|wat|welke?|wie|hoe|waar|mag|toegestaan|policy|search|find)\b",
+        (
+            "search_knowledge_base",
+            "search_knowledge_base_detailed",
+            "get_document_by_title",
+            "semantic_search_knowledge_base",
+            "read_blob_file",
+            "read_blob_range",
+            "read_blob_lines",
+            "grep_knowledge_base",
+        ),
+    ),
+    ToolProfile(
+        "browse",
+        r"\b(lijst|overzicht|lees|inhoud|bestand\w*|document\w*|regel \d+|[\w/-]+\.(txt|md|json|csv))\b",
+        ("get_document_by_title", "read_blob_file", "read_blob_range", "read_blob_lines", "list_blobs_in_container", "grep_knowledge_base"),
+    ),
+    ToolProfile(
+        "edit",
+        r"\b(voeg\w*|toevoeg\w*|wijzig\w*|aanpass\w*|pas\w*\s.*\baan|update\w*|vervang\w*|bijwerk\w*|aanmak\w*|maak\w*|verwijder\w*|schrijf\w*|append|create|delete|replace)\b",
+        (
+            "read_blob_file",
+            "replace_blob_file_content",
+            "append_to_blob_file",
+            "create_blob_file",
+            "list_blobs_in_container",
+            "delete_blob_file",
+        ),
+    ),
+])
 
 knowledge_agent = ChatAgent(
     name="knowledge_agent",
@@ -32,6 +75,7 @@ AI SEARCH TOOLS:
 1. search_knowledge_base
    - Gebruik: Algemene zoekacties in de knowledge base
    - Geeft: Tot 10 documenten met titel, content, score en file URL
+   - Bij lange documenten bevat content alleen de best passende passages (content_truncated=True); lees de rest met read_blob_lines of read_blob_range
    - Vereist: keyword dit moet een enkel woord zijn
    - Gebruik voor: Zoeken naar beleid, IP-adressen, configuraties, procedures
 
@@ -48,39 +92,67 @@ AI SEARCH TOOLS:
    - Vereist: title (exacte documentnaam)
    - Gebruik voor: Wanneer je de exacte naam van een document weet
 
+4. semantic_search_knowledge_base
+   - Gebruik: Zoeken op betekenis met een lokale vectorindex
+   - Geeft: Tot top passages met titel, content, score, file URL en de positie van de passage (offset, length, start_line)
+   - Vereist: query (een vraag of omschrijving in gewone taal, GEEN enkel woord nodig)
+   - Optioneel: top (aantal resultaten, standaard 5)
+   - Gebruik voor: Vragen in gewone taal, in plaats van steeds andere losse trefwoorden te proberen
+
 BLOB STORAGE TOOLS:
 
-4. read_blob_file
+5. read_blob_file
    - Gebruik: Lees de volledige inhoud van een bestand uit Blob Storage
    - Geeft: Content, size, last_modified, content_type
    - Vereist: blob_url (volledige URL van het bestand)
    - Gebruik voor: Lezen van specifieke documenten waarvan je de URL hebt
 
-5. list_blobs_in_container
+6. read_blob_lines
+   - Gebruik: Lees een venster van regels uit een groot bestand
+   - Geeft: Content, start_line, end_line, total_lines
+   - Vereist: blob_url
+   - Optioneel: start_line (standaard 1), num_lines (standaard 50), from_end (True = laatste regels)
+   - Gebruik voor: Lange procedures en logs, of alleen het begin/einde van een bestand
+
+7. read_blob_range
+   - Gebruik: Lees een byte range uit een bestand
+   - Geeft: Content, offset, length, size, has_more
+   - Vereist: blob_url
+   - Optioneel: offset (standaard 0), length (standaard 65536)
+   - Gebruik voor: Grote bestanden stap voor stap doorlezen
+
+8. list_blobs_in_container
    - Gebruik: Lijst alle beschikbare bestanden in de knowledge base
    - Geeft: Namen, sizes, last_modified, URLs van alle blobs
    - Optioneel: prefix (filter op pad, bijv. "Beleid/")
    - Gebruik voor: Overzicht van beschikbare documenten
 
-6. replace_blob_file_content
+9. grep_knowledge_base
+   - Gebruik: Doorzoek ALLE bestanden op een exacte tekst of regex (zoals grep)
+   - Geeft: Bestand, regelnummer, regel en context per match
+   - Vereist: pattern
+   - Optioneel: prefix, regex, ignore_case, context_lines, max_matches
+   - Gebruik voor: Exacte vragen zoals "welke documenten noemen 198.51.100.50 of poort 3389"
+
+10. replace_blob_file_content
    - Gebruik: Vervang de volledige inhoud van een bestand
    - Vereist: blob_url, new_content
    - Optioneel: content_type (standaard "text/plain")
    - ALTIJD approval nodig
 
-7. append_to_blob_file
+11. append_to_blob_file
    - Gebruik: Voeg tekst toe aan het einde van een bestand
    - Vereist: blob_url, text_to_append
    - Gebruik voor: Toevoegen van nieuwe regels aan bestaande documenten
    - ALTIJD approval nodig
 
-8. create_blob_file
+12. create_blob_file
    - Gebruik: Maak een nieuw bestand aan in Blob Storage
    - Vereist: blob_path (pad binnen container), content
    - Optioneel: content_type
    - ALTIJD approval nodig
 
-9. delete_blob_file
+13. delete_blob_file
    - Gebruik: Verwijder een bestand (ALLEEN na expliciete bevestiging)
    - Vereist: blob_url
    - ALTIJD approval nodig
@@ -89,7 +161,9 @@ WORKFLOW:
 1. Identificeer wat de helper_agent zoekt of wil doen
 2. Kies de juiste tool:
    - Voor ZOEKEN: gebruik AI Search tools
+   - Voor EXACT ZOEKEN (IP-adressen, poorten, namen): gebruik grep_knowledge_base
    - Voor LEZEN van specifieke bestanden: gebruik read_blob_file of list_blobs
+   - Voor LEZEN van grote bestanden: gebruik read_blob_lines of read_blob_range
    - Voor WIJZIGEN: gebruik Blob Storage write tools (altijd met approval)
 3. Voer de actie uit
 4. Geef ALLEEN de informatie terug die uit de tool komt
@@ -109,25 +183,33 @@ VOORBEELDEN VAN JUIST GEBRUIK:
 - Helper vraagt: "Wat is het beleid voor SSH?" → Gebruik search_knowledge_base met keyword="SSH beleid"
 - Helper vraagt: "Haal het document 'Beleid/IP-adressen.txt' op" → Gebruik get_document_by_title of read_blob_file
 - Helper vraagt: "Zoek informatie over firewalls" → Gebruik search_knowledge_base met keyword="firewall"
+- Helper vraagt: "Wie mag er via SSH beheren?" → Gebruik semantic_search_knowledge_base met query="wie mag via SSH beheren"
 - Helper vraagt: "Welke documenten zijn er?" → Gebruik list_blobs_in_container
+- Helper vraagt: "Welke documenten noemen 198.51.100.50?" → Gebruik grep_knowledge_base met pattern="198.51.100.50"
 - Helper vraagt: "Voeg IP 10.0.0.5 toe aan het IP-adressenbestand" → Gebruik eerst read_blob_file, dan append_to_blob_file
 - Helper vraagt: "Update het beleidsdocument" → Gebruik replace_blob_file_content (met approval)
 
 KENNISBANK CONTEXT:
 - Documenten bevinden zich in de north-river-knowledge-base
 - Veelvoorkomende documenten: Beleid/IP-adressen.txt, configuratiebestanden, procedures
-- Zoektermen kunnen Nederlands of Engels zijn""",
-    chat_client=chat_client,
+- Zoektermen kunnen Nederlands of Engels zijn
+- Wijzigingen via de write tools worden direct naar de zoekindex gepusht en zijn binnen enkele seconden doorzoekbaar""",
+    chat_client=get_chat_client(),
     temperature=0.1,
+    middleware=[agent_telemetry, tool_result_compaction, tool_progress_events, knowledge_tool_profiles],
     tools=[
         search_knowledge_base,
         search_knowledge_base_detailed,
         get_document_by_title,
+        semantic_search_knowledge_base,
         read_blob_file,
+        read_blob_range,
+        read_blob_lines,
         replace_blob_file_content,
         append_to_blob_file,
         create_blob_file,
         list_blobs_in_container,
+        grep_knowledge_base,
         delete_blob_file,
     ],
 )
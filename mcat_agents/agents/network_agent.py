@@ -1,15 +1,39 @@
 from agent_framework import ChatAgent
-from .client import chat_client
+from .client import get_chat_client
+from ..middleware.compaction import tool_result_compaction
+from ..middleware.progress import tool_progress_events
+from ..middleware.tool_profiles import ToolProfile, ToolProfiles
+from ..telemetry import agent_telemetry
 from ..tools.network.network_functions import (
     list_nsgs_in_resource_group,
     get_nsg_rules,
     list_vm_nsg_associations,
     check_nsg_port_allow,
     check_vm_port_access,
+    diagnose_vm_access,
     add_nsg_rule,
     remove_nsg_rule,
 )
 
+# Tools per soort opdracht; geen match betekent alle tools (zie middleware/tool_profiles.py)
+network_tool_profiles = ToolProfiles([
+    ToolProfile(
+        "inspect",
+        r"\b(nsgs?|regels?|rules?|gekoppeld|koppeling\w*|associati\w*|security groups?)\b",
+        ("list_nsgs_in_resource_group", "get_nsg_rules", "list_vm_nsg_associations"),
+    ),
+    ToolProfile(
+        "diagnose",
+        r"\b(bereik\w*|toegang|verbind\w*|geblokkeerd|poort\w*|ports?|ssh|rdp|https?|access|connect\w*|\d{1,3}(\.\d{1,3}){3})\b",
+        ("get_nsg_rules", "list_vm_nsg_associations", "check_nsg_port_allow", "check_vm_port_access", "diagnose_vm_access"),
+    ),
+    ToolProfile(
+        "change",
+        r"\b(voeg\w*|toevoeg\w*|maak\w*|aanmak\w*|open\w*|toestaan|sta\w*\s.*\btoe|verwijder\w*|blokkeer\w*|wijzig\w*|add|allow|deny|remove|delete)\b",
+        ("get_nsg_rules", "list_vm_nsg_associations", "add_nsg_rule", "remove_nsg_rule"),
+    ),
+])
+
 network_agent = ChatAgent(
     name="network_agent",
     description="Controleert en wijzigt Network Security Groups en netwerkregels",
@@ -44,13 +68,20 @@ BESCHIKBARE TOOLS:
    - Controleert alle NICs en hun NSGs van de VM
    - Gebruik dit voor end-to-end connectivity checks
 
-6. add_nsg_rule(nsg_name, rule_name, priority, direction, access, protocol, destination_ports, source_prefixes, destination_prefixes, description)
+6. diagnose_vm_access(vm_name, port, source_ip, protocol)
+   - Volledige diagnose in één aanroep: power state, NICs, private/public IPs, NIC en subnet NSGs
+   - Evalueert de rules zoals Azure dat doet (priority volgorde, inclusief default rules)
+   - Geeft één verdict ("allowed", "denied", "unknown" of "vm_not_running") met de beslissende regel
+   - "unknown": de uitkomst hangt af van regels met application security groups; rapporteer de undetermined_rules
+   - Gebruik dit als EERSTE stap bij elke "waarom kan ik (niet) bij VM X" vraag
+
+7. add_nsg_rule(nsg_name, rule_name, priority, direction, access, protocol, destination_ports, source_prefixes, destination_prefixes, description)
    - Voeg een nieuwe security rule toe of update een bestaande
    - vraag helper_agent om bevestiging voor wijzigingen
    - Gebruik dit om poorten te openen of regels aan te passen
    - zorg ervoor dat er niet per ongeluk regels worden aangepast 
 
-7. remove_nsg_rule(nsg_name, rule_name)
+8. remove_nsg_rule(nsg_name, rule_name)
    - Verwijder een security rule uit een NSG
    - gebruik ALLEEN na expliciete bevestiging
    - Gebruik dit voor het opschonen van overbodige regels
@@ -58,10 +89,8 @@ BESCHIKBARE TOOLS:
 WORKFLOW:
 
 Voor troubleshooting:
-1. list_nsgs_in_resource_group() → identificeer beschikbare NSGs
-2. list_vm_nsg_associations(vm_name) → vind welke NSG een VM beschermt
-3. get_nsg_rules(nsg_name) → analyseer huidige rules
-4. check_vm_port_access(vm_name, port, source_ip) → test connectivity
+1. diagnose_vm_access(vm_name, port, source_ip) → verdict, beslissende regel en NSG in één aanroep
+2. Alleen als je meer context nodig hebt: get_nsg_rules(nsg_name) → analyseer de overige rules
 
 Voor wijzigingen:
 1. Analyseer eerst de huidige configuratie met get_nsg_rules()
@@ -73,7 +102,7 @@ OUTPUT REGELS:
 
 1. Gebruik ALLEEN data uit tool responses
 2. Rapporteer exacte NSG-namen, rule-namen, poorten, IP-adressen zoals ze in de tool output staan
-3. Voor connectivity issues: vermeld de volledige check_vm_port_access() of check_nsg_port_allow() resultaten
+3. Voor connectivity issues: vermeld het verdict en de deciding_rule van diagnose_vm_access() (of de check_vm_port_access() / check_nsg_port_allow() resultaten)
 4. Voor wijzigingen: bevestig de toegepaste rule met exacte parameters
 5. Als een tool een error geeft, rapporteer de exacte error message
 6. Gebruik technische terminologie: "priority", "inbound rule", "source prefix", "destination port"
@@ -82,10 +111,8 @@ VOORBEELDEN:
 
 Vraag: "Waarom kan ik niet SSH-en naar VM Authenticatie?"
 Antwoord workflow:
-1. list_vm_nsg_associations("Authenticatie") → NSG: "Authenticatie-NSG"
-2. check_vm_port_access("Authenticatie", 22, "203.0.113.50") → allowed: False
-3. get_nsg_rules("Authenticatie-NSG") → analyseer inbound rules voor poort 22
-Rapporteer: "VM Authenticatie heeft geen inbound rule die SSH (poort 22) toestaat vanaf 203.0.113.50. NSG 'Authenticatie-NSG' heeft [X] inbound rules, maar geen daarvan matcht poort 22 voor deze source IP."
+1. diagnose_vm_access("VM-Authenticatie", 22, "203.0.113.50") → verdict: "denied", deciding_rule: DenyAllInBound (priority 65500, default rule) in NSG-Authenticatie
+Rapporteer: "VM-Authenticatie draait, maar SSH (poort 22) vanaf 203.0.113.50 wordt geweigerd door default rule 'DenyAllInBound' (priority 65500) in NSG 'NSG-Authenticatie': er is geen inbound rule die poort 22 voor deze source IP toestaat."
 
 Vraag: "Open poort 443 voor VM Rapportage vanaf 10.0.0.0/24"
 Antwoord workflow:
@@ -106,14 +133,16 @@ FOUTEN OM TE VERMIJDEN:
 ✓ WEL: "get_nsg_rules toont 12 inbound rules, 8 outbound rules voor NSG 'Klantregistratie-NSG'. Alle rules hebben correcte priorities tussen 100-300."
 
 LET OP: approval_mode is ingesteld voor add_nsg_rule en remove_nsg_rule. De helper_agent moet deze operations goedkeuren voordat ze worden uitgevoerd.""",
-    chat_client=chat_client,
+    chat_client=get_chat_client(),
     temperature=0.1,
+    middleware=[agent_telemetry, tool_result_compaction, tool_progress_events, network_tool_profiles],
     tools=[
         list_nsgs_in_resource_group,
         get_nsg_rules,
         list_vm_nsg_associations,
         check_nsg_port_allow,
         check_vm_port_access,
+        diagnose_vm_access,
         add_nsg_rule,
         remove_nsg_rule,
     ],
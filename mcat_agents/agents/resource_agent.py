@@ -1,5 +1,9 @@
 from agent_framework import ChatAgent
-from .client import chat_client
+from .client import get_chat_client
+from ..middleware.compaction import tool_result_compaction
+from ..middleware.progress import tool_progress_events
+from ..middleware.tool_profiles import ToolProfile, ToolProfiles
+from ..telemetry import agent_telemetry
 from ..tools.resource.cloud_resources import (
     list_resource_groups,
     get_resources_in_resource_group,
@@ -12,6 +16,25 @@ from ..tools.resource.cloud_resources import (
     stop_vm,
 )
 
+# Tools per soort opdracht; geen match betekent alle tools (zie middleware/tool_profiles.py)
+resource_tool_profiles = ToolProfiles([
+    ToolProfile(
+        "inventory",
+        r"\b(resource\s*groups?|resources|overzicht|lijst|welke|alle|nsgs?)\b",
+        ("list_resource_groups", "get_resources_in_resource_group", "list_vms_in_resource_group", "get_nsg_info", "list_nsgs"),
+    ),
+    ToolProfile(
+        "status",
+        r"\b(status|draait|online|offline|staat|power|running|stopped|ip|ip-adres\w*|adres\w*|netwerk\w*|nics?|regels?|poort\w*|ports?|open)\b",
+        ("list_vms_in_resource_group", "get_vm_status", "get_vm_network_info", "get_nsg_info"),
+    ),
+    ToolProfile(
+        "power",
+        r"\b(start\w*|stop\w*|herstart\w*|opstart\w*|afsluit\w*|sluit\w*|zet\w*|schakel\w*|restart|deallocate\w*)\b",
+        ("list_vms_in_resource_group", "get_vm_status", "start_vm", "stop_vm"),
+    ),
+])
+
 resource_agent = ChatAgent(
     name="resource_agent",
     description="Beheert en inspecteert Azure resources zoals VMs en hun status",
@@ -106,8 +129,9 @@ VOORBEELDEN VAN JUIST GEBRUIK:
 - Helper vraagt: "Welke NSGs zijn er?" → Gebruik list_nsgs
 - Helper vraagt: "Welke regels staan in NSG-X?" → Gebruik get_nsg_info met nsg_name="NSG-X"
 - Helper vraagt: "Welke poorten staan open op VM-X?" → Gebruik eerst get_vm_network_info om de NSG te vinden, dan get_nsg_info om de regels te bekijken""",
-    chat_client=chat_client,
+    chat_client=get_chat_client(),
     temperature=0.1,
+    middleware=[agent_telemetry, tool_result_compaction, tool_progress_events, resource_tool_profiles],
     tools=[
         list_resource_groups,
         get_resources_in_resource_group,
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..tools import azure_clients, shared_cache
+from ..tools.azure_clients import default_resource_group
+
+logger = logging.getLogger(__name__)
+
+# Hoe lang een sub-agent antwoord bruikbaar blijft, hoeveel antwoorden bewaard worden
+# en hoe lang een berekende state fingerprint hergebruikt wordt
+cache_ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL", "900"))
+cache_max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+fingerprint_ttl_seconds = float(os.getenv("RESPONSE_CACHE_FINGERPRINT_TTL", "5"))
+cache_enabled = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_task(task: str) -> str:
+    """Normalise a sub-agent request so trivially different phrasings share a cache entry."""
+    return _whitespace.sub(" ", task).strip().rstrip("?.!").strip().lower()
+
+
+def _vm_state() -> List[Tuple[Any, ...]]:
+    """VM ETags and power states."""
+    compute = azure_clients.compute_client()
+    vms = []
+    for vm in compute.virtual_machines.list(default_resource_group, expand="instanceView"):
+        statuses = [s.code for s in (vm.instance_view.statuses or [])] if vm.instance_view else []
+        vms.append(("vm", vm.name, getattr(vm, "etag", None), tuple(sorted(statuses))))
+    return vms
+
+
+def _network_state() -> List[Tuple[Any, ...]]:
+    """ETags of all NSGs and NICs (rules and NSG associations), plus the VM state: diagnose_vm_access reports the power state."""
+    network = azure_clients.network_client()
+    nsgs = [("nsg", n.name, n.etag) for n in network.network_security_groups.list(default_resource_group)]
+    nics = [("nic", n.name, n.etag) for n in network.network_interfaces.list(default_resource_group)]
+    return nsgs + nics + _vm_state()
+
+
+def _resource_state() -> List[Tuple[Any, ...]]:
+    """VM ETags and power states, plus the network state the resource tools also report."""
+    return _network_state()
+
+
+def _knowledge_state() -> List[Tuple[Any, ...]]:
+    """ETags of all blobs in the knowledge container (served from the mirror manifest when fresh)."""
+    from ..tools.knowledge.blob_storage import _list_blob_entries
+
+    return [("blob", name, entry.get("etag")) for name, entry in _list_blob_entries().items()]
+
+
+class StateFingerprints:
+    """Per-agent digest of the underlying data, memoised briefly so bursts of questions share one lookup."""
+
+    def __init__(self, sources: Dict[str, Callable[[], List[Tuple[Any, ...]]]], ttl: float = fingerprint_ttl_seconds):
+        self._sources = sources
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._memo: Dict[str, Tuple[float, str]] = {}
+
+    def get(self, agent_name: str) -> Optional[str]:
+        """Return the fingerprint for an agent, or None when it has no source or the lookup fails."""
+        source = self._sources.get(agent_name)
+        if source is None:
+            return None
+        with self._lock:
+            memo = self._memo.get(agent_name)
+            if memo and time.monotonic() - memo[0] < self._ttl:
+                return memo[1]
+        try:
+            state = sorted(source(), key=repr)
+        except Exception:
+            logger.warning("State fingerprint voor %s mislukt; cache wordt overgeslagen", agent_name, exc_info=True)
+            return None
+        digest = hashlib.sha256(json.dumps(state, default=str).encode("utf-8")).hexdigest()
+        with self._lock:
+            self._memo[agent_name] = (time.monotonic(), digest)
+        return digest
+
+    def reset(self) -> None:
+        """Forget all memoised fingerprints, e.g. after a mutation."""
+        with self._lock:
+            self._memo.clear()
+
+
+class ResponseCache:
+    """LRU cache of sub-agent answers keyed by agent, normalised request and state fingerprint.
+
+    With MCAT_SHARED_CACHE set the answers live in the shared cache tier instead, so all workers
+    reuse them; invalidation then bumps a generation that every worker includes in its keys.
+    """
+
+    def __init__(self, ttl: float = cache_ttl_seconds, max_entries: int = cache_max_entries):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._shared = bool(shared_cache.cache_url)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(agent_name: str, task: str, fingerprint: str) -> str:
+        """Build the cache key."""
+        raw = json.dumps([agent_name, normalize_task(task), fingerprint])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _shared_key(agent_name: str, key: str) -> Optional[str]:
+        """Key in the shared tier: the cache key plus the generations for all agents and for this agent."""
+        current = shared_cache.generations("responses", f"responses.{agent_name}")
+        return f"{key}:{current[0]}.{current[1]}" if current is not None else None
+
+    def get(self, agent_name: str, task: str, fingerprint: str) -> Optional[str]:
+        """Return a cached answer that is still fresh, or None."""
+        key = self._key(agent_name, task, fingerprint)
+        if self._shared:
+            shared_key = self._shared_key(agent_name, key)
+            text = shared_cache.lookup("responses", shared_key) if shared_key else None
+            self.stats["hits" if text is not None else "misses"] += 1
+            return text
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self._ttl:
+                self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[2]
+
+    def put(self, agent_name: str, task: str, fingerprint: str, text: str) -> None:
+        """Store an answer, evicting the least recently used entries beyond max_entries."""
+        key = self._key(agent_name, task, fingerprint)
+        if self._shared:
+            shared_key = self._shared_key(agent_name, key)
+            if shared_key:
+                shared_cache.store("responses", shared_key, text, self._ttl)
+                self.stats["stores"] += 1
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), agent_name, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+
+    def invalidate(self, agent_name: Optional[str] = None) -> None:
+        """Drop all cached answers of one agent, or of all agents."""
+        if self._shared:
+            shared_cache.invalidate(f"responses.{agent_name}" if agent_name else "responses")
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if agent_name is None or e[1] == agent_name]:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+
+state_fingerprints = StateFingerprints({
+    "network_agent": _network_state,
+    "resource_agent": _resource_state,
+    "knowledge_agent": _knowledge_state,
+})
+response_cache = ResponseCache()
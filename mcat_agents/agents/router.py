@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional
+
+from agent_framework import (
+    AgentMiddleware,
+    AgentRunContext,
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    ChatMessage,
+    Role,
+    TextContent,
+)
+
+from ..telemetry import fast_path_duration, fast_path_requests, fast_path_tool_errors
+
+logger = logging.getLogger(__name__)
+
+router_enabled = os.getenv("FAST_PATH_ROUTER_ENABLED", "1") != "0"
+# Langere berichten zijn vrijwel nooit een simpele opvraagvraag
+max_message_chars = 160
+
+# Bekende entiteiten van de North River omgeving (zie infra/)
+vm_names = [
+    "VM-FinancieleAdministratie",
+    "VM-Klantregistratie",
+    "VM-Orderverwerking",
+    "VM-Rapportage",
+    "VM-Authenticatie",
+]
+nsg_names = [
+    "NSG-Financieel",
+    "NSG-Klantregistratie",
+    "NSG-Orderverwerking",
+    "NSG-Rapportage",
+    "NSG-Authenticatie",
+]
+
+# Woorden die wijzen op een wijziging, een diagnose of een vervolgvraag: die gaan altijd naar de LLM
+_disqualifiers = re.compile(
+    r"\b(waarom|why|hoe|how|start|starten|stop|stoppen|herstart|restart|open|openen|sluit|sluiten|"
+    r"zet|zetten|aanzetten|uitzetten|schakel|schakelen|inschakelen|uitschakelen|opstarten|afsluiten|turn|boot|reboot|shutdown|"
+    r"voeg|toevoegen|add|remove|verwijder|verwijderen|wijzig|wijzigen|change|update|maak|create|delete|"
+    r"fix|oplossen|los|toegang|access|poort|port|ssh|rdp|bereik|bereikbaar|kan ik|can i|en ook|and also|daarna|then)\b",
+    re.IGNORECASE,
+)
+_status_words = re.compile(r"\b(running|draait|draaien|status|online|offline|power ?states?|gestart|gestopt|stopped|deallocated)\b", re.IGNORECASE)
+# "aan"/"uit" alleen als vraag naar de toestand: "Staat VM-X aan?", "Is VM-X uit?"
+_on_off_question = re.compile(r"^\s*(staat|staan|is|zijn)\b.*\b(aan|uit)\s*\??\s*$", re.IGNORECASE)
+# Alles wat in een vraag naar de toestand van één VM mag staan naast de VM zelf; elk ander woord (backup, firewall, disk, …) gaat naar de LLM
+_state_question_words = re.compile(
+    r"\b(is|are|zijn|staat|staan|draait|draaien|running|de|het|the|van|of|wat|what|welke|which|hoe|nu|momenteel|"
+    r"currently|now|nog|al|still|vm|virtuele machine|virtual machine|machine|power ?states?|state|status|"
+    r"online|offline|gestart|gestopt|stopped|deallocated|aan|uit|on|off)\b",
+    re.IGNORECASE,
+)
+_nsg_words = re.compile(r"\b(nsg|nsgs|network security group|beveiligingsgroep)\b", re.IGNORECASE)
+_rule_words = re.compile(r"\b(rules?|regels?)\b", re.IGNORECASE)
+_list_words = re.compile(r"\b(lijst|list|toon|show|welke|which|what|wat|alle|all|overzicht|geef)\b", re.IGNORECASE)
+_vm_list_words = re.compile(r"\b(vms|virtual machines|virtuele machines|machines)\b", re.IGNORECASE)
+_document_words = re.compile(r"\b(documenten|documents|bestanden|files|blobs|knowledge base)\b", re.IGNORECASE)
+# Vragen over documenten of een onderwerp gaan niet over de VM zelf, ook als de VM naam erin staat
+_knowledge_words = re.compile(r"\b(documents?|documenten|bestand|bestanden|files?|blobs?|knowledge base|beleid|policy|rapport|report)\b", re.IGNORECASE)
+_topic_words = re.compile(r"\b(over|about|met|with|bevat|contains?|zoek|search|waarin|where|inhoud|content)\b", re.IGNORECASE)
+
+
+def _entity_pattern(name: str) -> re.Pattern:
+    """Match an entity by its full name or by the part after the prefix (e.g. 'Rapportage', 'vm rapportage')."""
+    prefix, _, base = name.partition("-")
+    # 'FinancieleAdministratie' ook als 'Financiele Administratie' herkennen
+    parts = re.findall(r"[A-Z][a-z]*", base) or [base]
+    return re.compile(rf"\b(?:{prefix}[- ]?)?{'[- ]?'.join(map(re.escape, parts))}\b", re.IGNORECASE)
+
+
+_vm_patterns = {name: _entity_pattern(name) for name in vm_names}
+_nsg_patterns = {name: re.compile(rf"\b{re.escape(name)}\b", re.IGNORECASE) for name in nsg_names}
+
+
+@dataclass
+class Route:
+    """A matched read-only intent with its resolved entity."""
+
+    intent: str
+    entity: Optional[str] = None
+
+
+def _found(patterns: Dict[str, re.Pattern], text: str) -> List[str]:
+    """Return the entity names mentioned in a text."""
+    return [name for name, pattern in patterns.items() if pattern.search(text)]
+
+
+def _is_state_question(text: str, vm_name: str) -> bool:
+    """Whether a message only asks for the power state of one VM, e.g. "Draait VM-Rapportage?", "Staat Rapportage aan?"."""
+    if not (_status_words.search(text) or _on_off_question.search(text)):
+        return False
+    rest = _state_question_words.sub(" ", _vm_patterns[vm_name].sub(" ", text))
+    return not re.search(r"\w", rest)
+
+
+def match_route(text: str) -> Optional[Route]:
+    """Return the read-only intent a message confidently matches, or None to let the LLM handle it."""
+    text = text.strip()
+    if not text or len(text) > max_message_chars or _disqualifiers.search(text):
+        return None
+
+    nsgs = _found(_nsg_patterns, text)
+    # NSG namen bevatten dezelfde basisnaam als de VMs; die niet dubbel als VM tellen
+    vms = _found(_vm_patterns, _nsg_patterns[nsgs[0]].sub("", text)) if len(nsgs) == 1 else _found(_vm_patterns, text)
+
+    about_vm = not _knowledge_words.search(text) and not _topic_words.search(text)
+
+    if len(vms) == 1 and not nsgs and about_vm and _nsg_words.search(text) and not _rule_words.search(text):
+        return Route("vm_nsg", vms[0])
+    if len(vms) == 1 and not nsgs and about_vm and _is_state_question(text, vms[0]):
+        return Route("vm_status", vms[0])
+    if len(nsgs) == 1 and not vms and _rule_words.search(text):
+        return Route("nsg_rules", nsgs[0])
+    if not vms and not nsgs and about_vm and _vm_list_words.search(text) and _status_words.search(text):
+        return Route("vm_power_states")
+    if not vms and not nsgs and _vm_list_words.search(text) and _list_words.search(text) and not _status_words.search(text):
+        return Route("list_vms")
+    if not vms and not nsgs and _document_words.search(text) and _list_words.search(text) and not _topic_words.search(text):
+        return Route("list_documents")
+    return None
+
+
+def _has_error(result: Any) -> bool:
+    """Check whether a tool result reports an error."""
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and "error" in item for item in result)
+    return True
+
+
+def _render_vm_status(vm_name: str, result: Dict[str, Any]) -> str:
+    """Template the answer for a VM power state question."""
+    power = next((s for s in result["statuses"] if (s.get("code") or "").startswith("PowerState/")), None)
+    provisioning = next((s for s in result["statuses"] if (s.get("code") or "").startswith("ProvisioningState/")), None)
+    answer = f"**{vm_name}** heeft power state **{power['display_status'] if power else 'onbekend'}**"
+    if provisioning:
+        answer += f" (provisioning: {provisioning['display_status']})"
+    return answer + "."
+
+
+def _render_vm_nsg(vm_name: str, result: Dict[str, Any]) -> str:
+    """Template the answer for a VM to NSG association question."""
+    lines = [f"NSG koppelingen van **{vm_name}**:"]
+    lines += [f"- NIC `{a['nic_name']}` → **{a['nsg_name']}**" for a in result["nic_nsg_associations"]]
+    return "\n".join(lines)
+
+
+def _render_nsg_rules(nsg_name: str, result: Dict[str, Any]) -> str:
+    """Template the answer for an NSG rules question as markdown tables."""
+    lines = [f"Security rules van **{nsg_name}** ({result['total_rules']} custom rules):"]
+    for title, rules in (("Inbound", result["inbound_rules"]), ("Outbound", result["outbound_rules"])):
+        lines.append(f"\n**{title}**")
+        if not rules:
+            lines.append("Geen custom rules (alleen de default rules).")
+            continue
+        lines.append("| Priority | Naam | Access | Protocol | Poorten | Source |")
+        lines.append("|---|---|---|---|---|---|")
+        for r in sorted(rules, key=lambda r: r["priority"]):
+            ports = ", ".join(map(str, r["ports"])) or "*"
+            sources = ", ".join(r["source_prefixes"]) or "*"
+            lines.append(f"| {r['priority']} | {r['name']} | {r['access']} | {r['protocol']} | {ports} | {sources} |")
+    return "\n".join(lines)
+
+
+def _render_vm_list(_: Optional[str], result: List[Dict[str, Any]]) -> str:
+    """Template the answer for a VM listing."""
+    lines = [f"De resource group bevat {len(result)} VMs:"]
+    lines += [f"- **{vm['name']}** ({vm.get('vm_size') or '?'}, {vm.get('os_type') or '?'}, {vm.get('location')})" for vm in result]
+    return "\n".join(lines)
+
+
+def _render_vm_power_states(_: Optional[str], result: List[Dict[str, Any]]) -> str:
+    """Template the answer for a question about which VMs are running."""
+    lines = [f"Power state van de {len(result)} VMs in de resource group:"]
+    for vm in result:
+        power = next((s for s in vm["statuses"] if (s.get("code") or "").startswith("PowerState/")), None)
+        lines.append(f"- **{vm['name']}**: {power['display_status'] if power else 'onbekend'}")
+    return "\n".join(lines)
+
+
+def _render_documents(_: Optional[str], result: List[Dict[str, Any]]) -> str:
+    """Template the answer for a knowledge base listing."""
+    documents = [d for d in result if "name" in d]
+    if not documents:
+        return "De knowledge base bevat geen documenten."
+    lines = [f"De knowledge base bevat {len(documents)} documenten:"]
+    lines += [f"- `{d['name']}` ({d.get('size') or 0} bytes)" for d in documents]
+    return "\n".join(lines)
+
+
+def _handlers() -> Dict[str, Any]:
+    """Map intents to (tool call, renderer, tool name); tools are imported lazily."""
+    from ..tools.knowledge.blob_storage import list_blobs_in_container
+    from ..tools.network.network_functions import get_nsg_rules, list_vm_nsg_associations
+    from ..tools.resource.cloud_resources import get_vm_status, list_vms_in_resource_group
+
+    async def vm_power_states() -> List[Dict[str, Any]]:
+        vms = await list_vms_in_resource_group()
+        if _has_error(vms):
+            return vms
+        statuses = await asyncio.gather(*(get_vm_status(vm_name=vm["name"]) for vm in vms))
+        return [{"name": vm["name"], **status} for vm, status in zip(vms, statuses)]
+
+    return {
+        "vm_status": (lambda e: get_vm_status(vm_name=e), _render_vm_status, "get_vm_status"),
+        "vm_nsg": (lambda e: list_vm_nsg_associations(vm_name=e), _render_vm_nsg, "list_vm_nsg_associations"),
+        "nsg_rules": (lambda e: get_nsg_rules(nsg_name=e), _render_nsg_rules, "get_nsg_rules"),
+        "list_vms": (lambda e: list_vms_in_resource_group(), _render_vm_list, "list_vms_in_resource_group"),
+        "vm_power_states": (lambda e: vm_power_states(), _render_vm_power_states, "get_vm_status"),
+        "list_documents": (lambda e: list_blobs_in_container(), _render_documents, "list_blobs_in_container"),
+    }
+
+
+class FastPathRouter(AgentMiddleware):
+    """Agent middleware that answers common read-only questions by calling the tool directly."""
+
+    def __init__(self, enabled: bool = router_enabled):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._handler_map: Optional[Dict[str, Any]] = None
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "hits": 0,
+            "fallthrough": 0,
+            "tool_errors": 0,
+            "hits_per_intent": {},
+            "fast_path_seconds": 0.0,
+            "llm_path_seconds": 0.0,
+            "llm_path_runs": 0,
+        }
+
+    async def _answer(self, route: Route) -> Optional[str]:
+        """Call the tool for a route and template the answer; None when the tool reports an error."""
+        if self._handler_map is None:
+            self._handler_map = _handlers()
+        call, render, _ = self._handler_map[route.intent]
+        result = await call(route.entity)
+        if _has_error(result):
+            return None
+        return render(route.entity, result)
+
+    def _record(self, key: str, seconds: float, intent: Optional[str] = None) -> None:
+        """Update the hit/latency statistics and export them as metrics."""
+        fast_path_requests.add(1, {"mcat.fast_path.outcome": key, "mcat.fast_path.intent": intent or "none"})
+        fast_path_duration.record(seconds, {"mcat.fast_path.path": "fast" if key == "hit" else "llm"})
+        with self._lock:
+            self.stats["requests"] += 1
+            if key == "hit":
+                self.stats["hits"] += 1
+                self.stats["fast_path_seconds"] += seconds
+                per_intent = self.stats["hits_per_intent"]
+                per_intent[intent] = per_intent.get(intent, 0) + 1
+            else:
+                self.stats[key] += 1
+                self.stats["llm_path_seconds"] += seconds
+                self.stats["llm_path_runs"] += 1
+
+    async def _measure_stream(
+        self, stream: AsyncIterable[AgentRunResponseUpdate], started: float, key: str, route: Optional[Route]
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        """Pass a streamed LLM response through while timing it to the end."""
+        async for update in stream:
+            yield update
+        self._record(key, time.perf_counter() - started, route.intent if route else None)
+
+    async def process(self, context: AgentRunContext, next: Callable[[AgentRunContext], Awaitable[None]]) -> None:
+        started = time.perf_counter()
+        last = context.messages[-1] if context.messages else None
+        route = None
+        if self.enabled and last is not None and last.role == Role.USER and all(isinstance(c, TextContent) for c in last.contents):
+            route = match_route(last.text)
+
+        answer = None
+        if route is not None:
+            try:
+                answer = await self._answer(route)
+            except Exception:
+                logger.warning("Fast path %s mislukt; door naar de LLM", route.intent, exc_info=True)
+            if answer is None:
+                fast_path_tool_errors.add(1, {"mcat.fast_path.intent": route.intent})
+                with self._lock:
+                    self.stats["tool_errors"] += 1
+
+        if answer is None:
+            await next(context)
+            if context.is_streaming and context.result is not None and hasattr(context.result, "__aiter__"):
+                context.result = self._measure_stream(context.result, started, "fallthrough", route)
+            else:
+                self._record("fallthrough", time.perf_counter() - started, route.intent if route else None)
+            return
+
+        tool_name = self._handler_map[route.intent][2]
+        message = ChatMessage(role=Role.ASSISTANT, text=f"{answer}\n\n_(direct opgehaald via {tool_name})_", author_name=context.agent.name)
+        if context.thread is not None:
+            await context.thread.on_new_messages([*context.messages, message])
+
+        if context.is_streaming:
+            async def stream() -> AsyncIterable[AgentRunResponseUpdate]:
+                yield AgentRunResponseUpdate(role=Role.ASSISTANT, contents=message.contents, author_name=message.author_name)
+
+            context.result = stream()
+        else:
+            context.result = AgentRunResponse(messages=[message])
+        self._record("hit", time.perf_counter() - started, route.intent)
+
+    def report(self) -> Dict[str, Any]:
+        """Return hit rate, hits per intent and the estimated latency saved by the fast path."""
+        with self._lock:
+            stats = dict(self.stats, hits_per_intent=dict(self.stats["hits_per_intent"]))
+        llm_avg = stats["llm_path_seconds"] / stats["llm_path_runs"] if stats["llm_path_runs"] else None
+        fast_avg = stats["fast_path_seconds"] / stats["hits"] if stats["hits"] else None
+        return {
+            "requests": stats["requests"],
+            "hits": stats["hits"],
+            "hit_rate": round(stats["hits"] / stats["requests"], 3) if stats["requests"] else 0.0,
+            "hits_per_intent": stats["hits_per_intent"],
+            "tool_errors": stats["tool_errors"],
+            "fast_path_avg_seconds": round(fast_avg, 3) if fast_avg is not None else None,
+            "llm_path_avg_seconds": round(llm_avg, 3) if llm_avg is not None else None,
+            # Geschat: elke hit had anders gemiddeld zo lang als een LLM run geduurd
+            "estimated_seconds_saved": round(stats["hits"] * (llm_avg - fast_avg), 1) if llm_avg and fast_avg is not None else None,
+        }
+
+
+fast_path_router = FastPathRouter()
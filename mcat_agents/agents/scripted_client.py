@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
+
+from agent_framework import (
+    BaseChatClient,
+    ChatMessage,
+    ChatResponse,
+    ChatResponseUpdate,
+    FunctionCallContent,
+    FunctionResultContent,
+    Role,
+    TextContent,
+    UsageContent,
+    UsageDetails,
+    use_chat_middleware,
+    use_function_invocation,
+)
+
+from ..middleware.compaction import estimate_tokens, serialize
+from ..telemetry import current_agent
+
+# Plan met tool calls en antwoorden per agent: een JSON bestand, of opnames (MCAT_RECORDING_PAYLOADS=1) als glob
+scripted_plan = os.getenv("MCAT_SCRIPTED_PLAN")
+# Gesimuleerde modeltijd: tijd tot het eerste token, per gegenereerd token en per prompt token (overschrijven het plan)
+first_token_ms = os.getenv("MCAT_SCRIPTED_FIRST_TOKEN_MS")
+token_latency_ms = os.getenv("MCAT_SCRIPTED_TOKEN_LATENCY_MS")
+prompt_token_latency_ms = os.getenv("MCAT_SCRIPTED_PROMPT_TOKEN_LATENCY_MS")
+# Aantal tokens per streaming update
+stream_chunk_tokens = 8
+# Gesimuleerde prompt cache zoals bij Azure OpenAI: een eerder gezien prefix vanaf 1024 tokens, in stappen van 128 tokens
+cache_min_tokens = 1024
+cache_block_tokens = 128
+cache_max_prefixes = 100_000
+
+
+def _is_recording(path: str) -> bool:
+    return ".jsonl" in path
+
+
+def plan_from_recordings(paths: List[str]) -> Dict[str, Any]:
+    """Build a plan from recorded sessions: one script per recorded agent hop, served in recorded order."""
+    from ..replay import load_sessions
+
+    agents: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for session in load_sessions(paths):
+        steps_per_hop: Dict[str, List[Dict[str, Any]]] = {}
+        for event in session.llm_calls:
+            response = ChatResponse.from_dict(event["response"])
+            calls = [
+                {"name": c.name, "arguments": c.parse_arguments() or {}}
+                for message in response.messages
+                for c in message.contents
+                if isinstance(c, FunctionCallContent)
+            ]
+            step: Dict[str, Any] = {"output_tokens": event.get("output_tokens")}
+            if calls:
+                step["tool_calls"] = calls
+            if response.text:
+                step["text"] = response.text
+            steps_per_hop.setdefault(event["hop"], []).append(step)
+        for hop, steps in steps_per_hop.items():
+            agents[session.hop_agents.get(hop, "unknown")].append({"steps": steps})
+    return {"agents": dict(agents)}
+
+
+def load_plan(source: Optional[str]) -> Dict[str, Any]:
+    """Load a plan from a JSON file or from recordings (a .jsonl/.jsonl.gz path or glob)."""
+    if not source:
+        return {"agents": {}}
+    if _is_recording(source):
+        return plan_from_recordings([source])
+    return json.loads(Path(source).read_text(encoding="utf-8"))
+
+
+def _last_user_text(messages: List[ChatMessage]) -> Tuple[str, int]:
+    """Text of the last user message with text, and its position (approval responses carry no text)."""
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if message.role == Role.USER and message.text:
+            return message.text, index
+    return "", -1
+
+
+def _prompt_text(messages: List[ChatMessage], chat_options: Any) -> str:
+    """The prompt as the provider sees it for prefix caching: tool schemas first, then the messages in order."""
+    parts = [serialize(tool.to_json_schema_spec()) for tool in getattr(chat_options, "tools", None) or [] if hasattr(tool, "to_json_schema_spec")]
+    for message in messages:
+        parts.append(f"{message.role}:{message.text or ''}")
+        for content in message.contents:
+            if isinstance(content, FunctionResultContent):
+                parts.append(serialize(content.result))
+            elif isinstance(content, FunctionCallContent):
+                parts.append(content.name + serialize(content.arguments))
+    return "".join(parts)
+
+
+@use_function_invocation
+@use_chat_middleware
+class ScriptedChatClient(BaseChatClient):
+    """Chat client that follows a scripted (or recorded) plan of tool calls and answers per agent, with simulated model latency.
+
+    Each agent's plan is a list of scripts; a script is the sequence of model responses for one run.
+    The first script whose `match` regex matches the run's user message is used, otherwise the scripts
+    are served in turn. Within a run, the n-th model call gets the n-th step. Simulated model time is
+    first_token_ms + output_tokens * token_latency_ms (+ uncached prompt_tokens * prompt_token_latency_ms)
+    and is tracked in `stats`, so callers can split end-to-end latency into model time and the rest.
+    Prompt tokens include the tool schemas; a simulated prefix cache reports cached prompt tokens the
+    way Azure OpenAI does (usage "prompt/cached_tokens").
+    """
+
+    def __init__(self, plan: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.plan = plan if plan is not None else load_plan(scripted_plan)
+        self.first_token_ms = float(first_token_ms if first_token_ms is not None else self.plan.get("first_token_ms", 0))
+        self.token_latency_ms = float(token_latency_ms if token_latency_ms is not None else self.plan.get("token_latency_ms", 0))
+        self.prompt_token_latency_ms = float(
+            prompt_token_latency_ms if prompt_token_latency_ms is not None else self.plan.get("prompt_token_latency_ms", 0)
+        )
+        self._turn: Dict[str, int] = defaultdict(int)
+        self._active: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._prefixes: set = set()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """Zero the counters of model calls, tokens and simulated model time."""
+        self.stats = {"calls": 0, "model_seconds": 0.0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "unscripted": 0}
+
+    def _prompt(self, messages: List[ChatMessage], chat_options: Any) -> Tuple[int, int]:
+        """Prompt tokens of a model call and how many of them the simulated prompt cache has seen before."""
+        text = _prompt_text(messages, chat_options)
+        if len(self._prefixes) > cache_max_prefixes:
+            self._prefixes.clear()
+        block = cache_block_tokens * 4
+        digest = hashlib.sha256()
+        cached = 0
+        # De hash na elk blok dekt het hele prefix tot dat blok, dus een hit betekent een identiek prefix
+        for end in range(block, len(text) + 1, block):
+            digest.update(text[end - block:end].encode("utf-8"))
+            key = digest.hexdigest()
+            if key in self._prefixes and end // 4 >= cache_min_tokens:
+                cached = end // 4
+            self._prefixes.add(key)
+        return estimate_tokens(text), cached
+
+    def _script(self, agent: str, user_text: str, position: int) -> Optional[Dict[str, Any]]:
+        """Script for the current run of an agent: chosen on the first model call, kept for the later ones."""
+        key = (agent, user_text)
+        if position > 0 and key in self._active:
+            return self._active[key]
+        scripts = self.plan.get("agents", {}).get(agent) or []
+        if not scripts:
+            return None
+        script = next((s for s in scripts if s.get("match") and re.search(s["match"], user_text, re.IGNORECASE)), None)
+        if script is None:
+            unmatched = [s for s in scripts if not s.get("match")] or scripts
+            script = unmatched[self._turn[agent] % len(unmatched)]
+            self._turn[agent] += 1
+        self._active[key] = script
+        return script
+
+    def _step(self, messages: List[ChatMessage]) -> Dict[str, Any]:
+        """Next step of the current run, from the number of tool-call rounds since the user message."""
+        agent = current_agent() or "unknown"
+        user_text, index = _last_user_text(messages)
+        position = sum(
+            1 for message in messages[index + 1:]
+            if message.role == Role.ASSISTANT and any(isinstance(c, FunctionCallContent) for c in message.contents)
+        )
+        script = self._script(agent, user_text, position)
+        steps = (script or {}).get("steps") or []
+        if position < len(steps):
+            return steps[position]
+        self.stats["unscripted"] += 1
+        return {"text": f"[scripted] geen stap {position + 1} in het plan van {agent}"}
+
+    def _response(self, step: Dict[str, Any], input_tokens: int, cached_tokens: int = 0) -> Tuple[ChatResponse, float]:
+        """Build the model response for a step and its simulated model time in seconds."""
+        contents: List[Any] = []
+        if step.get("text"):
+            contents.append(TextContent(text=step["text"]))
+        for call in step.get("tool_calls") or []:
+            contents.append(FunctionCallContent(
+                call_id=f"call_{uuid.uuid4().hex[:24]}",
+                name=call["name"],
+                arguments=json.dumps(call.get("arguments") or {}, ensure_ascii=False),
+            ))
+        output_tokens = step.get("output_tokens") or estimate_tokens(
+            (step.get("text") or "") + serialize(step.get("tool_calls") or [])
+        )
+        model_ms = (
+            self.first_token_ms
+            + output_tokens * self.token_latency_ms
+            + (input_tokens - cached_tokens) * self.prompt_token_latency_ms
+        )
+        cache_counts = {"prompt/cached_tokens": cached_tokens} if cached_tokens else {}
+        response = ChatResponse(
+            messages=[ChatMessage(role=Role.ASSISTANT, contents=contents)],
+            model_id="scripted",
+            usage_details=UsageDetails(
+                input_token_count=input_tokens,
+                output_token_count=output_tokens,
+                total_token_count=input_tokens + output_tokens,
+                **cache_counts,
+            ),
+        )
+        self.stats["calls"] += 1
+        self.stats["input_tokens"] += input_tokens
+        self.stats["cached_tokens"] += cached_tokens
+        self.stats["output_tokens"] += output_tokens
+        return response, model_ms / 1000
+
+    async def _sleep(self, seconds: float) -> None:
+        """Wait simulated model time, accounting what was actually slept."""
+        if seconds <= 0:
+            return
+        started = time.perf_counter()
+        await asyncio.sleep(seconds)
+        self.stats["model_seconds"] += time.perf_counter() - started
+
+    async def _inner_get_response(self, *, messages: Any, chat_options: Any, **kwargs: Any) -> ChatResponse:
+        response, model_seconds = self._response(self._step(messages), *self._prompt(messages, chat_options))
+        await self._sleep(model_seconds)
+        return response
+
+    async def _inner_get_streaming_response(
+        self, *, messages: Any, chat_options: Any, **kwargs: Any
+    ) -> AsyncIterable[ChatResponseUpdate]:
+        step = self._step(messages)
+        response, model_seconds = self._response(step, *self._prompt(messages, chat_options))
+        usage = response.usage_details
+        text = step.get("text") or ""
+        per_token = self.token_latency_ms / 1000
+
+        # Eerst de tijd tot het eerste token, daarna de tekst in stukken met de tijd per token
+        await self._sleep(model_seconds - (usage.output_token_count or 0) * per_token)
+        chunk_chars = stream_chunk_tokens * 4
+        for start in range(0, len(text), chunk_chars):
+            chunk = text[start:start + chunk_chars]
+            await self._sleep(estimate_tokens(chunk) * per_token)
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[TextContent(text=chunk)], model_id="scripted")
+
+        calls = [c for c in response.messages[0].contents if isinstance(c, FunctionCallContent)]
+        if calls:
+            await self._sleep(max((usage.output_token_count or 0) - estimate_tokens(text), 0) * per_token)
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=calls, model_id="scripted")
+        yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[UsageContent(details=usage)], model_id="scripted")
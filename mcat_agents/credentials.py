@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scopes van de Azure services die de agents gebruiken
+arm_scope = "https://management.azure.com/.default"
+cognitive_services_scope = "https://cognitiveservices.azure.com/.default"
+storage_scope = "https://storage.azure.com/.default"
+search_scope = "https://search.azure.com/.default"
+
+# Tokens worden zoveel seconden voor het verlopen op de achtergrond vernieuwd
+# (ruim boven de 300 seconden waarop de azure-core pipeline zelf een nieuw token vraagt)
+refresh_margin_seconds = float(os.getenv("AZURE_TOKEN_REFRESH_MARGIN", "600"))
+retry_seconds = 30.0
+
+_CacheKey = Tuple[Tuple[str, ...], Optional[str]]
+
+
+class SharedTokenCredential:
+    """One credential chain for all clients, with tokens cached per scope and refreshed in the background."""
+
+    def __init__(self, credential_factory: Callable[[], Any], refresh_margin: float = refresh_margin_seconds):
+        self._credential_factory = credential_factory
+        self._credential: Optional[Any] = None
+        self._refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._fetch_locks: Dict[_CacheKey, threading.Lock] = {}
+        self._tokens: Dict[_CacheKey, Any] = {}
+        self._refresh_at: Dict[_CacheKey, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_failures": 0}
+
+    def _inner(self) -> Any:
+        """Create the wrapped credential chain on first use."""
+        with self._lock:
+            if self._credential is None:
+                self._credential = self._credential_factory()
+            return self._credential
+
+    def _fetch(self, key: _CacheKey) -> Any:
+        """Acquire a token from the credential chain, as AccessTokenInfo when supported."""
+        scopes, tenant_id = key
+        inner = self._inner()
+        if hasattr(inner, "get_token_info"):
+            options = {"tenant_id": tenant_id} if tenant_id else None
+            return inner.get_token_info(*scopes, options=options)
+        return inner.get_token(*scopes, tenant_id=tenant_id) if tenant_id else inner.get_token(*scopes)
+
+    def _schedule(self, key: _CacheKey, token: Any) -> None:
+        """Store a token and plan its refresh before it expires (or at the server-provided refresh_on)."""
+        refresh_at = token.expires_on - self._refresh_margin
+        refresh_on = getattr(token, "refresh_on", None)
+        if refresh_on:
+            refresh_at = min(refresh_at, refresh_on)
+        with self._condition:
+            self._tokens[key] = token
+            self._refresh_at[key] = max(refresh_at, time.time() + retry_seconds)
+            self._ensure_worker()
+            self._condition.notify_all()
+
+    def _token_for(self, key: _CacheKey) -> Any:
+        """Return a cached, unexpired token or fetch one (once per scope, even under concurrency)."""
+        token = self._tokens.get(key)
+        if token is not None and token.expires_on - time.time() > 60:
+            self.stats["hits"] += 1
+            return token
+
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(key, threading.Lock())
+        with fetch_lock:
+            token = self._tokens.get(key)
+            if token is not None and token.expires_on - time.time() > 60:
+                self.stats["hits"] += 1
+                return token
+            self.stats["misses"] += 1
+            token = self._fetch(key)
+            self._schedule(key, token)
+            return token
+
+    def get_token(self, *scopes: str, claims: Optional[str] = None, tenant_id: Optional[str] = None, **kwargs: Any) -> Any:
+        """TokenCredential protocol: return a cached AccessToken for the scopes."""
+        from azure.core.credentials import AccessToken
+
+        if claims:
+            # Claims challenges (CAE) altijd rechtstreeks naar de credential chain
+            return self._inner().get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+        token = self._token_for((tuple(sorted(scopes)), tenant_id))
+        return AccessToken(token.token, token.expires_on)
+
+    def get_token_info(self, *scopes: str, options: Optional[Dict[str, Any]] = None) -> Any:
+        """SupportsTokenInfo protocol: return a cached AccessTokenInfo for the scopes."""
+        from azure.core.credentials import AccessTokenInfo
+
+        options = options or {}
+        if options.get("claims"):
+            return self._inner().get_token_info(*scopes, options=options)
+        token = self._token_for((tuple(sorted(scopes)), options.get("tenant_id")))
+        if isinstance(token, AccessTokenInfo):
+            return token
+        return AccessTokenInfo(token.token, token.expires_on)
+
+    def token_provider(self, scope: str) -> Callable[[], Awaitable[str]]:
+        """Return an async bearer token provider, e.g. for the OpenAI client's azure_ad_token_provider."""
+        key: _CacheKey = ((scope,), None)
+
+        async def provide() -> str:
+            token = self._tokens.get(key)
+            if token is not None and token.expires_on - time.time() > 60:
+                self.stats["hits"] += 1
+                return token.token
+            # Cache miss: niet de event loop blokkeren tijdens het ophalen
+            return (await asyncio.to_thread(self._token_for, key)).token
+
+        return provide
+
+    def _ensure_worker(self) -> None:
+        """Start the background refresh thread on first use (caller holds the condition)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="azure-token-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Refresh loop: sleep until the earliest planned refresh, then renew that scope's token."""
+        while True:
+            with self._condition:
+                while True:
+                    if self._refresh_at:
+                        key, when = min(self._refresh_at.items(), key=lambda item: item[1])
+                        delay = when - time.time()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(timeout=delay)
+                    else:
+                        self._condition.wait()
+
+            try:
+                self._schedule(key, self._fetch(key))
+                self.stats["refreshes"] += 1
+            except Exception:
+                self.stats["refresh_failures"] += 1
+                logger.warning("Vernieuwen van token voor %s mislukt; nieuwe poging volgt", key[0], exc_info=True)
+                with self._condition:
+                    self._refresh_at[key] = time.time() + retry_seconds * random.uniform(0.5, 1.5)
+
+    def warm_up(self, scopes: Iterable[str], background: bool = True) -> Optional[threading.Thread]:
+        """Acquire tokens for the given scopes ahead of the first request, by default without blocking startup."""
+        def acquire() -> None:
+            for scope in scopes:
+                try:
+                    self._token_for(((scope,), None))
+                except Exception:
+                    logger.warning("Token warm-up voor %s mislukt", scope, exc_info=True)
+
+        if not background:
+            acquire()
+            return None
+        thread = threading.Thread(target=acquire, name="azure-token-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+def _default_azure_credential() -> Any:
+    """Create the DefaultAzureCredential chain (imported lazily)."""
+    from azure.identity import DefaultAzureCredential
+
+    return DefaultAzureCredential()
+
+
+@lru_cache(maxsize=1)
+def shared_credential() -> SharedTokenCredential:
+    """Return the process-wide credential used by the chat client and all tool modules."""
+    return SharedTokenCredential(_default_azure_credential)
+
+
+def configured_scopes() -> Iterable[str]:
+    """Return the scopes that will actually be requested with token auth, given the configured keys."""
+    scopes = [arm_scope]
+    if not os.getenv("AZURE_OPENAI_API_KEY"):
+        scopes.append(cognitive_services_scope)
+    if not os.getenv("AZURE_STORAGE_ACCOUNT_KEY"):
+        scopes.append(storage_scope)
+    if not os.getenv("AI_SEARCH_API_KEY"):
+        scopes.append(search_scope)
+    return scopes
+
+
+def warm_up(background: bool = True) -> Optional[threading.Thread]:
+    """Prefetch tokens for every configured scope at startup."""
+    return shared_credential().warm_up(configured_scopes(), background=background)
@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agent_framework import (
+    ChatMessage,
+    FunctionCallContent,
+    FunctionInvocationContext,
+    FunctionMiddleware,
+    FunctionResultContent,
+)
+
+from ..telemetry import current_agent, tool_result_tokens
+
+logger = logging.getLogger(__name__)
+
+# Maximale grootte van een tool resultaat in de prompt (geschat in tokens); 0 schakelt compactie uit
+token_budget = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "4000"))
+# Lijsten met minstens zoveel gelijkvormige records worden als tabel (columns + rows) weergegeven
+table_min_rows = 2
+table_max_cell_chars = 200
+
+_resource_id_pattern = re.compile(r"^/subscriptions/[^/]+/resourceGroups/[^/]+/providers/.+/([^/]+)$", re.IGNORECASE)
+_empty = (None, "", [], {})
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of serialised text (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def serialize(value: Any) -> str:
+    """Serialise a tool result the compact way it is sent to the model."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def prompt_tokens(messages: List[ChatMessage]) -> int:
+    """Rough prompt size: message text plus tool calls and tool results."""
+    parts: List[str] = []
+    for message in messages:
+        parts.append(message.text or "")
+        for content in message.contents:
+            if isinstance(content, FunctionResultContent):
+                parts.append(serialize(content.result))
+            elif isinstance(content, FunctionCallContent):
+                parts.append(content.name + serialize(content.arguments))
+    return estimate_tokens("".join(parts))
+
+
+def _shorten_id(value: Any) -> Any:
+    """Replace a full Azure resource ID by the resource name."""
+    if isinstance(value, str):
+        match = _resource_id_pattern.match(value)
+        if match:
+            return match.group(1)
+    return value
+
+
+def _is_table_cell(value: Any) -> bool:
+    """Check whether a value fits in a table cell: a short scalar or a short list of scalars."""
+    if isinstance(value, (list, tuple)):
+        return all(_is_table_cell(v) and not isinstance(v, (list, tuple)) for v in value)
+    if isinstance(value, str):
+        return "\n" not in value and len(value) <= table_max_cell_chars
+    return value is None or isinstance(value, (int, float, bool))
+
+
+def _as_table(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Render a list of flat records as {"columns", "rows"}, or None when the records do not fit a table."""
+    if len(records) < table_min_rows or not all(isinstance(r, dict) and r for r in records):
+        return None
+    if not all(_is_table_cell(v) for r in records for v in r.values()):
+        return None
+
+    columns: List[str] = []
+    for record in records:
+        columns.extend(k for k in record if k not in columns)
+    rows = [
+        [",".join(map(str, cell)) if isinstance(cell, (list, tuple)) else cell for cell in (r.get(c) for c in columns)]
+        for r in records
+    ]
+    table: Dict[str, Any] = {"columns": columns, "rows": rows}
+
+    # Kolommen met dezelfde waarde in elke rij één keer noemen in plaats van per rij
+    if len(rows) > table_min_rows:
+        constant = [i for i, c in enumerate(columns) if len({repr(row[i]) for row in rows}) == 1 and rows[0][i] is not None]
+        if constant and len(constant) < len(columns):
+            table["same_for_all_rows"] = {columns[i]: rows[0][i] for i in constant}
+            table["columns"] = [c for i, c in enumerate(columns) if i not in constant]
+            table["rows"] = [[v for i, v in enumerate(row) if i not in constant] for row in rows]
+    return table
+
+
+def compact(value: Any) -> Any:
+    """Drop empty fields, shorten resource IDs to names and turn uniform record lists into tables."""
+    if isinstance(value, dict):
+        result: Dict[str, Any] = {}
+        for key, item in value.items():
+            item = compact(item)
+            if item in _empty:
+                continue
+            result[key] = item
+        # Een resource ID dat na inkorten gelijk is aan de naam in hetzelfde record voegt niets toe
+        for key in [k for k in result if k == "id" or k.endswith("_id")]:
+            shortened = isinstance(value[key], str) and _shorten_id(value[key]) != value[key]
+            if shortened and result[key] == result.get("name"):
+                del result[key]
+        return result
+    if isinstance(value, (list, tuple)):
+        items = [compact(v) for v in value]
+        items = [v for v in items if v not in _empty]
+        table = _as_table(items)
+        return table if table is not None else items
+    return _shorten_id(value)
+
+
+def _truncate(value: Any, max_chars: int, max_items: int) -> Any:
+    """Cut long strings and long lists (table rows included), noting how much was left out."""
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return value[:max_chars] + f"… [{len(value) - max_chars} tekens ingekort]"
+    if isinstance(value, dict):
+        if "columns" in value and "rows" in value and len(value["rows"]) > max_items:
+            return {**value, "rows": value["rows"][:max_items], "rows_truncated": len(value["rows"]) - max_items}
+        return {k: _truncate(v, max_chars, max_items) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [_truncate(v, max_chars, max_items) for v in value[:max_items]]
+        if len(value) > max_items:
+            items.append({"truncated": f"{len(value) - max_items} van {len(value)} items weggelaten"})
+        return items
+    return value
+
+
+def fit_budget(value: Any, budget: int) -> Any:
+    """Shrink a compacted value step by step until its serialisation fits the token budget."""
+    if budget <= 0 or estimate_tokens(serialize(value)) <= budget:
+        return value
+    for max_chars, max_items in ((4000, 50), (2000, 25), (1000, 15), (500, 10), (250, 5), (120, 3)):
+        shrunk = _truncate(value, max_chars, max_items)
+        if estimate_tokens(serialize(shrunk)) <= budget:
+            return shrunk
+    text = serialize(value)
+    keep = budget * 4
+    return text[:keep] + f"… [resultaat ingekort tot ~{budget} tokens van ~{estimate_tokens(text)}]"
+
+
+class ToolResultCompaction(FunctionMiddleware):
+    """Function middleware that compacts every tool result before it is added to the prompt."""
+
+    def __init__(self, budget: int = token_budget, budgets: Optional[Dict[str, int]] = None):
+        self.budget = budget
+        self.budgets = budgets or {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    async def process(
+        self,
+        context: FunctionInvocationContext,
+        next: Callable[[FunctionInvocationContext], Awaitable[None]],
+    ) -> None:
+        await next(context)
+        if self.budget <= 0 or context.result is None:
+            return
+
+        try:
+            name = context.function.name
+            # Vergelijken met hoe het framework het resultaat zonder compactie zou serialiseren
+            original = context.result if isinstance(context.result, str) else json.dumps(context.result, default=str)
+            before = estimate_tokens(original)
+            compacted = fit_budget(compact(context.result), self.budgets.get(name, self.budget))
+            text = serialize(compacted)
+            after = estimate_tokens(text)
+        except Exception:
+            logger.exception("Compactie van tool resultaat mislukt; origineel resultaat wordt gebruikt")
+            return
+
+        if after < before:
+            context.result = text
+        attributes = {"mcat.tool.name": name, "mcat.agent.name": current_agent() or "unknown"}
+        tool_result_tokens.add(before, {**attributes, "mcat.prompt.stage": "before"})
+        tool_result_tokens.add(min(after, before), {**attributes, "mcat.prompt.stage": "after"})
+        with self._lock:
+            entry = self.stats.setdefault(name, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+            entry["calls"] += 1
+            entry["tokens_before"] += before
+            entry["tokens_after"] += min(after, before)
+        logger.debug("Tool %s: ~%d → ~%d tokens", name, before, min(after, before))
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Return per-tool call counts and estimated tokens before/after compaction and saved."""
+        with self._lock:
+            return {
+                name: {**entry, "tokens_saved": entry["tokens_before"] - entry["tokens_after"]}
+                for name, entry in self.stats.items()
+            }
+
+
+tool_result_compaction = ToolResultCompaction()
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agent_framework import ChatContext, ChatMessage, ChatMiddleware, FunctionCallContent, FunctionResultContent, Role
+
+from .compaction import estimate_tokens, prompt_tokens, serialize
+from ..telemetry import current_agent, prompt_size
+
+logger = logging.getLogger(__name__)
+
+# Boven deze geschatte prompt grootte worden oude tool resultaten samengevat; 0 schakelt history compactie uit
+token_threshold = int(os.getenv("HISTORY_TOKEN_THRESHOLD", "6000"))
+# De laatste zoveel beurten van de engineer blijven altijd volledig
+keep_turns = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+# Aantal originele resultaten dat via retrieve_tool_output op te halen blijft (per proces)
+store_max_entries = int(os.getenv("HISTORY_STORE_MAX_ENTRIES", "500"))
+summary_chars = 240
+fact_chars = 80
+# Kleinere resultaten zijn al ongeveer zo kort als hun samenvatting
+min_result_tokens = 60
+
+# Velden die aangeven waar een resultaat over gaat; de eerste die voorkomt wordt het onderwerp van de samenvatting
+_subject_keys = ("vm_name", "nsg_name", "blob_name", "name", "agent")
+_summary_prefix = "[samengevat"
+
+
+class OutputStore:
+    """Bounded, process-local store of tool outputs that were replaced by a summary in the prompt, by reference."""
+
+    def __init__(self, max_entries: int = store_max_entries):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._references: Dict[str, str] = {}
+
+    def put(self, call_id: str, tool: str, arguments: Any, result: Any) -> str:
+        """Keep the original output of a tool call and return its reference (the same one for every later prompt)."""
+        with self._lock:
+            reference = self._references.get(call_id)
+            if reference is not None and reference in self._entries:
+                self._entries.move_to_end(reference)
+                return reference
+            reference = f"out-{uuid.uuid4().hex[:10]}"
+            self._references[call_id] = reference
+            self._entries[reference] = {"reference": reference, "tool": tool, "arguments": arguments, "result": result}
+            while len(self._entries) > self._max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._references = {c: r for c, r in self._references.items() if r != evicted}
+            return reference
+
+    def get(self, reference: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(reference)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def _parse(result: Any) -> Any:
+    """Tool results arrive as compacted JSON text (see compaction.py); text answers of sub-agents stay text."""
+    if isinstance(result, str) and result[:1] in ("{", "["):
+        try:
+            return json.loads(result)
+        except ValueError:
+            return result
+    return result
+
+
+def _summarize_value(value: Any, depth: int = 0) -> str:
+    """One-line summary of a tool result: its subject, its scalar facts and the size of its lists."""
+    if isinstance(value, dict):
+        if "error" in value:
+            return f"fout: {_clip(str(value['error']), fact_chars * 2)}"
+        if "columns" in value and "rows" in value:
+            # Tabel uit compaction.py: terug naar records zodat elke rij zijn eigen samenvatting krijgt
+            same = value.get("same_for_all_rows") or {}
+            records = [{**same, **dict(zip(value["columns"], row))} for row in value["rows"]]
+            return _summarize_value(records, depth)
+        subject = next((value[k] for k in _subject_keys if isinstance(value.get(k), str)), None)
+        facts: List[str] = []
+        for key, item in value.items():
+            if item is subject or item is None:
+                continue
+            if isinstance(item, (bool, int, float)):
+                facts.append(f"{key}={json.dumps(item)}")
+            elif isinstance(item, str):
+                facts.append(f"{key}={_clip(item, fact_chars)}")
+            elif isinstance(item, list):
+                facts.append(f"{key}: {len(item)}")
+            elif isinstance(item, dict) and depth == 0:
+                facts.append(f"{key}: ({_summarize_value(item, depth + 1)})")
+        text = ", ".join(facts)
+        return f"{subject}: {text}" if subject else text
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value) and depth == 0:
+            # Elk record een gelijk deel van de samenvatting
+            share = max(summary_chars // min(len(value), 5), fact_chars)
+            parts = [_clip(_summarize_value(item, depth + 1), share) for item in value[:5]]
+            if len(value) > 5:
+                parts.append(f"… nog {len(value) - 5}")
+            return "; ".join(parts)
+        return f"{len(value)} items"
+    return _clip(str(value), summary_chars)
+
+
+def summarize(tool: str, result: Any) -> str:
+    """Structured one-line summary of a tool output, e.g. "check_nsg_port_allow NSG-Authenticatie: port=22, allowed=false, matching_rules: 0"."""
+    return _clip(f"{tool} {_summarize_value(_parse(result))}", summary_chars)
+
+
+def _keep_from(messages: List[ChatMessage], turns: int) -> int:
+    """Index of the first message of the last `turns` user turns (approval responses carry no text and are no turn)."""
+    seen = 0
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if message.role == Role.USER and message.text:
+            seen += 1
+            if seen >= turns:
+                return index
+    return 0
+
+
+class HistoryCompaction(ChatMiddleware):
+    """Chat middleware that replaces old tool outputs in a long conversation by short summaries before each model call.
+
+    Once the estimated prompt passes the threshold, tool results from before the last `keep_turns`
+    turns are summarised, oldest first, until the prompt fits again. The originals stay retrievable by
+    reference with the retrieve_tool_output tool. The thread itself keeps the full results: every model
+    call gets a compacted copy, with the same reference for the same call, so the prompt stays stable.
+    """
+
+    def __init__(self, threshold: int = token_threshold, turns: int = keep_turns, store: Optional[OutputStore] = None):
+        self.threshold = threshold
+        self.turns = max(turns, 1)
+        self.store = store or output_store
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def compact(self, messages: List[ChatMessage], tokens: int) -> Tuple[List[ChatMessage], int, int]:
+        """Summarise old tool results until the prompt fits; returns the messages, their tokens and the number of results summarised."""
+        calls = {
+            content.call_id: content
+            for message in messages
+            for content in message.contents
+            if isinstance(content, FunctionCallContent)
+        }
+        compacted = list(messages)
+        summarized = 0
+        for index in range(_keep_from(messages, self.turns)):
+            if tokens <= self.threshold:
+                break
+            message = messages[index]
+            contents: List[Any] = []
+            changed = False
+            for content in message.contents:
+                if isinstance(content, FunctionResultContent) and content.exception is None:
+                    text = serialize(content.result) if content.result is not None else ""
+                    original = estimate_tokens(text)
+                    if tokens > self.threshold and original >= min_result_tokens and not text.startswith(_summary_prefix):
+                        call = calls.get(content.call_id)
+                        tool = call.name if call is not None else "tool"
+                        arguments = call.parse_arguments() if call is not None else None
+                        reference = self.store.put(content.call_id, tool, arguments, content.result)
+                        summary = f'{_summary_prefix}; origineel via retrieve_tool_output("{reference}")] {summarize(tool, content.result)}'
+                        tokens -= original - estimate_tokens(summary)
+                        summarized += 1
+                        content = FunctionResultContent(call_id=content.call_id, result=summary)
+                        changed = True
+                contents.append(content)
+            if changed:
+                # Een kopie: het bericht in de thread houdt het volledige resultaat
+                compacted[index] = ChatMessage(
+                    role=message.role,
+                    contents=contents,
+                    author_name=message.author_name,
+                    message_id=message.message_id,
+                )
+        return compacted, tokens, summarized
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        if self.threshold <= 0:
+            await next(context)
+            return
+
+        agent = current_agent() or "unknown"
+        try:
+            before = prompt_tokens(context.messages)
+            after, summarized = before, 0
+            if before > self.threshold:
+                messages, after, summarized = self.compact(list(context.messages), before)
+                if summarized:
+                    context.messages = messages
+        except Exception:
+            logger.exception("History compactie mislukt; volledige geschiedenis wordt gebruikt")
+            await next(context)
+            return
+
+        prompt_size.record(before, {"mcat.agent.name": agent, "mcat.prompt.stage": "before"})
+        prompt_size.record(after, {"mcat.agent.name": agent, "mcat.prompt.stage": "after"})
+        with self._lock:
+            entry = self.stats.setdefault(
+                agent, {"calls": 0, "compacted_calls": 0, "results_summarized": 0, "tokens_before": 0, "tokens_after": 0}
+            )
+            entry["calls"] += 1
+            entry["compacted_calls"] += 1 if summarized else 0
+            entry["results_summarized"] += summarized
+            entry["tokens_before"] += before
+            entry["tokens_after"] += after
+        if summarized:
+            logger.debug("History van %s: %d resultaten samengevat, ~%d → ~%d tokens", agent, summarized, before, after)
+        await next(context)
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Return per-agent model calls and estimated prompt tokens before/after history compaction and saved."""
+        with self._lock:
+            return {
+                agent: {**entry, "tokens_saved": entry["tokens_before"] - entry["tokens_after"]}
+                for agent, entry in self.stats.items()
+            }
+
+
+output_store = OutputStore()
+history_compaction = HistoryCompaction()
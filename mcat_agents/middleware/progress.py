@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterable, Awaitable, Callable, Optional
+
+from agent_framework import (
+    AgentMiddleware,
+    AgentRunContext,
+    AgentRunResponseUpdate,
+    FunctionInvocationContext,
+    FunctionMiddleware,
+    Role,
+    TextReasoningContent,
+)
+
+
+class ProgressChannel:
+    """Queue of progress updates for one streaming run; safe to publish to from worker threads."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._thread_id = threading.get_ident()
+
+    def publish(self, item: Any) -> None:
+        """Put an item on the queue from the event loop thread or from any other thread."""
+        if threading.get_ident() == self._thread_id:
+            self.queue.put_nowait(item)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+
+# Het kanaal van de streaming run waarbinnen de huidige (sub-)agent of tool draait
+_channel: ContextVar[Optional[ProgressChannel]] = ContextVar("mcat_progress_channel", default=None)
+_done = object()
+
+
+def streaming_active() -> bool:
+    """Whether the current code runs inside a streaming run that forwards progress."""
+    return _channel.get() is not None
+
+
+def publish_update(update: AgentRunResponseUpdate) -> None:
+    """Forward an update to the engineer's streaming session, if there is one."""
+    channel = _channel.get()
+    if channel is not None:
+        channel.publish(update)
+
+
+def report_progress(text: str, source: Optional[str] = None) -> None:
+    """Report a progress line (shown as reasoning, so it never becomes part of the final answer)."""
+    if _channel.get() is None:
+        return
+    prefix = f"[{source}] " if source else ""
+    publish_update(AgentRunResponseUpdate(
+        role=Role.ASSISTANT,
+        contents=[TextReasoningContent(text=f"{prefix}{text}\n")],
+        author_name=source,
+    ))
+
+
+class ToolProgressEvents(FunctionMiddleware):
+    """Function middleware that reports tool-started and tool-finished events to the streaming session.
+
+    List it after tool_result_compaction, so it is the inner layer and sees the raw result: compaction
+    can turn an {"error": ...} dict into a JSON string.
+    """
+
+    async def process(
+        self,
+        context: FunctionInvocationContext,
+        next: Callable[[FunctionInvocationContext], Awaitable[None]],
+    ) -> None:
+        if not streaming_active():
+            await next(context)
+            return
+
+        name = context.function.name
+        report_progress(f"▶ {name} gestart")
+        started = time.perf_counter()
+        try:
+            await next(context)
+        except Exception:
+            report_progress(f"✗ {name} mislukt na {time.perf_counter() - started:.1f}s")
+            raise
+        failed = isinstance(context.result, dict) and "error" in context.result
+        status = "✗ {} gaf een fout" if failed else "✓ {} klaar"
+        report_progress(f"{status.format(name)} ({time.perf_counter() - started:.1f}s)")
+
+
+class ProgressStreaming(AgentMiddleware):
+    """Agent middleware that merges progress from sub-agents and tools into a streaming run.
+
+    Non-streaming runs and runs nested inside another streaming run are passed through unchanged;
+    the outermost streaming run owns the channel.
+    """
+
+    async def process(self, context: AgentRunContext, next: Callable[[AgentRunContext], Awaitable[None]]) -> None:
+        await next(context)
+        if not context.is_streaming or streaming_active():
+            return
+        if context.result is None or not hasattr(context.result, "__aiter__"):
+            return
+        context.result = self._merge(context.result)
+
+    async def _merge(self, stream: AsyncIterable[AgentRunResponseUpdate]) -> AsyncIterable[AgentRunResponseUpdate]:
+        """Yield the run's own updates interleaved with progress published while it runs."""
+        channel = ProgressChannel()
+
+        async def pump() -> None:
+            # De taak heeft een eigen kopie van de context: het kanaal lekt niet naar de aanroeper
+            _channel.set(channel)
+            try:
+                async for update in stream:
+                    channel.queue.put_nowait(update)
+            except BaseException as e:
+                channel.queue.put_nowait(e)
+                raise
+            finally:
+                channel.queue.put_nowait(_done)
+
+        task = asyncio.create_task(pump())
+        try:
+            while True:
+                item = await channel.queue.get()
+                if item is _done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            if not task.done():
+                task.cancel()
+            # Een fout van de run is hierboven al doorgegeven
+            await asyncio.gather(task, return_exceptions=True)
+
+
+tool_progress_events = ToolProgressEvents()
+progress_streaming = ProgressStreaming()
@@ -0,0 +1,169 @@
+import copy
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agent_framework import ChatContext, ChatMessage, ChatMiddleware, FunctionCallContent, Role, UsageContent
+
+from .compaction import estimate_tokens, prompt_tokens, serialize
+from ..telemetry import current_agent, model_cached_tokens, model_input_tokens
+
+logger = logging.getLogger(__name__)
+
+profiles_enabled = os.getenv("TOOL_PROFILES_ENABLED", "1") != "0"
+# Waar providers het aantal tokens uit de prompt cache teruggeven: chat completions en de responses API
+cached_token_keys = ("prompt/cached_tokens", "openai.cached_input_tokens")
+# Profielnaam als het model alle tools van de agent krijgt
+all_tools = "all"
+
+
+@dataclass(frozen=True)
+class ToolProfile:
+    """A fixed subset of an agent's tools for one kind of request, chosen when `pattern` matches the task."""
+
+    name: str
+    pattern: str
+    tools: Tuple[str, ...]
+
+
+def _task(messages: List[ChatMessage]) -> Tuple[str, int]:
+    """Text of the run's task (the last user message with text) and its position; approval responses carry no text."""
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if message.role == Role.USER and message.text:
+            return message.text, index
+    return "", -1
+
+
+def usage_tokens(usage: Any) -> Tuple[Optional[int], int]:
+    """Prompt tokens and prompt tokens read from the provider's prompt cache, from a response's usage details."""
+    if usage is None:
+        return None, 0
+    counts = getattr(usage, "additional_counts", None) or {}
+    cached = next((counts[key] for key in cached_token_keys if counts.get(key)), 0)
+    return usage.input_token_count, cached
+
+
+class ToolProfiles(ChatMiddleware):
+    """Chat middleware that sends the model only the tools of the profiles that match the run's task.
+
+    A cheap local classifier (one regex per profile) picks the profiles once per task, so every model
+    call of a run gets the same tools, in the agent's own order. The profiles are fixed subsets, which
+    keeps the prompt prefix identical for every request of the same kind and so reusable by the
+    provider's prompt cache; the instructions are deliberately not trimmed per profile for the same
+    reason. No match, or a call to a tool outside the profile (the instructions name every tool),
+    means all tools. The tools still run from the full set, so such a call does not fail.
+    Per profile it tracks model calls, prompt tokens, tool schema tokens and prompt cache hits.
+    """
+
+    def __init__(self, profiles: List[ToolProfile], enabled: bool = profiles_enabled):
+        self.profiles = profiles
+        self.enabled = enabled
+        self._patterns = [(profile, re.compile(profile.pattern, re.IGNORECASE)) for profile in profiles]
+        self._schema_tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def classify(self, task: str) -> List[ToolProfile]:
+        """Profiles whose pattern matches the task."""
+        return [profile for profile, pattern in self._patterns if pattern.search(task)]
+
+    def select(self, messages: List[ChatMessage], tools: List[Any]) -> Tuple[str, List[Any]]:
+        """Profile name and tools for a model call: the union of the matching profiles, or all tools."""
+        if not self.enabled or not tools:
+            return all_tools, tools
+        task, index = _task(messages)
+        matched = self.classify(task)
+        if not matched:
+            return all_tools, tools
+        names = set().union(*(profile.tools for profile in matched))
+        called = {
+            content.name
+            for message in messages[index + 1:]
+            for content in message.contents
+            if isinstance(content, FunctionCallContent)
+        }
+        if called - names:
+            return all_tools, tools
+        return "+".join(profile.name for profile in matched), [t for t in tools if getattr(t, "name", None) in names]
+
+    def schema_tokens(self, tools: List[Any]) -> int:
+        """Estimated prompt tokens of the tool schemas, computed once per tool."""
+        total = 0
+        for tool in tools:
+            name = getattr(tool, "name", None)
+            if name is None or not hasattr(tool, "to_json_schema_spec"):
+                continue
+            if name not in self._schema_tokens:
+                self._schema_tokens[name] = estimate_tokens(serialize(tool.to_json_schema_spec()))
+            total += self._schema_tokens[name]
+        return total
+
+    def _record(self, agent: str, profile: str, estimate: int, schema: int, schema_all: int, usage: Any) -> None:
+        """Record one model call; the provider's token count when it reports one, otherwise the estimate."""
+        input_tokens, cached = usage_tokens(usage)
+        input_tokens = input_tokens or estimate
+        attributes = {"mcat.agent.name": agent, "mcat.tool.profile": profile}
+        model_input_tokens.add(input_tokens, attributes)
+        model_cached_tokens.add(cached, attributes)
+        with self._lock:
+            entry = self.stats.setdefault(agent, {}).setdefault(
+                profile, {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "schema_tokens": 0, "schema_tokens_saved": 0}
+            )
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["cached_tokens"] += cached
+            entry["schema_tokens"] += schema
+            entry["schema_tokens_saved"] += schema_all - schema
+
+    async def _observe_stream(self, stream: AsyncIterable[Any], record: Callable[[Any], None]) -> AsyncIterable[Any]:
+        """Pass a streamed response through and record its usage at the end."""
+        usage = None
+        async for update in stream:
+            for content in update.contents:
+                if isinstance(content, UsageContent):
+                    usage = content.details
+            yield update
+        record(usage)
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        agent = current_agent() or "unknown"
+        tools = list(context.chat_options.tools or [])
+        profile, selected = self.select(context.messages, tools)
+        if len(selected) < len(tools):
+            # Een kopie: de function invocation laag voert tool calls uit met de volledige set
+            options = copy.copy(context.chat_options)
+            options.tools = selected
+            context.chat_options = options
+            logger.debug("%s: profiel %s, %d van %d tools", agent, profile, len(selected), len(tools))
+
+        schema = self.schema_tokens(selected)
+        schema_all = self.schema_tokens(tools)
+        estimate = prompt_tokens(context.messages) + estimate_tokens(context.chat_options.instructions or "") + schema
+
+        await next(context)
+
+        def record(usage: Any) -> None:
+            self._record(agent, profile, estimate, schema, schema_all, usage)
+
+        if context.result is not None and hasattr(context.result, "__aiter__"):
+            context.result = self._observe_stream(context.result, record)
+        elif context.result is not None:
+            record(context.result.usage_details)
+
+    def report(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Return per agent and profile the model calls, prompt and schema tokens, and the prompt cache hit rate."""
+        with self._lock:
+            return {
+                agent: {
+                    profile: {
+                        **entry,
+                        "cache_hit_rate": round(entry["cached_tokens"] / entry["input_tokens"], 4) if entry["input_tokens"] else None,
+                    }
+                    for profile, entry in profiles.items()
+                }
+                for agent, profiles in self.stats.items()
+            }
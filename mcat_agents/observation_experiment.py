@@ -7,13 +7,23 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 from agent_framework.devui import serve
 from dotenv import load_dotenv
 
-from mcat_agents.agents import helper_agent
-
 load_dotenv()
 
 
-def main():
-    serve(entities=[helper_agent])
+def main(port: int = 8080, host: str = "127.0.0.1"):
+    from mcat_agents.recording import enable_recording
+    from mcat_agents.telemetry import configure_telemetry
+
+    # Spans en metrics alleen met ENABLE_INSTRUMENTATION=true
+    configure_telemetry()
+
+    # Agents (en daarmee de Azure SDKs) pas laden wanneer de server echt start
+    from mcat_agents.agents import helper_agent, knowledge_agent, network_agent, resource_agent
+
+    # Sessies vastleggen als MCAT_RECORDING_DIR gezet is
+    enable_recording([helper_agent, knowledge_agent, network_agent, resource_agent])
+
+    serve(entities=[helper_agent], port=port, host=host)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,399 @@
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+import weakref
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from agent_framework import (
+    AgentMiddleware,
+    AgentRunContext,
+    ChatContext,
+    ChatMiddleware,
+    ChatResponse,
+    FunctionApprovalRequestContent,
+    FunctionApprovalResponseContent,
+    FunctionCallContent,
+    FunctionInvocationContext,
+    FunctionMiddleware,
+    FunctionResultContent,
+    Role,
+    TextContent,
+)
+
+logger = logging.getLogger(__name__)
+
+# Opnemen staat alleen aan als er een map is opgegeven
+recording_dir = os.getenv("MCAT_RECORDING_DIR")
+# Bestanden groter dan dit worden afgesloten, hernoemd en (optioneel) met gzip gecomprimeerd
+max_file_bytes = int(os.getenv("MCAT_RECORDING_MAX_BYTES", str(50 * 1024 * 1024)))
+flush_interval_seconds = float(os.getenv("MCAT_RECORDING_FLUSH_INTERVAL", "1.0"))
+compress_rotated = os.getenv("MCAT_RECORDING_COMPRESS", "1") != "0"
+# Ook volledige tool resultaten en LLM antwoorden opnemen (nodig voor replay, zie replay.py)
+record_payloads = os.getenv("MCAT_RECORDING_PAYLOADS", "0") != "0"
+batch_max_events = 500
+
+_stop = object()
+
+# Sessie en agent hop van de run waarbinnen de huidige code draait
+_session: ContextVar[Optional[str]] = ContextVar("mcat_recording_session", default=None)
+_hop: ContextVar[Optional[str]] = ContextVar("mcat_recording_hop", default=None)
+
+
+def result_hash(result: Any) -> str:
+    """Stable hash of a tool result, so identical results can be recognised without storing them."""
+    text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _canonical(value: Any) -> str:
+    """Deterministic JSON rendering used for fingerprints."""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def tool_fingerprint(tool: str, arguments: Dict[str, Any]) -> str:
+    """Fingerprint of a tool call: the tool name and its arguments."""
+    return hashlib.sha256(_canonical([tool, arguments]).encode("utf-8")).hexdigest()[:16]
+
+
+def _content_key(content: Any) -> List[Any]:
+    """What of a message content determines the model's answer (call ids are random, so left out)."""
+    if isinstance(content, TextContent):
+        return ["text", content.text]
+    if isinstance(content, FunctionCallContent):
+        return ["call", content.name, content.parse_arguments()]
+    if isinstance(content, FunctionResultContent):
+        return ["result", result_hash(content.result)]
+    return [type(content).__name__]
+
+
+def request_fingerprint(messages: Iterable[Any], chat_options: Any = None) -> str:
+    """Fingerprint of an LLM request: instructions, tool names and the message contents.
+
+    System messages are left out: clients add the instructions as one only after the chat middleware ran.
+    """
+    tools = sorted(getattr(t, "name", str(t)) for t in (getattr(chat_options, "tools", None) or []))
+    payload = [
+        getattr(chat_options, "instructions", None) or "",
+        tools,
+        [[role, [_content_key(c) for c in m.contents]] for m in messages if (role := str(getattr(m.role, "value", m.role))) != "system"],
+    ]
+    return hashlib.sha256(_canonical(payload).encode("utf-8")).hexdigest()[:16]
+
+
+def _compress(path: Path) -> None:
+    """Gzip a rotated file and remove the original."""
+    try:
+        with open(path, "rb") as source, gzip.open(f"{path}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        path.unlink()
+    except Exception:
+        logger.warning("Comprimeren van %s mislukt", path, exc_info=True)
+
+
+class SessionRecorder:
+    """Append-only JSONL recorder; record() only enqueues, a background thread batches, writes and rotates."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = max_file_bytes,
+        flush_interval: float = flush_interval_seconds,
+        compress: bool = compress_rotated,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file: Optional[Any] = None
+        self._path: Optional[Path] = None
+        self._part = 0
+        self.stats = {"events": 0, "written": 0, "batches": 0, "rotations": 0, "write_errors": 0}
+
+    def record(self, event_type: str, **fields: Any) -> None:
+        """Queue an event; serialisation and hashing happen on the writer thread."""
+        self.stats["events"] += 1
+        self._queue.put((time.time(), event_type, fields))
+        if self._thread is None:
+            self._start()
+
+    def _start(self) -> None:
+        """Start the writer thread on first use."""
+        with self._lock:
+            if self._thread is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="session-recorder", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _open(self) -> None:
+        """Open a new part file for this process."""
+        self._part += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._path = self.directory / f"session-{stamp}-{os.getpid()}-{self._part:03d}.jsonl"
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    def _rotate(self) -> None:
+        """Close the current file once it exceeds max_bytes, and compress it in the background."""
+        if self._file is None or self._file.tell() < self.max_bytes:
+            return
+        self._file.close()
+        self._file = None
+        self.stats["rotations"] += 1
+        if self.compress and self._path is not None:
+            threading.Thread(target=_compress, args=(self._path,), name="session-recorder-gzip", daemon=True).start()
+
+    @staticmethod
+    def _line(timestamp: float, event_type: str, fields: Dict[str, Any]) -> str:
+        """Serialise one event; raw tool results are reduced to a hash and a size."""
+        if "_result" in fields:
+            result = fields.pop("_result")
+            fields["result_sha256"] = result_hash(result)
+            fields["result_chars"] = len(result) if isinstance(result, str) else len(json.dumps(result, default=str))
+            if fields.pop("_keep_result", False):
+                fields["result"] = result
+        event = {"ts": round(timestamp, 6), "type": event_type, **fields}
+        return json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+    def _write(self, batch: List[Any]) -> None:
+        """Write a batch of events and flush them to the OS."""
+        try:
+            if self._file is None:
+                self._open()
+            self._file.write("".join(self._line(*item) for item in batch))
+            self._file.flush()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+            self._rotate()
+        except Exception:
+            self.stats["write_errors"] += 1
+            logger.warning("Wegschrijven van %d sessie-events mislukt", len(batch), exc_info=True)
+
+    def _run(self) -> None:
+        """Writer loop: collect events for up to flush_interval (or a full batch), then write them in one go."""
+        while True:
+            item = self._queue.get()
+            batch: List[Any] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _stop:
+                    stop = True
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= batch_max_events or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Flush the remaining events and stop the writer thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_stop)
+        thread.join(timeout)
+
+
+class AgentRunRecording(AgentMiddleware):
+    """Agent middleware that records user messages, approval decisions and every agent hop with its timing."""
+
+    def __init__(self, recorder: SessionRecorder):
+        self.recorder = recorder
+        self._sessions: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+
+    def _session_for(self, thread: Any) -> str:
+        """One session id per conversation thread; runs without a thread get their own."""
+        if thread is None:
+            return uuid.uuid4().hex[:12]
+        session = self._sessions.get(thread)
+        if session is None:
+            session = self._sessions[thread] = uuid.uuid4().hex[:12]
+        return session
+
+    def _record_input(self, session: str, hop: str, context: AgentRunContext) -> None:
+        """Record the engineer's last message and any approval decisions it carries."""
+        last = context.messages[-1] if context.messages else None
+        if last is None or last.role != Role.USER:
+            return
+        if last.text:
+            self.recorder.record("user_message", session=session, hop=hop, agent=context.agent.name, text=last.text)
+        for content in last.contents:
+            if isinstance(content, FunctionApprovalResponseContent):
+                call = content.function_call
+                self.recorder.record(
+                    "approval_decision", session=session, hop=hop, approved=content.approved,
+                    tool=call.name, arguments=call.parse_arguments(), request_id=content.id,
+                )
+
+    def _record_requests(self, session: str, hop: str, contents: Iterable[Any]) -> None:
+        """Record approval requests the run hands back to the engineer."""
+        for content in contents:
+            if isinstance(content, FunctionApprovalRequestContent):
+                call = content.function_call
+                self.recorder.record(
+                    "approval_requested", session=session, hop=hop,
+                    tool=call.name, arguments=call.parse_arguments(), request_id=content.id,
+                )
+
+    def _record_end(self, session: str, hop: str, agent: str, started: float, error: bool, answer: Optional[str]) -> None:
+        """Record the end of a hop."""
+        fields: Dict[str, Any] = {"duration_ms": round((time.perf_counter() - started) * 1000, 1), "error": error}
+        if answer is not None:
+            fields["answer"] = answer
+        self.recorder.record("agent_end", session=session, hop=hop, agent=agent, **fields)
+
+    async def _wrap_stream(self, stream: AsyncIterable[Any], session: str, hop: str, agent: str, started: float, outermost: bool) -> AsyncIterable[Any]:
+        """Pass a streamed run through; tool calls made while it is consumed belong to this hop."""
+        tokens = (_session.set(session), _hop.set(hop))
+        error = True
+        answer: List[str] = []
+        try:
+            async for update in stream:
+                self._record_requests(session, hop, update.contents)
+                if outermost and update.text:
+                    answer.append(update.text)
+                yield update
+            error = False
+        finally:
+            for var, token in zip((_session, _hop), tokens):
+                try:
+                    var.reset(token)
+                except ValueError:
+                    # Stream afgesloten vanuit een andere context
+                    pass
+            self._record_end(session, hop, agent, started, error, "".join(answer) if outermost else None)
+
+    async def process(self, context: AgentRunContext, next: Callable[[AgentRunContext], Awaitable[None]]) -> None:
+        outer_session = _session.get()
+        outermost = outer_session is None
+        session = outer_session or self._session_for(context.thread)
+        hop = uuid.uuid4().hex[:12]
+        agent = context.agent.name or "unknown"
+
+        if outermost:
+            self._record_input(session, hop, context)
+        self.recorder.record(
+            "agent_start", session=session, hop=hop, parent_hop=_hop.get(), agent=agent, streaming=context.is_streaming
+        )
+        started = time.perf_counter()
+        tokens = (_session.set(session), _hop.set(hop))
+        error = True
+        try:
+            await next(context)
+            error = False
+        finally:
+            _hop.reset(tokens[1])
+            _session.reset(tokens[0])
+            if error:
+                self._record_end(session, hop, agent, started, True, None)
+
+        if context.result is not None and hasattr(context.result, "__aiter__"):
+            context.result = self._wrap_stream(context.result, session, hop, agent, started, outermost)
+        elif context.result is not None:
+            self._record_requests(session, hop, (c for m in context.result.messages for c in m.contents))
+            self._record_end(session, hop, agent, started, False, context.result.text if outermost else None)
+
+
+class ToolCallRecording(FunctionMiddleware):
+    """Function middleware that records every tool call with its arguments, result hash and timing."""
+
+    def __init__(self, recorder: SessionRecorder, payloads: bool = record_payloads):
+        self.recorder = recorder
+        self.payloads = payloads
+
+    async def process(
+        self,
+        context: FunctionInvocationContext,
+        next: Callable[[FunctionInvocationContext], Awaitable[None]],
+    ) -> None:
+        started = time.perf_counter()
+        error = True
+        try:
+            await next(context)
+            error = isinstance(context.result, dict) and "error" in context.result
+        finally:
+            arguments = context.arguments.model_dump() if hasattr(context.arguments, "model_dump") else dict(context.arguments)
+            self.recorder.record(
+                "tool_call", session=_session.get(), hop=_hop.get(), tool=context.function.name,
+                arguments=arguments, fingerprint=tool_fingerprint(context.function.name, arguments),
+                _result=context.result, _keep_result=self.payloads, error=error,
+                duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            )
+
+
+class LlmCallRecording(ChatMiddleware):
+    """Chat middleware that records every LLM request fingerprint with the full response, for replay."""
+
+    def __init__(self, recorder: SessionRecorder):
+        self.recorder = recorder
+
+    def _record(self, fingerprint: str, prompt_chars: int, started: float, response: ChatResponse, streaming: bool) -> None:
+        """Record one completed LLM call."""
+        usage = response.usage_details
+        self.recorder.record(
+            "llm_call", session=_session.get(), hop=_hop.get(), fingerprint=fingerprint, prompt_chars=prompt_chars,
+            input_tokens=getattr(usage, "input_token_count", None), output_tokens=getattr(usage, "output_token_count", None),
+            duration_ms=round((time.perf_counter() - started) * 1000, 1), streaming=streaming,
+            # Nu al serialiseren: de function invocation loop voegt daarna nog berichten toe aan dit response object
+            response=response.to_dict(),
+        )
+
+    async def _wrap_stream(self, stream: AsyncIterable[Any], fingerprint: str, prompt_chars: int, started: float) -> AsyncIterable[Any]:
+        """Pass streamed updates through and record the assembled response at the end."""
+        updates = []
+        async for update in stream:
+            updates.append(update)
+            yield update
+        self._record(fingerprint, prompt_chars, started, ChatResponse.from_chat_response_updates(updates), True)
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        fingerprint = request_fingerprint(context.messages, context.chat_options)
+        prompt_chars = sum(len(_canonical([_content_key(c) for c in m.contents])) for m in context.messages)
+        started = time.perf_counter()
+        await next(context)
+        if context.result is None:
+            return
+        if hasattr(context.result, "__aiter__"):
+            context.result = self._wrap_stream(context.result, fingerprint, prompt_chars, started)
+        else:
+            self._record(fingerprint, prompt_chars, started, context.result, False)
+
+
+def enable_recording(
+    agents: Iterable[Any], directory: Optional[str] = recording_dir, payloads: bool = record_payloads
+) -> Optional[SessionRecorder]:
+    """Attach the session recorder to the given agents when a recording directory is configured."""
+    if not directory:
+        return None
+    recorder = SessionRecorder(directory)
+    run_recording = AgentRunRecording(recorder)
+    # Tool en LLM opname achteraan (binnenste laag): het ruwe tool resultaat en de request zoals het model die ziet
+    inner = [ToolCallRecording(recorder, payloads)] + ([LlmCallRecording(recorder)] if payloads else [])
+    for agent in agents:
+        # De agent opname vooraan, zodat ook antwoorden van de fast path router worden vastgelegd
+        agent.middleware = [run_recording, *(agent.middleware or []), *inner]
+    logger.info("Sessies worden opgenomen in %s", directory)
+    return recorder
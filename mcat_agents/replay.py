@@ -0,0 +1,416 @@
+"""Replay recorded observation sessions against the current helper_agent tree.
+
+Sessions recorded with MCAT_RECORDING_PAYLOADS=1 (see recording.py) contain the user turns, approval
+decisions, raw tool results and LLM responses. During replay the chat client answers from the recorded
+LLM responses and leaf tools answer from the recorded tool results, both keyed by request fingerprint,
+so no Azure OpenAI or Azure resource calls are made.
+
+Run from the repository root:
+
+    python -m mcat_agents.replay "recordings/*.jsonl*" --workers 4 --json replay-report.json
+"""
+import argparse
+import asyncio
+import difflib
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from agent_framework import (
+    BaseChatClient,
+    ChatMessage,
+    ChatResponse,
+    ChatResponseUpdate,
+    FunctionInvocationContext,
+    FunctionMiddleware,
+    Role,
+    UsageContent,
+    use_chat_middleware,
+    use_function_invocation,
+)
+
+from .recording import request_fingerprint, tool_fingerprint
+from .telemetry import current_agent
+
+# Omgeving voor replay: opgenomen LLM antwoorden, en geen caches of fast path die zelf Azure zouden aanroepen
+replay_environment = {
+    "MCAT_CHAT_CLIENT": "replay",
+    "RESPONSE_CACHE_ENABLED": "0",
+    "FAST_PATH_ROUTER_ENABLED": "0",
+}
+
+
+def _open(path: str) -> Any:
+    """Open a recording, gzipped (rotated) or not."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+class RecordedSession:
+    """One recorded session: its turns and the LLM/tool responses to serve, with the recorded metrics."""
+
+    def __init__(self, session_id: str, events: List[Dict[str, Any]]):
+        self.session_id = session_id
+        events = sorted(events, key=lambda e: e["ts"])
+        self.hop_agents = {e["hop"]: e["agent"] for e in events if e["type"] == "agent_start"}
+        root_hops = {e["hop"] for e in events if e["type"] == "agent_start" and e.get("parent_hop") is None}
+
+        # Beurten van de engineer: berichten en (groepen) approval beslissingen, in volgorde
+        self.turns: List[Dict[str, Any]] = []
+        for event in events:
+            if event["type"] == "user_message":
+                self.turns.append({"kind": "message", "text": event["text"], "hop": event["hop"]})
+            elif event["type"] == "approval_decision":
+                if self.turns and self.turns[-1]["kind"] == "approvals" and self.turns[-1]["hop"] == event["hop"]:
+                    self.turns[-1]["decisions"].append(event)
+                else:
+                    self.turns.append({"kind": "approvals", "decisions": [event], "hop": event["hop"]})
+
+        self.llm_calls = [e for e in events if e["type"] == "llm_call"]
+        self.tool_calls = [e for e in events if e["type"] == "tool_call"]
+        self.answers = [e.get("answer") or "" for e in events if e["type"] == "agent_end" and e["hop"] in root_hops]
+        self.wall_clock_ms = sum(e["duration_ms"] for e in events if e["type"] == "agent_end" and e["hop"] in root_hops)
+        self.reset()
+
+    @property
+    def has_payloads(self) -> bool:
+        """Whether the session was recorded with LLM responses (MCAT_RECORDING_PAYLOADS=1)."""
+        return bool(self.llm_calls)
+
+    def agent_of(self, event: Dict[str, Any]) -> str:
+        """Agent that made a recorded call."""
+        return self.hop_agents.get(event.get("hop"), "unknown")
+
+    def reset(self) -> None:
+        """Make all recorded responses available again."""
+        self._used: Set[int] = set()
+        self._llm_by_fingerprint: Dict[str, Deque[int]] = defaultdict(deque)
+        self._llm_by_agent: Dict[str, Deque[int]] = defaultdict(deque)
+        for index, event in enumerate(self.llm_calls):
+            self._llm_by_fingerprint[event["fingerprint"]].append(index)
+            self._llm_by_agent[self.agent_of(event)].append(index)
+        self._tools_by_fingerprint: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for event in self.tool_calls:
+            if "result" in event:
+                self._tools_by_fingerprint[event["fingerprint"]].append(event)
+        self._tool_served: Dict[str, int] = defaultdict(int)
+
+    def take_llm(self, agent: Optional[str], fingerprint: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Next recorded LLM response for a request: an exact fingerprint match, else the agent's next unused one."""
+        candidates = self._llm_by_fingerprint.get(fingerprint)
+        while candidates:
+            index = candidates.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return self.llm_calls[index], "exact"
+        queue = self._llm_by_agent.get(agent or "unknown")
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return self.llm_calls[index], "fuzzy"
+        return None, "missing"
+
+    def take_tool(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Recorded result of a tool call with these arguments; repeated calls cycle through the recordings."""
+        recorded = self._tools_by_fingerprint.get(fingerprint)
+        if not recorded:
+            return None
+        served = self._tool_served[fingerprint]
+        self._tool_served[fingerprint] += 1
+        return recorded[min(served, len(recorded) - 1)]
+
+    def decision_for(self, turn: Dict[str, Any], tool: str, arguments: Dict[str, Any]) -> bool:
+        """Recorded approval decision for a request (same tool and arguments, else same tool); deny otherwise."""
+        decisions = turn["decisions"]
+        for decision in decisions:
+            if decision["tool"] == tool and decision.get("arguments") == arguments:
+                return bool(decision["approved"])
+        for decision in decisions:
+            if decision["tool"] == tool:
+                return bool(decision["approved"])
+        return False
+
+
+def load_sessions(paths: Iterable[str]) -> List[RecordedSession]:
+    """Read recording files (plain or gzipped) and group their events per session."""
+    events: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            with _open(path) as handle:
+                for line in handle:
+                    if line.strip():
+                        event = json.loads(line)
+                        if event.get("session"):
+                            events[event["session"]].append(event)
+    sessions = [RecordedSession(session_id, items) for session_id, items in events.items()]
+    return [s for s in sessions if s.turns]
+
+
+class ReplayState:
+    """What happened during the replay of one session."""
+
+    def __init__(self, session: RecordedSession, simulate_latency: bool):
+        self.session = session
+        self.simulate_latency = simulate_latency
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.tool_sequence: List[str] = []
+        self.tool_results_missing: List[str] = []
+
+
+@use_function_invocation
+@use_chat_middleware
+class ReplayChatClient(BaseChatClient):
+    """Chat client that answers every request from the recorded LLM responses of the session being replayed."""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.state: Optional[ReplayState] = None
+
+    async def _serve(self, messages: Any, chat_options: Any) -> ChatResponse:
+        """Look up the recorded response for a request."""
+        if self.state is None:
+            raise RuntimeError("Geen sessie geladen; gebruik replay_session()")
+        fingerprint = request_fingerprint(messages, chat_options)
+        agent = current_agent()
+        event, match = self.state.session.take_llm(agent, fingerprint)
+        self.state.llm_calls.append({
+            "agent": agent,
+            "match": match,
+            "input_tokens": (event or {}).get("input_tokens") or 0,
+            "output_tokens": (event or {}).get("output_tokens") or 0,
+        })
+        if event is None:
+            return ChatResponse(messages=[ChatMessage(role=Role.ASSISTANT, text="[replay] geen opgenomen antwoord voor deze request")])
+        if self.state.simulate_latency:
+            await asyncio.sleep(event["duration_ms"] / 1000)
+        return ChatResponse.from_dict(event["response"])
+
+    async def _inner_get_response(self, *, messages: Any, chat_options: Any, **kwargs: Any) -> ChatResponse:
+        return await self._serve(messages, chat_options)
+
+    async def _inner_get_streaming_response(self, *, messages: Any, chat_options: Any, **kwargs: Any) -> Any:
+        response = await self._serve(messages, chat_options)
+        for message in response.messages:
+            yield ChatResponseUpdate(role=message.role, contents=message.contents, author_name=message.author_name)
+        if response.usage_details is not None:
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[UsageContent(details=response.usage_details)])
+
+
+class RecordedToolResults(FunctionMiddleware):
+    """Function middleware that answers leaf tools from the recorded results instead of calling Azure."""
+
+    def __init__(self, client: ReplayChatClient, stub_tools: Set[str]):
+        self.client = client
+        self.stub_tools = stub_tools
+
+    async def process(self, context: FunctionInvocationContext, next: Any) -> None:
+        state = self.client.state
+        name = context.function.name
+        if state is None:
+            await next(context)
+            return
+        try:
+            await self._serve(state, context, next)
+        finally:
+            # Net als in de opname na afloop vastleggen, zodat sub-agent tools na hun eigen tools komen
+            state.tool_sequence.append(f"{current_agent()}:{name}")
+
+    async def _serve(self, state: ReplayState, context: FunctionInvocationContext, next: Any) -> None:
+        """Answer a leaf tool from the recording; run anything else (sub-agent tools) for real."""
+        name = context.function.name
+        if name not in self.stub_tools:
+            # Sub-agent tools gewoon uitvoeren: hun LLM calls komen uit de opname
+            await next(context)
+            return
+
+        arguments = context.arguments.model_dump() if hasattr(context.arguments, "model_dump") else dict(context.arguments)
+        event = state.session.take_tool(tool_fingerprint(name, arguments))
+        if event is None:
+            state.tool_results_missing.append(name)
+            context.result = {"error": f"Geen opgenomen resultaat voor {name} met deze argumenten"}
+            return
+        if state.simulate_latency:
+            await asyncio.sleep(event["duration_ms"] / 1000)
+        context.result = event["result"]
+
+
+_stub_installed = False
+
+
+def _install() -> Tuple[ReplayChatClient, Any]:
+    """Load the agent tree with the replay client and put the tool stand-in innermost on every agent."""
+    global _stub_installed
+    from .agents import helper_agent, knowledge_agent, network_agent, resource_agent
+    from .agents.client import get_chat_client
+
+    client = get_chat_client()
+    if not isinstance(client, ReplayChatClient):
+        raise RuntimeError("Replay vereist MCAT_CHAT_CLIENT=replay vóór het laden van de agents")
+    if not _stub_installed:
+        sub_agents = (knowledge_agent, network_agent, resource_agent)
+        stub_tools = {tool.name for agent in sub_agents for tool in (agent.chat_options.tools or [])}
+        stand_in = RecordedToolResults(client, stub_tools)
+        for agent in (helper_agent, *sub_agents):
+            agent.middleware = [*(agent.middleware or []), stand_in]
+        _stub_installed = True
+    return client, helper_agent
+
+
+def _sequence_diff(recorded: List[str], replayed: List[str]) -> List[str]:
+    """Unified diff of two tool-call sequences."""
+    return list(difflib.unified_diff(recorded, replayed, "recorded", "replayed", lineterm="", n=1))
+
+
+async def replay_session(session: RecordedSession, simulate_latency: bool = False) -> Dict[str, Any]:
+    """Replay one session and compare tool calls, turns, tokens and wall-clock time with the recording."""
+    client, helper_agent = _install()
+    session.reset()
+    state = client.state = ReplayState(session, simulate_latency)
+
+    thread = helper_agent.get_new_thread()
+    pending: List[Any] = []
+    answers: List[str] = []
+    notes: List[str] = []
+    started = time.perf_counter()
+    for turn in session.turns:
+        if turn["kind"] == "message":
+            response = await helper_agent.run(turn["text"], thread=thread)
+        else:
+            if not pending:
+                notes.append("approval opgenomen maar in de replay niet gevraagd")
+                continue
+            decisions = [
+                request.create_response(session.decision_for(turn, request.function_call.name, request.function_call.parse_arguments()))
+                for request in pending
+            ]
+            response = await helper_agent.run(ChatMessage(role=Role.USER, contents=decisions), thread=thread)
+        pending = list(response.user_input_requests)
+        answers.append(response.text)
+    wall_clock_ms = (time.perf_counter() - started) * 1000
+    client.state = None
+
+    recorded_tools = [f"{session.agent_of(e)}:{e['tool']}" for e in session.tool_calls]
+    matches = [call["match"] for call in state.llm_calls]
+    return {
+        "session": session.session_id,
+        "turns": {"recorded": len(session.turns), "replayed": len(answers)},
+        "llm_calls": {
+            "recorded": len(session.llm_calls),
+            "replayed": len(state.llm_calls),
+            "exact": matches.count("exact"),
+            "fuzzy": matches.count("fuzzy"),
+            "missing": matches.count("missing"),
+        },
+        "tool_calls": {
+            "recorded": len(recorded_tools),
+            "replayed": len(state.tool_sequence),
+            "identical": recorded_tools == state.tool_sequence,
+            "diff": _sequence_diff(recorded_tools, state.tool_sequence),
+            "results_missing": state.tool_results_missing,
+        },
+        "tokens": {
+            "recorded": {
+                "input": sum(e.get("input_tokens") or 0 for e in session.llm_calls),
+                "output": sum(e.get("output_tokens") or 0 for e in session.llm_calls),
+            },
+            "replayed": {
+                "input": sum(call["input_tokens"] for call in state.llm_calls),
+                "output": sum(call["output_tokens"] for call in state.llm_calls),
+            },
+        },
+        "wall_clock_ms": {"recorded": round(session.wall_clock_ms, 1), "replayed": round(wall_clock_ms, 1)},
+        "final_answer_identical": bool(answers) and bool(session.answers) and answers[-1] == session.answers[-1],
+        "notes": notes,
+    }
+
+
+def _init_worker() -> None:
+    """Configure a (worker) process for replay before the agents are imported."""
+    os.environ.update(replay_environment)
+    os.environ.pop("MCAT_RECORDING_DIR", None)
+
+
+def _replay_in_worker(session: RecordedSession, simulate_latency: bool) -> Dict[str, Any]:
+    """Process-pool entry point: replay one session, reporting failures instead of raising."""
+    try:
+        return asyncio.run(replay_session(session, simulate_latency))
+    except Exception as e:
+        return {"session": session.session_id, "error": f"{type(e).__name__}: {e}"}
+
+
+def replay_sessions(sessions: List[RecordedSession], workers: int = os.cpu_count() or 1, simulate_latency: bool = False) -> List[Dict[str, Any]]:
+    """Replay sessions in parallel, one fresh interpreter per worker process."""
+    if workers <= 1 or len(sessions) <= 1:
+        _init_worker()
+        return [_replay_in_worker(session, simulate_latency) for session in sessions]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        return list(pool.map(_replay_in_worker, sessions, [simulate_latency] * len(sessions)))
+
+
+def summarize(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals over all replayed sessions."""
+    ok = [r for r in reports if "error" not in r]
+    return {
+        "sessions": len(reports),
+        "failed": len(reports) - len(ok),
+        "identical_tool_sequences": sum(r["tool_calls"]["identical"] for r in ok),
+        "identical_final_answers": sum(r["final_answer_identical"] for r in ok),
+        "llm_calls": {k: sum(r["llm_calls"][k] for r in ok) for k in ("recorded", "replayed", "exact", "fuzzy", "missing")},
+        "tokens": {
+            side: {k: sum(r["tokens"][side][k] for r in ok) for k in ("input", "output")} for side in ("recorded", "replayed")
+        },
+        "wall_clock_ms": {side: round(sum(r["wall_clock_ms"][side] for r in ok), 1) for side in ("recorded", "replayed")},
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="Recording files or glob patterns (.jsonl or .jsonl.gz)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--simulate-latency", action="store_true", help="Sleep for the recorded LLM and tool latencies")
+    parser.add_argument("--json", dest="json_path", help="Write the full report as JSON to this file")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.recordings)
+    without_payloads = [s.session_id for s in sessions if not s.has_payloads]
+    if without_payloads:
+        print(f"Let op: {len(without_payloads)} sessie(s) zonder LLM antwoorden (opgenomen zonder MCAT_RECORDING_PAYLOADS=1)", file=sys.stderr)
+
+    reports = replay_sessions(sessions, args.workers, args.simulate_latency)
+    for report in reports:
+        if "error" in report:
+            print(f"{report['session']}  ERROR  {report['error']}")
+            continue
+        llm, tools, clock = report["llm_calls"], report["tool_calls"], report["wall_clock_ms"]
+        print(
+            f"{report['session']}  turns {report['turns']['replayed']}/{report['turns']['recorded']}"
+            f"  llm {llm['exact']} exact, {llm['fuzzy']} fuzzy, {llm['missing']} missing"
+            f"  tools {'identical' if tools['identical'] else 'DIFFERENT'} ({tools['replayed']}/{tools['recorded']})"
+            f"  wall {clock['replayed']:.0f}/{clock['recorded']:.0f} ms"
+        )
+        for line in tools["diff"][2:]:
+            print(f"    {line}")
+
+    summary = summarize(reports)
+    print(json.dumps(summary, indent=2))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump({"summary": summary, "sessions": reports}, handle, indent=2, ensure_ascii=False)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    # Via de package module draaien, zodat worker processen dezelfde klassen (en replay client) gebruiken
+    from mcat_agents.replay import main as package_main
+
+    sys.exit(package_main())
@@ -0,0 +1,129 @@
+"""Cold-start report: import time per stage and the slowest modules, measured in fresh interpreters.
+
+Run from the repository root:
+
+    python -m mcat_agents.startup_report
+    python -m mcat_agents.startup_report --json startup.json --budget 3.0
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+repo_root = Path(__file__).resolve().parents[1]
+
+# Elke stage draait in een eigen interpreter, zodat er niets uit een eerdere stage gecached is
+stages = {
+    "agents_package": "import mcat_agents.agents",
+    "tool_modules": (
+        "import mcat_agents.tools.knowledge.ai_search, mcat_agents.tools.knowledge.blob_storage, "
+        "mcat_agents.tools.network.network_functions, mcat_agents.tools.resource.cloud_resources"
+    ),
+    "helper_agent": "from mcat_agents.agents import helper_agent",
+}
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` lines into (module, self_us, cumulative_us, depth) records."""
+    records: List[Dict[str, Any]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            records.append({
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+            })
+        except ValueError:
+            continue
+    return records
+
+
+def run_stage(name: str, statement: str, top: int = 15) -> Dict[str, Any]:
+    """Run one import statement in a fresh interpreter and summarise where the time went."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(repo_root), os.environ.get("PYTHONPATH")])))
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=repo_root,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_seconds = time.perf_counter() - started
+    records = _parse_importtime(process.stderr)
+
+    # Eigen tijd per top-level package (azure, openai, agent_framework, ...)
+    per_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        per_package[record["module"].split(".", 1)[0]] += record["self_us"]
+
+    result: Dict[str, Any] = {
+        "stage": name,
+        "statement": statement,
+        "ok": process.returncode == 0,
+        "wall_seconds": round(wall_seconds, 3),
+        "import_seconds": round(sum(r["self_us"] for r in records) / 1e6, 3),
+        "modules_imported": len(records),
+        "packages": [
+            {"package": package, "seconds": round(us / 1e6, 3)}
+            for package, us in sorted(per_package.items(), key=lambda item: -item[1])[:top]
+        ],
+        "slowest_modules": [
+            {"module": r["module"], "self_seconds": round(r["self_us"] / 1e6, 3), "cumulative_seconds": round(r["cumulative_us"] / 1e6, 3)}
+            for r in sorted(records, key=lambda r: -r["self_us"])[:top]
+        ],
+    }
+    if process.returncode != 0:
+        result["error"] = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit code {process.returncode}"
+    return result
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    """Print the report as readable text."""
+    print(f"Python {report['python']}")
+    for stage in report["stages"]:
+        status = "ok" if stage["ok"] else f"FAILED: {stage.get('error')}"
+        print(f"\n== {stage['stage']} ({status})")
+        print(f"   wall {stage['wall_seconds']:.3f}s, imports {stage['import_seconds']:.3f}s, {stage['modules_imported']} modules")
+        for package in stage["packages"][:8]:
+            print(f"   {package['seconds']:8.3f}s  {package['package']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", dest="json_path", help="Write the full report as JSON to this file ('-' for stdout)")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages and modules to list per stage")
+    parser.add_argument("--budget", type=float, help="Fail (exit code 1) when a stage's wall time exceeds this many seconds")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "stages": [run_stage(name, statement, args.top) for name, statement in stages.items()],
+    }
+
+    if args.json_path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(report)
+        if args.json_path:
+            Path(args.json_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    over_budget = [s["stage"] for s in report["stages"] if args.budget is not None and s["wall_seconds"] > args.budget]
+    if over_budget:
+        print(f"\nBudget van {args.budget}s overschreden door: {', '.join(over_budget)}", file=sys.stderr)
+    failed = [s["stage"] for s in report["stages"] if not s["ok"]]
+    return 1 if over_budget or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
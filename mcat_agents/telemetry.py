@@ -0,0 +1,212 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Optional
+
+from agent_framework import AgentMiddleware, AgentRunContext
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+# Zelfde schakelaar als de Agent Framework instrumentatie (zie docker-compose.yml)
+telemetry_enabled = os.getenv("ENABLE_INSTRUMENTATION", "false").lower() in ("1", "true", "yes")
+# Optioneel: spans en metrics als JSON lines naar een lokaal bestand (naast of in plaats van OTLP)
+telemetry_file = os.getenv("MCAT_TELEMETRY_FILE")
+argument_summary_chars = 200
+
+tracer = trace.get_tracer("mcat_agents")
+meter = metrics.get_meter("mcat_agents")
+
+tool_duration = meter.create_histogram(
+    "mcat.tool.duration", unit="s", description="Duur van een tool aanroep, per tool en agent"
+)
+tool_calls = meter.create_counter(
+    "mcat.tool.calls", unit="{call}", description="Aantal tool aanroepen, per tool, agent en foutstatus"
+)
+tool_coalesced = meter.create_counter(
+    "mcat.tool.coalesced", unit="{call}", description="Tool aanroepen die een lopende identieke aanroep deelden, per tool"
+)
+agent_duration = meter.create_histogram(
+    "mcat.agent.duration", unit="s", description="Duur van een agent run (hop), per agent"
+)
+agent_runs = meter.create_counter(
+    "mcat.agent.runs", unit="{run}", description="Aantal agent runs, per agent en foutstatus"
+)
+tool_result_tokens = meter.create_counter(
+    "mcat.tool.result_tokens", unit="{token}", description="Geschatte tokens van tool resultaten vóór en na compactie, per tool en agent"
+)
+prompt_size = meter.create_histogram(
+    "mcat.prompt.tokens", unit="{token}", description="Geschatte prompt grootte per model aanroep vóór en na history compactie, per agent"
+)
+model_input_tokens = meter.create_counter(
+    "mcat.model.input_tokens", unit="{token}", description="Prompt tokens volgens het model, per agent en tool profiel"
+)
+model_cached_tokens = meter.create_counter(
+    "mcat.model.cached_tokens", unit="{token}", description="Prompt tokens die het model uit de prompt cache las, per agent en tool profiel"
+)
+fast_path_requests = meter.create_counter(
+    "mcat.fast_path.requests", unit="{request}", description="Vragen aan de helper: direct beantwoord (hit) of naar de LLM (fallthrough), per intent"
+)
+fast_path_tool_errors = meter.create_counter(
+    "mcat.fast_path.tool_errors", unit="{request}", description="Fast path pogingen waarvan de tool een fout gaf (daarna naar de LLM), per intent"
+)
+fast_path_duration = meter.create_histogram(
+    "mcat.fast_path.duration", unit="s", description="Duur van een helper run via de fast path of via de LLM"
+)
+azure_throttled = meter.create_counter(
+    "mcat.azure.throttled", unit="{event}", description="Throttling door Azure (429/503) of een bijna lege rate limit, per service"
+)
+azure_throttle_wait = meter.create_histogram(
+    "mcat.azure.throttle.wait", unit="s", description="Wachttijd in de token bucket vóór een Azure request, per service"
+)
+azure_retries = meter.create_counter(
+    "mcat.azure.retries", unit="{retry}", description="Herhaalde Azure requests, per service en reden"
+)
+
+# De agent waarbinnen een tool wordt aangeroepen, voor de attributen van tool metrics
+_current_agent: ContextVar[Optional[str]] = ContextVar("mcat_current_agent", default=None)
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def current_agent() -> Optional[str]:
+    """Name of the agent whose run the current code belongs to."""
+    return _current_agent.get()
+
+
+def summarize_arguments(arguments: Dict[str, Any]) -> str:
+    """Short, single-line rendering of tool arguments for a span attribute."""
+    text = json.dumps(arguments, ensure_ascii=False, default=str)
+    if len(text) > argument_summary_chars:
+        return text[:argument_summary_chars] + "…"
+    return text
+
+
+def result_size(result: Any) -> int:
+    """Size in characters of a tool result as it is sent to the model."""
+    if isinstance(result, str):
+        return len(result)
+    return len(json.dumps(result, ensure_ascii=False, default=str))
+
+
+def _is_error(result: Any) -> bool:
+    """Tools report failures as {"error": ...} instead of raising."""
+    return isinstance(result, dict) and "error" in result
+
+
+def traced_tool(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Record a span, latency and call count for every call of a tool function.
+
+    Place it directly under @ai_function; the signature (and so the tool schema) is preserved.
+    Azure SDK HTTP spans of the call are nested under the tool span.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        agent = _current_agent.get() or "unknown"
+        started = time.perf_counter()
+        error = True
+        with tracer.start_as_current_span(f"tool {name}", record_exception=True) as span:
+            span.set_attribute("mcat.tool.name", name)
+            span.set_attribute("mcat.agent.name", agent)
+            span.set_attribute("mcat.tool.arguments", summarize_arguments(kwargs))
+            try:
+                result = await func(*args, **kwargs)
+                error = _is_error(result)
+                span.set_attribute("mcat.tool.result_size", result_size(result))
+                if error:
+                    span.set_status(Status(StatusCode.ERROR, str(result["error"])[:argument_summary_chars]))
+                return result
+            finally:
+                span.set_attribute("mcat.tool.error", error)
+                attributes = {"mcat.tool.name": name, "mcat.agent.name": agent, "mcat.tool.error": error}
+                tool_duration.record(time.perf_counter() - started, attributes)
+                tool_calls.add(1, attributes)
+
+    return wrapper
+
+
+class AgentTelemetry(AgentMiddleware):
+    """Agent middleware that records latency and run counts per agent hop and tags tool metrics with the agent."""
+
+    def _record(self, agent: str, started: float, error: bool) -> None:
+        """Record one finished agent run."""
+        attributes = {"mcat.agent.name": agent, "mcat.agent.error": error}
+        agent_duration.record(time.perf_counter() - started, attributes)
+        agent_runs.add(1, attributes)
+
+    async def _measure_stream(self, agent: str, stream: AsyncIterable[Any], started: float) -> AsyncIterable[Any]:
+        """Pass a streamed run through, attributing its tool calls to the agent and timing it to the end."""
+        token = _current_agent.set(agent)
+        error = True
+        try:
+            async for update in stream:
+                yield update
+            error = False
+        finally:
+            try:
+                _current_agent.reset(token)
+            except ValueError:
+                # Stream afgesloten vanuit een andere context
+                pass
+            self._record(agent, started, error)
+
+    async def process(self, context: AgentRunContext, next: Callable[[AgentRunContext], Awaitable[None]]) -> None:
+        agent = context.agent.name or "unknown"
+        started = time.perf_counter()
+        token = _current_agent.set(agent)
+        error = True
+        try:
+            await next(context)
+            error = False
+        finally:
+            _current_agent.reset(token)
+            if error or not context.is_streaming:
+                self._record(agent, started, error)
+
+        if context.result is not None and hasattr(context.result, "__aiter__"):
+            context.result = self._measure_stream(agent, context.result, started)
+
+
+def _file_exporters(path: str) -> list:
+    """Span and metric exporters that append JSON lines to a local file."""
+    from opentelemetry.sdk.metrics.export import ConsoleMetricExporter
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    out = open(path, "a", encoding="utf-8", buffering=1)
+    return [
+        ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n"),
+        ConsoleMetricExporter(out=out, formatter=lambda data: data.to_json(indent=None) + "\n"),
+    ]
+
+
+def configure_telemetry(force: bool = False) -> bool:
+    """Set up OpenTelemetry providers (OTLP via OTEL_EXPORTER_OTLP_* and/or a local file) once per process.
+
+    Also enables azure-core's native tracing so Azure SDK HTTP calls show up as child spans.
+    Returns whether telemetry is active.
+    """
+    global _configured
+    if not (telemetry_enabled or force):
+        return False
+    with _configure_lock:
+        if _configured:
+            return True
+        from agent_framework.observability import configure_otel_providers
+        from azure.core.settings import settings
+
+        settings.tracing_enabled = True
+        exporters = _file_exporters(telemetry_file) if telemetry_file else None
+        configure_otel_providers(exporters=exporters)
+        _configured = True
+        logger.info("Telemetry actief%s", f" (bestand: {telemetry_file})" if telemetry_file else "")
+        return True
+
+
+agent_telemetry = AgentTelemetry()
@@ -0,0 +1,121 @@
+import os
+from functools import lru_cache
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+from ..credentials import shared_credential
+
+# Eén keer .env laden voor alle tool modules; de Azure SDKs worden pas bij het eerste gebruik geïmporteerd
+load_dotenv()
+
+subscription_id = "0818ef22-4784-4365-8a35-1f03e8c5e27d"
+default_resource_group = "north-river-resource-group"
+
+# "inmemory" vervangt alle Azure clients door een lokale stand-in (benchmarks, offline runs; zie inmemory_azure.py)
+azure_backend = os.getenv("MCAT_AZURE_BACKEND", "azure")
+
+
+def azure_credential() -> Any:
+    """Return the process-wide token credential shared with the chat client."""
+    return shared_credential()
+
+
+def _inmemory() -> Any:
+    """Return the in-memory stand-in when MCAT_AZURE_BACKEND=inmemory, else None."""
+    if azure_backend != "inmemory":
+        return None
+    from .inmemory_azure import backend
+
+    return backend()
+
+
+@lru_cache(maxsize=None)
+def compute_client(subscription: str = subscription_id) -> Any:
+    """Return a cached ComputeManagementClient for a subscription."""
+    stand_in = _inmemory()
+    if stand_in is not None:
+        return stand_in.compute_client()
+    from azure.mgmt.compute import ComputeManagementClient
+
+    from .throttling import client_options
+
+    return ComputeManagementClient(credential=azure_credential(), subscription_id=subscription, **client_options("arm"))
+
+
+@lru_cache(maxsize=None)
+def network_client(subscription: str = subscription_id) -> Any:
+    """Return a cached NetworkManagementClient for a subscription."""
+    stand_in = _inmemory()
+    if stand_in is not None:
+        return stand_in.network_client()
+    from azure.mgmt.network import NetworkManagementClient
+
+    from .throttling import client_options
+
+    return NetworkManagementClient(credential=azure_credential(), subscription_id=subscription, **client_options("arm"))
+
+
+@lru_cache(maxsize=None)
+def resource_client(subscription: str = subscription_id) -> Any:
+    """Return a cached ResourceManagementClient for a subscription."""
+    stand_in = _inmemory()
+    if stand_in is not None:
+        return stand_in.resource_client()
+    from azure.mgmt.resource import ResourceManagementClient
+
+    from .throttling import client_options
+
+    return ResourceManagementClient(credential=azure_credential(), subscription_id=subscription, **client_options("arm"))
+
+
+@lru_cache(maxsize=None)
+def search_client(endpoint: str, index_name: str, api_key: Optional[str]) -> Any:
+    """Return a cached Azure AI Search client for an index, with key auth or else the shared token credential."""
+    stand_in = _inmemory()
+    if stand_in is not None:
+        return stand_in.search_client()
+    from azure.search.documents import SearchClient
+
+    from .throttling import client_options
+
+    if api_key:
+        from azure.core.credentials import AzureKeyCredential
+
+        return SearchClient(endpoint=endpoint, index_name=index_name, credential=AzureKeyCredential(api_key), **client_options("search"))
+    return SearchClient(endpoint=endpoint, index_name=index_name, credential=azure_credential(), **client_options("search"))
+
+
+@lru_cache(maxsize=None)
+def storage_credential(account_name: str, account_key: Optional[str]) -> Any:
+    """Return the shared key credential for a storage account, or the shared token credential without a key."""
+    if not account_key:
+        return azure_credential()
+    from azure.core.credentials import AzureNamedKeyCredential
+
+    return AzureNamedKeyCredential(account_name, account_key)
+
+
+@lru_cache(maxsize=None)
+def blob_service_client(account_url: str, account_name: str, account_key: Optional[str]) -> Any:
+    """Return a cached BlobServiceClient for a storage account."""
+    stand_in = _inmemory()
+    if stand_in is not None:
+        return stand_in.blob_service_client(account_url)
+    from azure.storage.blob import BlobServiceClient
+
+    from .throttling import storage_options
+
+    return BlobServiceClient(account_url=account_url, credential=storage_credential(account_name, account_key), **storage_options())
+
+
+def blob_client(blob_url: str, account_name: str, account_key: Optional[str]) -> Any:
+    """Return a BlobClient for a blob URL with the storage account credential."""
+    stand_in = _inmemory()
+    if stand_in is not None:
+        return stand_in.blob_client(blob_url)
+    from azure.storage.blob import BlobClient
+
+    from .throttling import storage_options
+
+    return BlobClient.from_blob_url(blob_url=blob_url, credential=storage_credential(account_name, account_key), **storage_options())
@@ -0,0 +1,133 @@
+import asyncio
+import copy
+import functools
+import inspect
+import json
+import os
+import threading
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from .mutations import MUTATING_TOOLS
+from ..telemetry import tool_coalesced
+
+# Gelijktijdige identieke read-only tool aanroepen delen één Azure request
+coalescing_enabled = os.getenv("TOOL_COALESCING_ENABLED", "1") != "0"
+
+# Lopende aanroepen per (event loop, tool, generatie, argumenten); een gedeelde aanroep is [future, aantal meelifters]
+_inflight: Dict[Tuple[Any, ...], List[Any]] = {}
+# Verhoogd door elke wijzigende tool, zodat een lezing na een wijziging niet aansluit bij een lezing van ervoor
+_generation = 0
+stats = {"calls": 0, "shared": 0}
+# Event loop per worker thread voor tool aanroepen; geneste tool aanroepen daarin lopen direct
+_worker = threading.local()
+_in_worker: ContextVar[bool] = ContextVar("mcat_coalescing_worker", default=False)
+
+
+def invalidate() -> None:
+    """Let calls from now on start a new request instead of joining one that started before a mutation."""
+    global _generation
+    _generation += 1
+
+
+def _normalise(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {k: _normalise(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalise(v) for v in value]
+    return value
+
+
+def call_key(signature: inspect.Signature, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """Canonical arguments of a call: bound to the signature, defaults filled in, strings stripped."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return json.dumps(_normalise(bound.arguments), sort_keys=True, ensure_ascii=False, default=str)
+
+
+class _WorkerLoop:
+    """Event loop of one worker thread, closed when the thread ends (before its sockets are finalised)."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+
+    def __del__(self) -> None:
+        self.loop.close()
+
+
+def _run(func: Callable[..., Awaitable[Any]], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Run a tool call to completion on the worker thread's own event loop (kept for the next call)."""
+    worker = getattr(_worker, "loop", None)
+    if worker is None:
+        worker = _worker.loop = _WorkerLoop()
+    _in_worker.set(True)
+    return worker.loop.run_until_complete(func(*args, **kwargs))
+
+
+async def _off_loop(func: Callable[..., Awaitable[Any]], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Run a tool call in a worker thread, so its synchronous Azure SDK calls (and their throttling waits) never block the event loop."""
+    if _in_worker.get():
+        return await func(*args, **kwargs)
+    return await asyncio.to_thread(_run, func, args, kwargs)
+
+
+def coalesced(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Single-flight for a read-only tool: concurrent calls with the same arguments share one call and its result.
+
+    Place it directly above the tool function, under @traced_tool, so every caller keeps its own span.
+    The tool bodies call the synchronous Azure SDK, so the shared call runs in a worker thread (on that
+    thread's own event loop); that is also what lets concurrent calls overlap instead of blocking the
+    event loop one after the other. With coalescing disabled every call still runs in a worker thread.
+    Callers that joined a shared call each get a copy of the result.
+    """
+    name = func.__name__
+    if name in MUTATING_TOOLS:
+        raise ValueError(f"{name} wijzigt Azure of de knowledge base en kan niet gedeeld worden")
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not coalescing_enabled or _in_worker.get():
+            return await _off_loop(func, args, kwargs)
+        key = (asyncio.get_running_loop(), name, _generation, call_key(signature, args, kwargs))
+        entry = _inflight.get(key)
+        if entry is not None:
+            entry[1] += 1
+            stats["shared"] += 1
+            tool_coalesced.add(1, {"mcat.tool.name": name})
+            return copy.deepcopy(await asyncio.shield(entry[0]))
+
+        stats["calls"] += 1
+        shared = asyncio.ensure_future(asyncio.to_thread(_run, func, args, kwargs))
+        entry = [shared, 0]
+        _inflight[key] = entry
+
+        def _done(_: Any) -> None:
+            if _inflight.get(key) is entry:
+                del _inflight[key]
+
+        shared.add_done_callback(_done)
+        # shield: een geannuleerde aanroeper annuleert de gedeelde aanroep niet voor de anderen
+        result = await asyncio.shield(shared)
+        return copy.deepcopy(result) if entry[1] else result
+
+    return wrapper
+
+
+def invalidates_coalesced(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Mark a mutating tool: read calls starting during or after it never join a read that started before it.
+
+    The call itself runs in a worker thread, like a shared read.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        invalidate()
+        try:
+            return await _off_loop(func, args, kwargs)
+        finally:
+            invalidate()
+
+    return wrapper
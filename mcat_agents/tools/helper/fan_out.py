@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+from typing import Annotated, Any, Awaitable, Callable, Dict, List
+
+from agent_framework import AIFunction, ai_function
+from pydantic import BaseModel, Field
+
+from ...telemetry import traced_tool
+
+# Maximaal aantal sub-agents dat tegelijk draait en de standaard timeout per sub-agent
+fanout_concurrency = int(os.getenv("HELPER_FANOUT_CONCURRENCY", "3"))
+fanout_timeout = float(os.getenv("HELPER_FANOUT_TIMEOUT", "120"))
+
+AgentRunner = Callable[[str], Awaitable[str]]
+
+
+class SubAgentRequest(BaseModel):
+    """Een onafhankelijke vraag voor een sub-agent."""
+
+    agent: str = Field(description="Naam van de agent: knowledge_agent, network_agent of resource_agent")
+    task: str = Field(description="De volledige, zelfstandige vraag of opdracht voor deze agent")
+
+
+def agent_runner(agent: Any) -> AgentRunner:
+    """Wrap an agent as a callable that runs one task and returns the answer text."""
+    async def run(task: str) -> str:
+        response = await agent.run(task)
+        return response.text
+
+    return run
+
+
+def make_parallel_consult_tool(runners: Dict[str, AgentRunner]) -> AIFunction:
+    """Build the tool that dispatches independent sub-agent questions concurrently."""
+
+    @ai_function(
+        name="consult_agents_parallel",
+        description="Stel meerdere ONAFHANKELIJKE vragen tegelijk aan knowledge_agent, network_agent en/of resource_agent en ontvang alle antwoorden samen. Gebruik dit alleen voor het verzamelen van informatie, niet voor wijzigingen.",
+        approval_mode="never_require"
+    )
+    @traced_tool
+    async def consult_agents_parallel(
+        requests: Annotated[
+            List[SubAgentRequest],
+            Field(description="Lijst van onafhankelijke vragen, elk met agent en task")
+        ],
+        timeout_seconds: Annotated[
+            float,
+            Field(description="Maximale duur per vraag in seconden (standaard 120)", default=fanout_timeout)
+        ] = fanout_timeout
+    ) -> List[Dict[str, Any]]:
+        """Voer onafhankelijke sub-agent vragen gelijktijdig uit."""
+        semaphore = asyncio.Semaphore(fanout_concurrency)
+
+        async def branch(request: SubAgentRequest) -> Dict[str, Any]:
+            result: Dict[str, Any] = {"agent": request.agent, "task": request.task}
+            runner = runners.get(request.agent)
+            if runner is None:
+                result["error"] = f"Onbekende agent '{request.agent}'. Beschikbaar: {', '.join(runners)}"
+                return result
+
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    result["result"] = await asyncio.wait_for(runner(request.task), timeout_seconds)
+                except asyncio.TimeoutError:
+                    result["error"] = f"Geen antwoord van {request.agent} binnen {timeout_seconds:g} seconden"
+                except Exception as e:
+                    result["error"] = f"Fout bij uitvoeren van {request.agent}: {e}"
+                result["duration_seconds"] = round(time.perf_counter() - started, 2)
+            return result
+
+        # AIFunction geeft geneste modellen door als dicts (model_dump)
+        parsed = [SubAgentRequest.model_validate(r) for r in requests]
+        return list(await asyncio.gather(*(branch(r) for r in parsed)))
+
+    return consult_agents_parallel
@@ -0,0 +1,23 @@
+from typing import Annotated, Any, Dict
+
+from agent_framework import ai_function
+from pydantic import Field
+
+from ...middleware.history import output_store
+from ...telemetry import traced_tool
+
+
+@ai_function(
+    name="retrieve_tool_output",
+    description="Haal het volledige, oorspronkelijke resultaat op van een eerdere tool aanroep die in de gespreksgeschiedenis is samengevat. De referentie staat in de samenvatting (bijv. out-1a2b3c4d5e). Gebruik dit alleen als de samenvatting niet genoeg is.",
+    approval_mode="never_require"
+)
+@traced_tool
+async def retrieve_tool_output(
+    reference: Annotated[str, Field(description="Referentie uit de samenvatting, bijv. out-1a2b3c4d5e")]
+) -> Dict[str, Any]:
+    """Geef het opgeslagen resultaat van een samengevatte tool aanroep terug."""
+    entry = output_store.get(reference.strip().strip('"'))
+    if entry is None:
+        return {"error": f"Geen opgeslagen resultaat voor referentie '{reference}'; vraag de informatie opnieuw op bij de juiste agent"}
+    return entry
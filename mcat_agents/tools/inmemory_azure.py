@@ -0,0 +1,659 @@
+import base64
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import unquote, urlparse
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+from .azure_clients import default_resource_group, subscription_id
+
+# Schaal en latency van de stand-in (ook in te stellen met configure(), zie benchmarks/tool_benchmark.py)
+default_vms = int(os.getenv("MCAT_INMEMORY_VMS", "5"))
+default_nics_per_vm = int(os.getenv("MCAT_INMEMORY_NICS_PER_VM", "1"))
+default_rules_per_nsg = int(os.getenv("MCAT_INMEMORY_RULES_PER_NSG", "10"))
+default_blobs = int(os.getenv("MCAT_INMEMORY_BLOBS", "20"))
+default_document_bytes = int(os.getenv("MCAT_INMEMORY_DOCUMENT_BYTES", "8192"))
+# Gesimuleerde round-trip per Azure aanroep
+default_latency_ms = float(os.getenv("MCAT_INMEMORY_LATENCY_MS", "0"))
+
+# De North River VMs uit het scenario; bij een grotere schaal aangevuld met genummerde VMs
+scenario_vms = ["FinancieleAdministratie", "Klantregistratie", "Orderverwerking", "Rapportage", "Authenticatie"]
+# NSG per scenario VM zoals in infra/main.tf; extra benchmark VMs krijgen "<vm>-nsg"
+scenario_nsgs = {
+    "VM-FinancieleAdministratie": "NSG-Financieel",
+    "VM-Klantregistratie": "NSG-Klantregistratie",
+    "VM-Orderverwerking": "NSG-Orderverwerking",
+    "VM-Rapportage": "NSG-Rapportage",
+    "VM-Authenticatie": "NSG-Authenticatie",
+}
+blob_folders = ["Beleid", "Netwerk", "Procedures", "Incidenten"]
+download_chunk_bytes = 4 * 1024 * 1024
+_rule_ports = ["22", "80", "443", "3389", "1433", "5432", "8080-8090", "*"]
+_rule_sources = ["203.0.113.0/24", "198.51.100.10", "VirtualNetwork", "*", "10.0.0.0/16"]
+# Zelfde account en container als blob_storage.py, voor de document keys in de search index
+knowledge_container_url = (
+    f"https://{os.getenv('AZURE_STORAGE_ACCOUNT_NAME', 'northriverknowledgebase')}.blob.core.windows.net/north-river-knowledge-base"
+)
+_epoch = datetime(2025, 1, 6, 9, 0, tzinfo=timezone.utc)
+
+# Teller van de aanroepen binnen een meting; asyncio.to_thread neemt de context mee, achtergrondthreads niet
+_calls: ContextVar[Optional[Counter]] = ContextVar("mcat_inmemory_calls", default=None)
+
+
+@contextmanager
+def measure_calls() -> Iterator[Counter]:
+    """Count the stand-in calls made by the code inside the block, per operation."""
+    calls: Counter = Counter()
+    token = _calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _calls.reset(token)
+
+
+def _arm_id(provider: str, kind: str, name: str) -> str:
+    """Build an ARM resource ID in the default resource group."""
+    return f"/subscriptions/{subscription_id}/resourceGroups/{default_resource_group}/providers/{provider}/{kind}/{name}"
+
+
+def _document(index: int, size: int) -> bytes:
+    """Deterministic knowledge document of roughly `size` bytes, one policy line per line."""
+    lines = []
+    total = 0
+    line = 0
+    while total < size:
+        line += 1
+        vm = scenario_vms[(index + line) % len(scenario_vms)]
+        port = _rule_ports[(index + line) % (len(_rule_ports) - 1)]
+        text = (
+            f"Regel {line}: beleid {blob_folders[index % len(blob_folders)].lower()} voor VM-{vm}, "
+            f"IP-adres 10.0.{index % 256}.{line % 256}, poort {port}, firewall review {line % 7}.\n"
+        )
+        lines.append(text)
+        total += len(text)
+    return "".join(lines).encode("utf-8")
+
+
+class InMemoryAzure:
+    """In-process stand-in for the Azure management, search and blob clients the tools use.
+
+    Mimics the SDK model attributes and errors the tools rely on, counts every call per operation
+    and can add a fixed latency per call. Data is generated deterministically from the scale settings.
+    """
+
+    def __init__(self, **scale: Any) -> None:
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.reset(**scale)
+
+    def reset(
+        self,
+        vms: int = default_vms,
+        nics_per_vm: int = default_nics_per_vm,
+        rules_per_nsg: int = default_rules_per_nsg,
+        blobs: int = default_blobs,
+        document_bytes: int = default_document_bytes,
+        latency_ms: float = default_latency_ms,
+    ) -> None:
+        """Regenerate all resources for a scale; clients handed out earlier see the new state."""
+        with self._lock:
+            self.scale = {
+                "vms": vms,
+                "nics_per_vm": nics_per_vm,
+                "rules_per_nsg": rules_per_nsg,
+                "blobs": blobs,
+                "document_bytes": document_bytes,
+            }
+            self.latency_ms = latency_ms
+            self.calls.clear()
+            self._etag = 0
+            self.vms: Dict[str, Any] = {}
+            self.nsgs: Dict[str, Any] = {}
+            self.nics: Dict[str, Any] = {}
+            self.public_ips: Dict[str, Any] = {}
+            self.subnets: Dict[str, Any] = {}
+            self.blobs: Dict[str, Dict[str, Any]] = {}
+            self.documents: Dict[str, Dict[str, Any]] = {}
+            self._generate()
+
+    def _next_etag(self) -> str:
+        self._etag += 1
+        return f'"0x8DD{self._etag:012X}"'
+
+    def _call(self, operation: str) -> None:
+        """Count a call and wait the simulated round-trip."""
+        with self._lock:
+            self.calls[operation] += 1
+        measured = _calls.get()
+        if measured is not None:
+            measured[operation] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    # Gegevens genereren
+
+    def _rule(self, nsg_index: int, index: int) -> Any:
+        """Generated custom security rule."""
+        port = _rule_ports[(nsg_index + index) % len(_rule_ports)]
+        multiple = index % 5 == 4
+        return SimpleNamespace(
+            name=f"rule-{index:03d}-{port.replace('*', 'any')}",
+            priority=100 + index * 10,
+            direction="Inbound" if index % 3 != 2 else "Outbound",
+            access="Allow" if index % 4 != 3 else "Deny",
+            protocol="Tcp" if index % 6 else "*",
+            source_port_range="*",
+            destination_port_range=None if multiple else port,
+            destination_port_ranges=[port, "8443"] if multiple else None,
+            source_address_prefix=_rule_sources[index % len(_rule_sources)],
+            source_address_prefixes=None,
+            destination_address_prefix="*",
+            destination_address_prefixes=None,
+            description=f"Gegenereerde regel {index}",
+            etag=self._next_etag(),
+        )
+
+    @staticmethod
+    def _default_rules() -> List[Any]:
+        """The six default rules Azure adds to every NSG."""
+        rules = []
+        for name, priority, direction, access, source in [
+            ("AllowVnetInBound", 65000, "Inbound", "Allow", "VirtualNetwork"),
+            ("AllowAzureLoadBalancerInBound", 65001, "Inbound", "Allow", "AzureLoadBalancer"),
+            ("DenyAllInBound", 65500, "Inbound", "Deny", "*"),
+            ("AllowVnetOutBound", 65000, "Outbound", "Allow", "VirtualNetwork"),
+            ("AllowInternetOutBound", 65001, "Outbound", "Allow", "*"),
+            ("DenyAllOutBound", 65500, "Outbound", "Deny", "*"),
+        ]:
+            rules.append(SimpleNamespace(
+                name=name, priority=priority, direction=direction, access=access, protocol="*",
+                source_port_range="*", destination_port_range="*", destination_port_ranges=None,
+                source_address_prefix=source, source_address_prefixes=None,
+                destination_address_prefix="*", destination_address_prefixes=None,
+                description=None,
+            ))
+        return rules
+
+    def _nsg(self, name: str, rules: List[Any]) -> Any:
+        return SimpleNamespace(
+            name=name,
+            id=_arm_id("Microsoft.Network", "networkSecurityGroups", name),
+            location="westeurope",
+            tags={"omgeving": "north-river"},
+            provisioning_state="Succeeded",
+            etag=self._next_etag(),
+            security_rules=rules,
+            default_security_rules=self._default_rules(),
+        )
+
+    def _generate(self) -> None:
+        scale = self.scale
+        subnet_nsg = self._nsg("north-river-subnet-nsg", [self._rule(0, i) for i in range(min(scale["rules_per_nsg"], 3))])
+        self.nsgs[subnet_nsg.name] = subnet_nsg
+        subnet_id = _arm_id("Microsoft.Network", "virtualNetworks", "north-river-vnet") + "/subnets/default"
+        self.subnets[subnet_id] = SimpleNamespace(
+            name="default", id=subnet_id, address_prefix="10.0.0.0/16",
+            network_security_group=SimpleNamespace(id=subnet_nsg.id),
+        )
+
+        names = [f"VM-{n}" for n in scenario_vms][:scale["vms"]]
+        names += [f"VM-Bench{i:04d}" for i in range(len(names), scale["vms"])]
+        for vm_index, vm_name in enumerate(names, start=1):
+            nsg = self._nsg(scenario_nsgs.get(vm_name, f"{vm_name}-nsg"), [self._rule(vm_index, i) for i in range(scale["rules_per_nsg"])])
+            self.nsgs[nsg.name] = nsg
+
+            nic_refs = []
+            for nic_index in range(scale["nics_per_vm"]):
+                nic_name = f"{vm_name}-nic{nic_index}"
+                public_ip = None
+                if nic_index == 0:
+                    public_ip = SimpleNamespace(
+                        name=f"{vm_name}-ip",
+                        id=_arm_id("Microsoft.Network", "publicIPAddresses", f"{vm_name}-ip"),
+                        ip_address=f"20.50.{vm_index // 256}.{vm_index % 256}",
+                    )
+                    self.public_ips[public_ip.name] = public_ip
+                nic = SimpleNamespace(
+                    name=nic_name,
+                    id=_arm_id("Microsoft.Network", "networkInterfaces", nic_name),
+                    etag=self._next_etag(),
+                    network_security_group=SimpleNamespace(id=nsg.id) if nic_index == 0 else None,
+                    ip_configurations=[SimpleNamespace(
+                        name="ipconfig1",
+                        private_ip_address=f"10.0.{vm_index % 256}.{4 + nic_index}",
+                        private_ip_allocation_method="Dynamic",
+                        public_ip_address=SimpleNamespace(id=public_ip.id) if public_ip else None,
+                        subnet=SimpleNamespace(id=subnet_id),
+                    )],
+                )
+                self.nics[nic_name] = nic
+                nic_refs.append(SimpleNamespace(id=nic.id, primary=nic_index == 0))
+
+            self.vms[vm_name] = SimpleNamespace(
+                name=vm_name,
+                id=_arm_id("Microsoft.Compute", "virtualMachines", vm_name),
+                location="westeurope",
+                etag=self._next_etag(),
+                hardware_profile=SimpleNamespace(vm_size="Standard_B2s"),
+                storage_profile=SimpleNamespace(os_disk=SimpleNamespace(os_type="Linux")),
+                network_profile=SimpleNamespace(network_interfaces=nic_refs),
+                power_state="deallocated" if vm_index % 4 == 0 else "running",
+            )
+
+        for index in range(scale["blobs"]):
+            folder = blob_folders[index % len(blob_folders)]
+            name = f"{folder}/document-{index:04d}.txt"
+            data = _document(index, scale["document_bytes"])
+            self._store_blob(name, data, "text/plain")
+            self._index_document(f"{knowledge_container_url}/{name}", name, data.decode("utf-8"))
+
+    def _index_document(self, blob_url: str, title: str, content: str) -> None:
+        """Add a document to the search index with the key the blob indexer would give it."""
+        key = base64.urlsafe_b64encode(blob_url.encode("utf-8")).decode("ascii").rstrip("=")
+        self.documents[key] = {"id": key, "title": title, "content": content, "_lower": (title.lower(), content.lower())}
+
+    # Hulpfuncties voor benchmarks en tests
+
+    @property
+    def vm_names(self) -> List[str]:
+        return list(self.vms)
+
+    @property
+    def nsg_names(self) -> List[str]:
+        return [name for name in self.nsgs if name != "north-river-subnet-nsg"]
+
+    @property
+    def blob_names(self) -> List[str]:
+        return list(self.blobs)
+
+    def _store_blob(self, name: str, data: bytes, content_type: str) -> None:
+        """Write a blob (the search index follows through index_sync, as with the real services)."""
+        self.blobs[name] = {
+            "data": data,
+            "etag": self._next_etag(),
+            "last_modified": _epoch + timedelta(seconds=self._etag),
+            "content_type": content_type,
+        }
+
+    def put_blob(self, name: str, content: str, content_type: str = "text/plain") -> None:
+        """Create or replace a blob without counting it as a call (benchmark setup)."""
+        with self._lock:
+            self._store_blob(name, content.encode("utf-8"), content_type)
+
+    # Clients
+
+    def compute_client(self) -> Any:
+        return SimpleNamespace(virtual_machines=_VirtualMachines(self))
+
+    def network_client(self) -> Any:
+        return SimpleNamespace(
+            network_security_groups=_NetworkSecurityGroups(self),
+            network_interfaces=_NetworkInterfaces(self),
+            public_ip_addresses=_PublicIpAddresses(self),
+            subnets=_Subnets(self),
+            security_rules=_SecurityRules(self),
+        )
+
+    def resource_client(self) -> Any:
+        return SimpleNamespace(resource_groups=_ResourceGroups(self), resources=_Resources(self))
+
+    def search_client(self) -> "_SearchClient":
+        return _SearchClient(self)
+
+    def blob_service_client(self, account_url: str) -> "_BlobServiceClient":
+        return _BlobServiceClient(self, account_url)
+
+    def blob_client(self, blob_url: str) -> "_BlobClient":
+        parsed = urlparse(blob_url)
+        container, _, name = parsed.path.lstrip("/").partition("/")
+        return _BlobClient(self, f"{parsed.scheme}://{parsed.netloc}", container, unquote(name))
+
+
+class _Poller:
+    """Long-running operation that has already completed."""
+
+    def __init__(self, result: Any = None) -> None:
+        self._result = result
+
+    def status(self) -> str:
+        return "Succeeded"
+
+    def done(self) -> bool:
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        return None
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self._result
+
+
+class _Operations:
+    def __init__(self, backend: InMemoryAzure) -> None:
+        self._backend = backend
+
+    def _lookup(self, items: Dict[str, Any], kind: str, name: str) -> Any:
+        item = items.get(name)
+        if item is None:
+            raise ResourceNotFoundError(f"(ResourceNotFound) The Resource '{kind}/{name}' under resource group '{default_resource_group}' was not found.")
+        return item
+
+
+class _VirtualMachines(_Operations):
+    @staticmethod
+    def _instance_view(vm: Any) -> Any:
+        return SimpleNamespace(statuses=[
+            SimpleNamespace(code="ProvisioningState/succeeded", display_status="Provisioning succeeded", message=None),
+            SimpleNamespace(code=f"PowerState/{vm.power_state}", display_status=f"VM {vm.power_state}", message=None),
+        ])
+
+    def _with_view(self, vm: Any, expand: Optional[str]) -> Any:
+        if expand != "instanceView":
+            return vm
+        return SimpleNamespace(**vars(vm), instance_view=self._instance_view(vm))
+
+    def list(self, resource_group_name: str, expand: Optional[str] = None, **kwargs: Any) -> List[Any]:
+        self._backend._call("compute.virtual_machines.list")
+        return [self._with_view(vm, expand) for vm in self._backend.vms.values()]
+
+    def get(self, resource_group_name: str, vm_name: str, expand: Optional[str] = None, **kwargs: Any) -> Any:
+        self._backend._call("compute.virtual_machines.get")
+        return self._with_view(self._lookup(self._backend.vms, "Microsoft.Compute/virtualMachines", vm_name), expand)
+
+    def instance_view(self, resource_group_name: str, vm_name: str, **kwargs: Any) -> Any:
+        self._backend._call("compute.virtual_machines.instance_view")
+        return self._instance_view(self._lookup(self._backend.vms, "Microsoft.Compute/virtualMachines", vm_name))
+
+    def _set_power_state(self, operation: str, vm_name: str, state: str) -> _Poller:
+        self._backend._call(operation)
+        vm = self._lookup(self._backend.vms, "Microsoft.Compute/virtualMachines", vm_name)
+        with self._backend._lock:
+            vm.power_state = state
+            vm.etag = self._backend._next_etag()
+        return _Poller()
+
+    def begin_start(self, resource_group_name: str, vm_name: str, **kwargs: Any) -> _Poller:
+        return self._set_power_state("compute.virtual_machines.begin_start", vm_name, "running")
+
+    def begin_deallocate(self, resource_group_name: str, vm_name: str, **kwargs: Any) -> _Poller:
+        return self._set_power_state("compute.virtual_machines.begin_deallocate", vm_name, "deallocated")
+
+
+class _NetworkSecurityGroups(_Operations):
+    def list(self, resource_group_name: str, **kwargs: Any) -> List[Any]:
+        self._backend._call("network.network_security_groups.list")
+        return list(self._backend.nsgs.values())
+
+    def get(self, resource_group_name: str, network_security_group_name: str, **kwargs: Any) -> Any:
+        self._backend._call("network.network_security_groups.get")
+        return self._lookup(self._backend.nsgs, "Microsoft.Network/networkSecurityGroups", network_security_group_name)
+
+
+class _NetworkInterfaces(_Operations):
+    def list(self, resource_group_name: str, **kwargs: Any) -> List[Any]:
+        self._backend._call("network.network_interfaces.list")
+        return list(self._backend.nics.values())
+
+    def get(self, resource_group_name: str, network_interface_name: str, **kwargs: Any) -> Any:
+        self._backend._call("network.network_interfaces.get")
+        return self._lookup(self._backend.nics, "Microsoft.Network/networkInterfaces", network_interface_name)
+
+
+class _PublicIpAddresses(_Operations):
+    def get(self, resource_group_name: str, public_ip_address_name: str, **kwargs: Any) -> Any:
+        self._backend._call("network.public_ip_addresses.get")
+        return self._lookup(self._backend.public_ips, "Microsoft.Network/publicIPAddresses", public_ip_address_name)
+
+
+class _Subnets(_Operations):
+    def get(self, resource_group_name: str, virtual_network_name: str, subnet_name: str, **kwargs: Any) -> Any:
+        self._backend._call("network.subnets.get")
+        subnet_id = _arm_id("Microsoft.Network", "virtualNetworks", virtual_network_name) + f"/subnets/{subnet_name}"
+        return self._lookup(self._backend.subnets, "Microsoft.Network/virtualNetworks/subnets", subnet_id)
+
+
+class _SecurityRules(_Operations):
+    def begin_create_or_update(
+        self,
+        resource_group_name: str,
+        network_security_group_name: str,
+        security_rule_name: str,
+        security_rule_parameters: Any,
+        **kwargs: Any,
+    ) -> _Poller:
+        self._backend._call("network.security_rules.begin_create_or_update")
+        nsg = self._lookup(self._backend.nsgs, "Microsoft.Network/networkSecurityGroups", network_security_group_name)
+        security_rule_parameters.name = security_rule_name
+        with self._backend._lock:
+            # Nieuwe lijst in plaats van in-place wijzigen: lezers itereren over de oude
+            rules = [r for r in nsg.security_rules if r.name != security_rule_name]
+            nsg.security_rules = rules + [security_rule_parameters]
+            nsg.etag = self._backend._next_etag()
+        return _Poller(security_rule_parameters)
+
+    def begin_delete(self, resource_group_name: str, network_security_group_name: str, security_rule_name: str, **kwargs: Any) -> _Poller:
+        self._backend._call("network.security_rules.begin_delete")
+        nsg = self._lookup(self._backend.nsgs, "Microsoft.Network/networkSecurityGroups", network_security_group_name)
+        with self._backend._lock:
+            nsg.security_rules = [r for r in nsg.security_rules if r.name != security_rule_name]
+            nsg.etag = self._backend._next_etag()
+        return _Poller()
+
+
+class _ResourceGroups(_Operations):
+    def list(self, **kwargs: Any) -> List[Any]:
+        self._backend._call("resource.resource_groups.list")
+        return [
+            SimpleNamespace(name=name, location="westeurope", id=f"/subscriptions/{subscription_id}/resourceGroups/{name}")
+            for name in (default_resource_group, "NetworkWatcherRG")
+        ]
+
+
+class _Resources(_Operations):
+    def list_by_resource_group(self, resource_group_name: str, **kwargs: Any) -> List[Any]:
+        self._backend._call("resource.resources.list_by_resource_group")
+        backend = self._backend
+        resources = [
+            *((vm, "Microsoft.Compute/virtualMachines") for vm in backend.vms.values()),
+            *((nic, "Microsoft.Network/networkInterfaces") for nic in backend.nics.values()),
+            *((nsg, "Microsoft.Network/networkSecurityGroups") for nsg in backend.nsgs.values()),
+            *((ip, "Microsoft.Network/publicIPAddresses") for ip in backend.public_ips.values()),
+        ]
+        return [
+            SimpleNamespace(name=item.name, type=kind, kind=None, id=item.id, location="westeurope")
+            for item, kind in resources
+        ]
+
+
+class _SearchClient:
+    """Keyword search over the generated documents, scored by term frequency."""
+
+    def __init__(self, backend: InMemoryAzure) -> None:
+        self._backend = backend
+
+    def search(
+        self,
+        search_text: str,
+        top: Optional[int] = None,
+        search_fields: Optional[List[str]] = None,
+        include_total_count: bool = False,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        self._backend._call("search.search")
+        terms = re.findall(r"\w+", search_text.lower())
+        title_only = search_fields == ["title"]
+        scored = []
+        for document in list(self._backend.documents.values()):
+            title, content = document["_lower"]
+            score = sum(title.count(t) * 2 + (0 if title_only else content.count(t)) for t in terms)
+            if score:
+                scored.append((score, document))
+        scored.sort(key=lambda item: -item[0])
+
+        results = []
+        for score, document in scored[:top or 50]:
+            result = {k: v for k, v in document.items() if not k.startswith("_")}
+            result["@search.score"] = float(score)
+            result["@search.highlights"] = {"content": [document["content"][:160]]}
+            results.append(result)
+        return results
+
+    def merge_or_upload_documents(self, documents: List[Dict[str, Any]], **kwargs: Any) -> List[Any]:
+        self._backend._call("search.merge_or_upload_documents")
+        with self._backend._lock:
+            for document in documents:
+                merged = {**self._backend.documents.get(document["id"], {}), **document}
+                merged["_lower"] = (merged.get("title", "").lower(), merged.get("content", "").lower())
+                self._backend.documents[document["id"]] = merged
+        return []
+
+    def delete_documents(self, documents: List[Dict[str, Any]], **kwargs: Any) -> List[Any]:
+        self._backend._call("search.delete_documents")
+        with self._backend._lock:
+            for document in documents:
+                self._backend.documents.pop(document["id"], None)
+        return []
+
+
+class _BlobServiceClient:
+    def __init__(self, backend: InMemoryAzure, account_url: str) -> None:
+        self._backend = backend
+        self.url = account_url.rstrip("/")
+
+    def get_container_client(self, container: str) -> "_ContainerClient":
+        return _ContainerClient(self._backend, self.url, container)
+
+
+class _ContainerClient:
+    def __init__(self, backend: InMemoryAzure, account_url: str, container: str) -> None:
+        self._backend = backend
+        self._account_url = account_url
+        self.container_name = container
+
+    def list_blobs(self, name_starts_with: Optional[str] = None, **kwargs: Any) -> List[Any]:
+        self._backend._call("blob.list_blobs")
+        return [
+            _properties(name, blob)
+            for name, blob in list(self._backend.blobs.items())
+            if not name_starts_with or name.startswith(name_starts_with)
+        ]
+
+    def get_blob_client(self, blob: str) -> "_BlobClient":
+        return _BlobClient(self._backend, self._account_url, self.container_name, blob)
+
+
+def _properties(name: str, blob: Dict[str, Any], size: Optional[int] = None, content_range: Optional[str] = None) -> Any:
+    """BlobProperties-like view of a stored blob."""
+    return SimpleNamespace(
+        name=name,
+        etag=blob["etag"],
+        size=len(blob["data"]) if size is None else size,
+        content_range=content_range,
+        last_modified=blob["last_modified"],
+        content_settings=SimpleNamespace(content_type=blob["content_type"], content_encoding="utf-8"),
+    )
+
+
+class _Downloader:
+    def __init__(self, data: bytes, properties: Any) -> None:
+        self._data = data
+        self.properties = properties
+        self.size = len(data)
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def chunks(self) -> Iterator[bytes]:
+        for start in range(0, len(self._data), download_chunk_bytes):
+            yield self._data[start:start + download_chunk_bytes]
+
+    def readinto(self, stream: Any) -> int:
+        stream.write(self._data)
+        return len(self._data)
+
+
+class _BlobClient:
+    def __init__(self, backend: InMemoryAzure, account_url: str, container: str, blob_name: str) -> None:
+        self._backend = backend
+        self.container_name = container
+        self.blob_name = blob_name
+        self.url = f"{account_url}/{container}/{blob_name}"
+
+    def _blob(self) -> Dict[str, Any]:
+        blob = self._backend.blobs.get(self.blob_name)
+        if blob is None:
+            raise ResourceNotFoundError(f"The specified blob does not exist. Blob: {self.blob_name}")
+        return blob
+
+    def exists(self, **kwargs: Any) -> bool:
+        self._backend._call("blob.exists")
+        return self.blob_name in self._backend.blobs
+
+    def get_blob_properties(self, **kwargs: Any) -> Any:
+        self._backend._call("blob.get_blob_properties")
+        return _properties(self.blob_name, self._blob())
+
+    def download_blob(
+        self,
+        offset: Optional[int] = None,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+        match_condition: Optional[MatchConditions] = None,
+        **kwargs: Any,
+    ) -> _Downloader:
+        self._backend._call("blob.download_blob")
+        blob = self._blob()
+        if etag and match_condition == MatchConditions.IfNotModified and etag != blob["etag"]:
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        data = blob["data"]
+        if offset is None:
+            return _Downloader(data, _properties(self.blob_name, blob))
+        end = len(data) if length is None else min(offset + length, len(data))
+        chunk = data[offset:end]
+        content_range = f"bytes {offset}-{max(end - 1, offset)}/{len(data)}"
+        return _Downloader(chunk, _properties(self.blob_name, blob, size=len(chunk), content_range=content_range))
+
+    def upload_blob(self, data: Any, overwrite: bool = False, content_settings: Any = None, **kwargs: Any) -> Dict[str, Any]:
+        self._backend._call("blob.upload_blob")
+        if not overwrite and self.blob_name in self._backend.blobs:
+            raise ResourceExistsError(f"The specified blob already exists. Blob: {self.blob_name}")
+        content = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        content_type = getattr(content_settings, "content_type", None) or "application/octet-stream"
+        with self._backend._lock:
+            self._backend._store_blob(self.blob_name, content, content_type)
+            return {"etag": self._backend.blobs[self.blob_name]["etag"]}
+
+    def delete_blob(self, **kwargs: Any) -> None:
+        self._backend._call("blob.delete_blob")
+        self._blob()
+        with self._backend._lock:
+            self._backend.blobs.pop(self.blob_name, None)
+
+
+_backend: Optional[InMemoryAzure] = None
+_backend_lock = threading.Lock()
+
+
+def backend() -> InMemoryAzure:
+    """Return the process-wide stand-in, created with the MCAT_INMEMORY_* settings on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = InMemoryAzure()
+        return _backend
+
+
+def configure(**scale: Any) -> InMemoryAzure:
+    """Regenerate the process-wide stand-in for a scale (vms, nics_per_vm, rules_per_nsg, blobs, document_bytes, latency_ms)."""
+    stand_in = backend()
+    stand_in.reset(**scale)
+    return stand_in
@@ -1,29 +1,54 @@
 import asyncio
 import base64
 import os
+import re
 from typing import Annotated, Any, Dict, List
 
 from agent_framework import ai_function
-from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
-from azure.search.documents import SearchClient
-from azure.search.documents.indexes import SearchIndexClient
-from dotenv import load_dotenv
 from pydantic import Field
 
-load_dotenv()
+from .. import azure_clients
+from ..coalescing import coalesced
+from ..shared_cache import cached
+from .chunking import chunk_document
+from ...telemetry import traced_tool
 
 # AI Search configuratie
 endpoint = os.getenv("AI_SEARCH_PROJECT_CONNECTION_ID")
 index_name = os.getenv("AI_SEARCH_INDEX_NAME")
 api_key = os.getenv("AI_SEARCH_API_KEY")
 
+# Langere documenten worden in zoekresultaten teruggebracht tot de best passende passages
+max_result_chars = int(os.getenv("KNOWLEDGE_SEARCH_MAX_CONTENT_CHARS", "4000"))
+max_result_passages = 2
+
+
+def _best_passages(title: str, content: str, keyword: str) -> Dict[str, Any]:
+    """Reduce a long document to the passages that match the keyword best."""
+    if len(content) <= max_result_chars:
+        return {"content": content}
+
+    passages = chunk_document(title, content.encode("utf-8"))
+    terms = re.findall(r"\w+", keyword.lower())
+    ranked = sorted(passages, key=lambda p: -sum(p.text.lower().count(t) for t in terms))
+    chosen = sorted(ranked[:max_result_passages], key=lambda p: p.start)
+
+    return {
+        "content": "\n...\n".join(p.text for p in chosen),
+        "passages": [p.to_dict() for p in chosen],
+        "content_truncated": True,
+        "full_length": len(content),
+    }
+
 
 @ai_function(
     name="search_knowledge_base",
     description="Zoek naar documenten in de knowledge base op basis van een zoekterm. Gebruik dit voor het vinden van beleidsdocumenten, IP-adressen, configuratie-informatie, etc.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("knowledge")
+@coalesced
 async def search_knowledge_base(
     keyword: Annotated[
         str,
@@ -32,11 +57,7 @@ async def search_knowledge_base(
 ) -> List[Dict[str, Any]]:
     """Zoek naar documenten in de AI Search knowledge base."""
     try:
-        search_client = SearchClient(
-            endpoint,
-            index_name,
-            credential=AzureKeyCredential(api_key)
-        )
+        search_client = azure_clients.search_client(endpoint, index_name, api_key)
 
         results = search_client.search(search_text=keyword, top=10)
 
@@ -44,15 +65,15 @@ async def search_knowledge_base(
         for result in results:
             document_info = {
                 "title": result.get("title", "Geen titel"),
-                "content": result.get("content", ""),
                 "score": result.get("@search.score", 0),
             }
+            document_info.update(_best_passages(document_info["title"], result.get("content", ""), keyword))
 
             # Decode file URL indien beschikbaar
             if "id" in result:
                 try:
                     padding = "=" * (-len(result['id']) % 4)
-                    file_url = base64.b64decode(result['id'] + padding).decode("utf-8")
+                    file_url = base64.urlsafe_b64decode(result['id'] + padding).decode("utf-8")
                     document_info['file_url'] = file_url
                 except Exception:
                     document_info['file_url'] = "Niet beschikbaar"
@@ -70,6 +91,9 @@ async def search_knowledge_base(
     description="Voer een gedetailleerde zoekactie uit in de knowledge base met filters en sortering. Gebruik dit wanneer je specifieke informatie nodig hebt met meer controle over de resultaten.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("knowledge")
+@coalesced
 async def search_knowledge_base_detailed(
     keyword: Annotated[
         str,
@@ -82,11 +106,7 @@ async def search_knowledge_base_detailed(
 ) -> List[Dict[str, Any]]:
     """Voer een gedetailleerde zoekactie uit in de knowledge base."""
     try:
-        search_client = SearchClient(
-            endpoint,
-            index_name,
-            credential=AzureKeyCredential(api_key)
-        )
+        search_client = azure_clients.search_client(endpoint, index_name, api_key)
 
         results = search_client.search(
             search_text=keyword,
@@ -98,16 +118,16 @@ async def search_knowledge_base_detailed(
         for result in results:
             document_info = {
                 "title": result.get("title", "Geen titel"),
-                "content": result.get("content", ""),
                 "score": result.get("@search.score", 0),
                 "highlights": result.get("@search.highlights", {}),
             }
+            document_info.update(_best_passages(document_info["title"], result.get("content", ""), keyword))
 
             # Decode file URL indien beschikbaar
             if "id" in result:
                 try:
                     padding = "=" * (-len(result['id']) % 4)
-                    file_url = base64.b64decode(result['id'] + padding).decode("utf-8")
+                    file_url = base64.urlsafe_b64decode(result['id'] + padding).decode("utf-8")
                     document_info['file_url'] = file_url
                 except Exception:
                     document_info['file_url'] = "Niet beschikbaar"
@@ -128,6 +148,9 @@ async def search_knowledge_base_detailed(
     description="Haal een specifiek document op uit de knowledge base op basis van de exacte titel.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("knowledge")
+@coalesced
 async def get_document_by_title(
     title: Annotated[
         str,
@@ -136,11 +159,7 @@ async def get_document_by_title(
 ) -> Dict[str, Any]:
     """Haal een specifiek document op op basis van titel."""
     try:
-        search_client = SearchClient(
-            endpoint,
-            index_name,
-            credential=AzureKeyCredential(api_key)
-        )
+        search_client = azure_clients.search_client(endpoint, index_name, api_key)
 
         # Zoek naar exacte match op titel
         results = search_client.search(
@@ -160,7 +179,7 @@ async def get_document_by_title(
             if "id" in result:
                 try:
                     padding = "=" * (-len(result['id']) % 4)
-                    file_url = base64.b64decode(result['id'] + padding).decode("utf-8")
+                    file_url = base64.urlsafe_b64decode(result['id'] + padding).decode("utf-8")
                     document_info['file_url'] = file_url
                 except Exception:
                     document_info['file_url'] = "Niet beschikbaar"
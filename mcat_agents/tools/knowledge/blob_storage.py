@@ -1,22 +1,232 @@
 import asyncio
 import os
-from typing import Annotated, Any, Dict, List
+from functools import lru_cache
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
 
 from agent_framework import ai_function
-from azure.core.credentials import AzureNamedKeyCredential
-from azure.storage.blob import BlobClient, BlobServiceClient, ContentSettings
-from dotenv import load_dotenv
 from pydantic import Field
 
-load_dotenv()
+from .. import azure_clients
+from ..coalescing import coalesced, invalidates_coalesced
+from ..shared_cache import cached, invalidates_cache
+from .index_sync import queue as index_sync_queue
+from .local_mirror import KnowledgeMirror
+from ...telemetry import traced_tool
 
 account_name = os.getenv("AZURE_STORAGE_ACCOUNT_NAME", "northriverknowledgebase")
 account_key = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
 storage_account_url = f"https://{account_name}.blob.core.windows.net"
 container_name = "north-river-knowledge-base"
 
-# Create credential object
-credential = AzureNamedKeyCredential(account_name, account_key) if account_key else None
+# Gedeeltelijk lezen: maximale range per aanroep en afstand tussen checkpoints in de regelindex
+max_range_bytes = 1024 * 1024
+line_index_stride = 256
+tail_window_bytes = 64 * 1024
+
+# Optionele lokale mirror van de container (uitgeschakeld als KNOWLEDGE_MIRROR_DIR leeg is)
+mirror_dir = os.getenv("KNOWLEDGE_MIRROR_DIR")
+mirror_sync_interval = float(os.getenv("KNOWLEDGE_MIRROR_SYNC_INTERVAL", "60"))
+mirror_max_staleness = float(os.getenv("KNOWLEDGE_MIRROR_MAX_STALENESS", "300"))
+
+# Regelindex per blob URL: (etag, byte offset van elke line_index_stride-de regel, totaal aantal regels, size)
+_line_index_cache: Dict[str, Tuple[str, List[int], int, int]] = {}
+
+
+def _blob_service_client() -> Any:
+    """Return the shared BlobServiceClient for the knowledge storage account."""
+    return azure_clients.blob_service_client(storage_account_url, account_name, account_key)
+
+
+@lru_cache(maxsize=1)
+def _container_client() -> Any:
+    """Return a shared container client for the knowledge base container."""
+    return _blob_service_client().get_container_client(container_name)
+
+
+def _blob_client(blob_url: str) -> Any:
+    """Create a blob client for a blob URL with the storage account credential."""
+    return azure_clients.blob_client(blob_url, account_name, account_key)
+
+
+def _content_settings(content_type: str) -> Any:
+    """Build UTF-8 content settings for uploads."""
+    from azure.storage.blob import ContentSettings
+
+    return ContentSettings(content_type=content_type, content_encoding="utf-8")
+
+
+mirror = KnowledgeMirror(
+    mirror_dir,
+    _container_client,
+    sync_interval=mirror_sync_interval,
+    max_staleness=mirror_max_staleness,
+) if mirror_dir else None
+
+
+def _blob_name_from_url(blob_url: str) -> Optional[str]:
+    """Return the blob name for a URL inside the knowledge container, or None for other URLs."""
+    parsed = urlparse(blob_url)
+    if parsed.netloc.lower() != urlparse(storage_account_url).netloc.lower():
+        return None
+    parts = parsed.path.lstrip("/").split("/", 1)
+    if len(parts) != 2 or parts[0] != container_name or not parts[1]:
+        return None
+    return unquote(parts[1])
+
+
+def _mirror_view(blob_url: str) -> Optional[Tuple[memoryview, Dict[str, Any]]]:
+    """Serve a blob from the local mirror when it is enabled, fresh and holds the blob."""
+    if mirror is None:
+        return None
+    mirror.ensure_background_sync()
+    blob_name = _blob_name_from_url(blob_url)
+    return mirror.view(blob_name) if blob_name else None
+
+
+def _after_write(blob_url: str, action: str, content: Optional[str] = None, etag: Optional[str] = None) -> None:
+    """Mark a changed blob stale in the local mirror and queue it for immediate (re-)indexing."""
+    blob_name = _blob_name_from_url(blob_url)
+    if not blob_name:
+        return
+    if mirror is not None:
+        size = len(content.encode("utf-8")) if content is not None else None
+        mirror.invalidate(blob_name, etag=etag, size=size, deleted=action == "delete")
+    index_sync_queue.enqueue(blob_name, blob_url, action, content=content, etag=etag)
+
+
+def _list_blob_entries(prefix: str = "") -> Dict[str, Dict[str, Any]]:
+    """List blob names with ETag and metadata, from the mirror manifest when it is fresh."""
+    if mirror is not None:
+        mirror.ensure_background_sync()
+        local = mirror.listing(prefix)
+        if local is not None:
+            return local
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    for blob in _container_client().list_blobs(name_starts_with=prefix if prefix else None):
+        entries[blob.name] = {
+            "etag": blob.etag,
+            "size": blob.size,
+            "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+            "content_type": blob.content_settings.content_type if blob.content_settings else None,
+        }
+    return entries
+
+
+def _fetch_blob_bytes(blob_name: str) -> Any:
+    """Return the content of a blob in the container, as a mirror view when possible."""
+    if mirror is not None:
+        local = mirror.view(blob_name)
+        if local is not None:
+            return local[0]
+    return _container_client().get_blob_client(blob_name).download_blob(max_concurrency=1).readall()
+
+
+def _blob_url(blob_name: str) -> str:
+    """Build the blob URL for a blob name in the knowledge container."""
+    return f"{storage_account_url}/{container_name}/{blob_name}"
+
+
+def _total_size_from_range(content_range: Optional[str], fallback: int) -> int:
+    """Parse the total blob size from a 'bytes start-end/total' content range."""
+    try:
+        return int(content_range.rsplit("/", 1)[1])
+    except Exception:
+        return fallback
+
+
+def _download_range(blob_client: Any, offset: int, length: Optional[int], etag: Optional[str] = None) -> Tuple[bytes, Any]:
+    """Download a byte range of a blob, optionally pinned to an ETag."""
+    kwargs: Dict[str, Any] = {"offset": offset, "length": length, "max_concurrency": 1}
+    if etag:
+        kwargs["etag"] = etag
+        from azure.core import MatchConditions
+
+        kwargs["match_condition"] = MatchConditions.IfNotModified
+    downloader = blob_client.download_blob(**kwargs)
+    return downloader.readall(), downloader.properties
+
+
+def _index_chunks(chunks: Any) -> Tuple[List[int], int, int]:
+    """Compute line checkpoints, total line count and size from a stream of byte chunks."""
+    checkpoints = [0]
+    line_count = 0
+    position = 0
+    ends_with_newline = True
+    for chunk in chunks:
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline == -1:
+                break
+            line_count += 1
+            if line_count % line_index_stride == 0:
+                checkpoints.append(position + newline + 1)
+            start = newline + 1
+        position += len(chunk)
+        if chunk:
+            ends_with_newline = chunk[-1:] == b"\n"
+
+    total_lines = line_count if ends_with_newline else line_count + 1
+    if position == 0:
+        total_lines = 0
+    return checkpoints, total_lines, position
+
+
+def _get_line_index(blob_client: Any) -> Tuple[str, List[int], int, int]:
+    """Return the sparse line-offset index of a blob, rebuilding it when the ETag changed."""
+    cache_key = blob_client.url.split("?", 1)[0]
+    props = blob_client.get_blob_properties()
+    cached = _line_index_cache.get(cache_key)
+    if cached and cached[0] == props.etag:
+        return cached
+
+    from azure.core import MatchConditions
+
+    # Eenmalig streamen om de offsets van de checkpoints te bepalen
+    downloader = blob_client.download_blob(
+        max_concurrency=1,
+        etag=props.etag,
+        match_condition=MatchConditions.IfNotModified,
+    )
+    checkpoints, total_lines, size = _index_chunks(downloader.chunks())
+    entry = (props.etag, checkpoints, total_lines, size)
+    _line_index_cache[cache_key] = entry
+    return entry
+
+
+def _get_local_line_index(blob_url: str, view: memoryview, etag: str) -> Tuple[str, List[int], int, int]:
+    """Return the line-offset index of a mirrored blob, computed over its memory map."""
+    cache_key = blob_url.split("?", 1)[0]
+    cached = _line_index_cache.get(cache_key)
+    if cached and cached[0] == etag:
+        return cached
+
+    chunk_size = 4 * 1024 * 1024
+    chunks = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+    checkpoints, total_lines, size = _index_chunks(bytes(chunk) for chunk in chunks)
+    entry = (etag, checkpoints, total_lines, size)
+    _line_index_cache[cache_key] = entry
+    return entry
+
+
+def _lines_from_index(
+    fetch: Callable[[int, int], bytes],
+    checkpoints: List[int],
+    size: int,
+    first_index: int,
+    last_index: int,
+) -> List[bytes]:
+    """Fetch lines [first_index, last_index) using only the byte span between the surrounding checkpoints."""
+    checkpoint = first_index // line_index_stride
+    begin = checkpoints[checkpoint]
+    end_checkpoint = -(-last_index // line_index_stride)
+    end = checkpoints[end_checkpoint] if end_checkpoint < len(checkpoints) else size
+    data = fetch(begin, end)
+
+    skip = first_index - checkpoint * line_index_stride
+    return data.split(b"\n")[skip:skip + (last_index - first_index)]
 
 
 @ai_function(
@@ -24,6 +234,9 @@ credential = AzureNamedKeyCredential(account_name, account_key) if account_key e
     description="Lees de inhoud van een bestand uit Blob Storage via de blob URL. Gebruik dit om documenten te lezen uit de knowledge base.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("knowledge")
+@coalesced
 async def read_blob_file(
     blob_url: Annotated[
         str,
@@ -32,7 +245,19 @@ async def read_blob_file(
 ) -> Dict[str, Any]:
     """Lees de inhoud van een blob uit Blob Storage."""
     try:
-        blob_client = BlobClient.from_blob_url(blob_url=blob_url, credential=credential)
+        # Eerst de lokale mirror proberen
+        local = _mirror_view(blob_url)
+        if local is not None:
+            view, entry = local
+            return {
+                "blob_url": blob_url,
+                "content": str(view, "utf-8"),
+                "size": entry["size"],
+                "last_modified": entry["last_modified"],
+                "content_type": entry["content_type"],
+            }
+
+        blob_client = _blob_client(blob_url)
 
         # Download blob content
         blob_data = blob_client.download_blob(max_concurrency=1)
@@ -52,11 +277,187 @@ async def read_blob_file(
         return {"error": f"Fout bij lezen van blob {blob_url}: {e}"}
 
 
+def _read_edge_lines(blob_client: Any, num_lines: int, from_end: bool) -> Tuple[List[bytes], int, str]:
+    """Read the first or last lines of a blob with a growing byte window instead of a full download."""
+    props = blob_client.get_blob_properties()
+    size = props.size
+    if not size:
+        return [], 0, props.etag
+
+    window = tail_window_bytes
+    while True:
+        offset = max(0, size - window) if from_end else 0
+        length = min(window, size)
+        data, _ = _download_range(blob_client, offset, length, props.etag)
+        lines = data.split(b"\n")
+        if data.endswith(b"\n"):
+            lines = lines[:-1]
+        # Gedeeltelijke regels aan de rand van het venster weggooien
+        if from_end and offset > 0:
+            lines = lines[1:]
+        if not from_end and length < size and not data.endswith(b"\n"):
+            lines = lines[:-1]
+        if len(lines) >= num_lines or length >= size:
+            break
+        window *= 4
+
+    selected = lines[-num_lines:] if from_end else lines[:num_lines]
+    return selected, size, props.etag
+
+
+@ai_function(
+    name="read_blob_range",
+    description="Lees een deel van een bestand uit Blob Storage op basis van een byte offset en lengte (HTTP Range). Gebruik dit voor grote documenten of logbestanden in plaats van het hele bestand te lezen.",
+    approval_mode="never_require"
+)
+@traced_tool
+@cached("knowledge")
+@coalesced
+async def read_blob_range(
+    blob_url: Annotated[
+        str,
+        Field(description="De volledige blob URL (https://<account>.blob.core.windows.net/<container>/<path>)")
+    ],
+    offset: Annotated[
+        int,
+        Field(description="Byte offset waar het lezen begint (0 = begin van het bestand)", default=0)
+    ] = 0,
+    length: Annotated[
+        int,
+        Field(description="Aantal bytes om te lezen (standaard 65536, maximaal 1048576)", default=65536)
+    ] = 65536
+) -> Dict[str, Any]:
+    """Lees een byte range van een blob uit Blob Storage."""
+    try:
+        offset = max(offset, 0)
+        length = max(1, min(length, max_range_bytes))
+
+        local = _mirror_view(blob_url)
+        if local is not None:
+            view, entry = local
+            data = view[offset:offset + length].tobytes()
+            size = len(view)
+            etag = entry["etag"]
+        else:
+            blob_client = _blob_client(blob_url)
+            data, props = _download_range(blob_client, offset, length)
+            size = _total_size_from_range(getattr(props, "content_range", None), props.size)
+            etag = props.etag
+
+        return {
+            "blob_url": blob_url,
+            "offset": offset,
+            "length": len(data),
+            "size": size,
+            "has_more": offset + len(data) < size,
+            "etag": etag,
+            "content": data.decode("utf-8", errors="replace"),
+        }
+    except Exception as e:
+        return {"error": f"Fout bij lezen van byte range uit blob {blob_url}: {e}"}
+
+
+@ai_function(
+    name="read_blob_lines",
+    description="Lees een venster van regels uit een bestand in Blob Storage (bijv. regel 200 t/m 250), of de eerste/laatste regels (head/tail). Gebruik dit voor lange procedures en logs.",
+    approval_mode="never_require"
+)
+@traced_tool
+@cached("knowledge")
+@coalesced
+async def read_blob_lines(
+    blob_url: Annotated[
+        str,
+        Field(description="De volledige blob URL (https://<account>.blob.core.windows.net/<container>/<path>)")
+    ],
+    start_line: Annotated[
+        int,
+        Field(description="Eerste regel om te lezen, beginnend bij 1 (standaard 1). Wordt genegeerd als from_end True is.", default=1)
+    ] = 1,
+    num_lines: Annotated[
+        int,
+        Field(description="Aantal regels om te lezen (standaard 50, maximaal 500)", default=50)
+    ] = 50,
+    from_end: Annotated[
+        bool,
+        Field(description="True = lees de laatste num_lines regels van het bestand (tail)", default=False)
+    ] = False
+) -> Dict[str, Any]:
+    """Lees een regelvenster uit een blob zonder het volledige bestand te downloaden."""
+    try:
+        num_lines = max(1, min(num_lines, 500))
+        start_line = max(start_line, 1)
+
+        local = _mirror_view(blob_url)
+        if local is not None:
+            # Lokaal: index over de memory map, regels lezen zonder kopie van het hele bestand
+            view, entry = local
+            etag, checkpoints, total_lines, size = _get_local_line_index(blob_url, view, entry["etag"])
+            first_index = max(total_lines - num_lines, 0) if from_end else start_line - 1
+            if first_index >= total_lines:
+                return {
+                    "blob_url": blob_url,
+                    "message": f"Het bestand heeft maar {total_lines} regels",
+                    "total_lines": total_lines,
+                }
+            last_index = min(first_index + num_lines, total_lines)
+            lines = _lines_from_index(
+                lambda begin, end: view[begin:end].tobytes(),
+                checkpoints, size, first_index, last_index,
+            )
+            first = first_index + 1
+        elif from_end or start_line == 1:
+            # Head en tail: groeiend venster vanaf de rand, geen index nodig
+            blob_client = _blob_client(blob_url)
+            lines, size, etag = _read_edge_lines(blob_client, num_lines, from_end)
+            cached = _line_index_cache.get(blob_client.url.split("?", 1)[0])
+            total_lines = cached[2] if cached and cached[0] == etag else None
+            if from_end:
+                first = total_lines - len(lines) + 1 if total_lines is not None else None
+            else:
+                first = 1
+        else:
+            blob_client = _blob_client(blob_url)
+            etag, checkpoints, total_lines, size = _get_line_index(blob_client)
+            first_index = start_line - 1
+            if first_index >= total_lines:
+                return {
+                    "blob_url": blob_url,
+                    "message": f"Het bestand heeft maar {total_lines} regels",
+                    "total_lines": total_lines,
+                }
+
+            # Begin bij het dichtstbijzijnde checkpoint en lees tot het checkpoint na de laatste regel
+            last_index = min(first_index + num_lines, total_lines)
+            lines = _lines_from_index(
+                lambda begin, end: _download_range(blob_client, begin, end - begin, etag)[0],
+                checkpoints, size, first_index, last_index,
+            )
+            first = start_line
+
+        content = "\n".join(line.decode("utf-8", errors="replace").rstrip("\r") for line in lines)
+
+        return {
+            "blob_url": blob_url,
+            "start_line": first,
+            "end_line": first + len(lines) - 1 if first is not None and lines else None,
+            "total_lines": total_lines,
+            "size": size,
+            "etag": etag,
+            "content": content,
+        }
+    except Exception as e:
+        return {"error": f"Fout bij lezen van regels uit blob {blob_url}: {e}"}
+
+
 @ai_function(
     name="replace_blob_file_content",
     description="Vervang de volledige inhoud van een bestand in Blob Storage. Gebruik dit voor het updaten van knowledge base bestanden.",
     approval_mode="never_require"
 )
+@traced_tool
+@invalidates_cache("knowledge")
+@invalidates_coalesced
 async def replace_blob_file_content(
     blob_url: Annotated[
         str,
@@ -73,7 +474,7 @@ async def replace_blob_file_content(
 ) -> Dict[str, Any]:
     """Vervang de inhoud van een blob bestand."""
     try:
-        blob_client = BlobClient.from_blob_url(blob_url=blob_url, credential=credential)
+        blob_client = _blob_client(blob_url)
 
         # Haal oude grootte op
         try:
@@ -83,7 +484,7 @@ async def replace_blob_file_content(
             previous_size = None
 
         # Upload nieuwe content
-        settings = ContentSettings(content_type=content_type, content_encoding="utf-8")
+        settings = _content_settings(content_type)
         blob_client.upload_blob(
             new_content.encode("utf-8"),
             overwrite=True,
@@ -93,6 +494,8 @@ async def replace_blob_file_content(
         # Haal nieuwe properties op
         props = blob_client.get_blob_properties()
 
+        _after_write(blob_url, "upload", content=new_content, etag=props.etag)
+
         return {
             "blob_url": blob_url,
             "status": "updated",
@@ -111,6 +514,9 @@ async def replace_blob_file_content(
     description="Voeg tekst toe aan het einde van een bestaand bestand in Blob Storage. Gebruik dit om informatie toe te voegen aan documenten zonder de bestaande inhoud te verwijderen.",
     approval_mode="never_require"
 )
+@traced_tool
+@invalidates_cache("knowledge")
+@invalidates_coalesced
 async def append_to_blob_file(
     blob_url: Annotated[
         str,
@@ -123,7 +529,7 @@ async def append_to_blob_file(
 ) -> Dict[str, Any]:
     """Voeg tekst toe aan een bestaand blob bestand."""
     try:
-        blob_client = BlobClient.from_blob_url(blob_url=blob_url, credential=credential)
+        blob_client = _blob_client(blob_url)
 
         # Lees huidige content
         existing_blob = blob_client.download_blob(max_concurrency=1)
@@ -136,7 +542,7 @@ async def append_to_blob_file(
         # Upload updated content
         props_before = blob_client.get_blob_properties()
         content_type = props_before.content_settings.content_type if props_before.content_settings else "text/plain"
-        settings = ContentSettings(content_type=content_type, content_encoding="utf-8")
+        settings = _content_settings(content_type)
 
         blob_client.upload_blob(
             new_content.encode("utf-8"),
@@ -147,6 +553,8 @@ async def append_to_blob_file(
         # Haal nieuwe properties op
         props = blob_client.get_blob_properties()
 
+        _after_write(blob_url, "upload", content=new_content, etag=props.etag)
+
         return {
             "blob_url": blob_url,
             "status": "appended",
@@ -165,6 +573,9 @@ async def append_to_blob_file(
     description="Maak een nieuw bestand aan in Blob Storage. Gebruik dit om nieuwe documenten toe te voegen aan de knowledge base.",
     approval_mode="never_require"
 )
+@traced_tool
+@invalidates_cache("knowledge")
+@invalidates_coalesced
 async def create_blob_file(
     blob_path: Annotated[
         str,
@@ -181,10 +592,7 @@ async def create_blob_file(
 ) -> Dict[str, Any]:
     """Maak een nieuw blob bestand aan."""
     try:
-        blob_service_client = BlobServiceClient(
-            account_url=storage_account_url,
-            credential=credential
-        )
+        blob_service_client = _blob_service_client()
         container_client = blob_service_client.get_container_client(container_name)
         blob_client = container_client.get_blob_client(blob_path)
 
@@ -195,7 +603,7 @@ async def create_blob_file(
             }
 
         # Upload nieuwe blob
-        settings = ContentSettings(content_type=content_type, content_encoding="utf-8")
+        settings = _content_settings(content_type)
         blob_client.upload_blob(
             content.encode("utf-8"),
             content_settings=settings
@@ -204,6 +612,8 @@ async def create_blob_file(
         # Haal properties op
         props = blob_client.get_blob_properties()
 
+        _after_write(blob_client.url, "upload", content=content, etag=props.etag)
+
         return {
             "blob_url": blob_client.url,
             "blob_path": blob_path,
@@ -222,6 +632,9 @@ async def create_blob_file(
     description="Lijst alle bestanden op in de north-river-knowledge-base container. Gebruik dit om te zien welke documenten beschikbaar zijn.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("knowledge")
+@coalesced
 async def list_blobs_in_container(
     prefix: Annotated[
         str,
@@ -230,10 +643,7 @@ async def list_blobs_in_container(
 ) -> List[Dict[str, Any]]:
     """Lijst alle blobs op in de knowledge base container."""
     try:
-        blob_service_client = BlobServiceClient(
-            account_url=storage_account_url,
-            credential=credential
-        )
+        blob_service_client = _blob_service_client()
         container_client = blob_service_client.get_container_client(container_name)
 
         blobs = container_client.list_blobs(name_starts_with=prefix if prefix else None)
@@ -259,6 +669,9 @@ async def list_blobs_in_container(
     description="Verwijder een bestand uit Blob Storage. Gebruik dit ALLEEN na expliciete bevestiging.",
     approval_mode="never_require"
 )
+@traced_tool
+@invalidates_cache("knowledge")
+@invalidates_coalesced
 async def delete_blob_file(
     blob_url: Annotated[
         str,
@@ -267,7 +680,7 @@ async def delete_blob_file(
 ) -> Dict[str, Any]:
     """Verwijder een blob bestand."""
     try:
-        blob_client = BlobClient.from_blob_url(blob_url=blob_url, credential=credential)
+        blob_client = _blob_client(blob_url)
 
         # Check of blob bestaat
         if not blob_client.exists():
@@ -276,6 +689,8 @@ async def delete_blob_file(
         # Verwijder blob
         blob_client.delete_blob()
 
+        _after_write(blob_url, "delete")
+
         return {
             "blob_url": blob_url,
             "status": "deleted",
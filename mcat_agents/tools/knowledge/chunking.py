@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Grootte van een passage en overlap tussen opeenvolgende passages, in bytes
+chunk_bytes = int(os.getenv("KNOWLEDGE_CHUNK_BYTES", "1500"))
+overlap_bytes = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP_BYTES", "200"))
+
+
+@dataclass(frozen=True)
+class Passage:
+    """A slice of a knowledge document with a stable ID and its byte offsets in the blob."""
+
+    passage_id: str
+    blob_name: str
+    start: int
+    end: int
+    start_line: int
+    text: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialise the passage location without its text."""
+        return {
+            "passage_id": self.passage_id,
+            "offset": self.start,
+            "length": self.end - self.start,
+            "start_line": self.start_line,
+        }
+
+
+def _passage_id(blob_name: str, data: bytes, seen: Dict[str, int]) -> str:
+    """Derive a content-based ID, so unchanged passages keep their ID when other parts of a blob change."""
+    digest = hashlib.blake2b(blob_name.encode("utf-8") + b"\0" + data, digest_size=8).hexdigest()
+    occurrence = seen.get(digest, 0)
+    seen[digest] = occurrence + 1
+    return digest if occurrence == 0 else f"{digest}-{occurrence}"
+
+
+def _utf8_boundary(data: bytes, position: int) -> int:
+    """Move a split position back so it does not cut a UTF-8 character in half."""
+    while 0 < position < len(data) and (data[position] & 0xC0) == 0x80:
+        position -= 1
+    return position
+
+
+def _line_spans(data: bytes) -> List[Tuple[int, int]]:
+    """Return (start, end) byte spans of lines, splitting lines longer than one chunk."""
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    while start < len(data):
+        newline = data.find(b"\n", start)
+        end = len(data) if newline == -1 else newline + 1
+        while end - start > chunk_bytes:
+            cut = _utf8_boundary(data, start + chunk_bytes)
+            if cut <= start:
+                cut = start + chunk_bytes
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, end))
+        start = end
+    return spans
+
+
+def chunk_document(blob_name: str, data: Any) -> List[Passage]:
+    """Split a document into overlapping, line-aligned passages of about chunk_bytes."""
+    data = bytes(data)
+    spans = _line_spans(data)
+    passages: List[Passage] = []
+    seen: Dict[str, int] = {}
+
+    first = 0
+    while first < len(spans):
+        last = first
+        while last + 1 < len(spans) and spans[last + 1][1] - spans[first][0] <= chunk_bytes:
+            last += 1
+
+        start, end = spans[first][0], spans[last][1]
+        raw = data[start:end]
+        text = raw.decode("utf-8", errors="replace").strip()
+        if text:
+            passages.append(Passage(
+                passage_id=_passage_id(blob_name, raw, seen),
+                blob_name=blob_name,
+                start=start,
+                end=end,
+                start_line=data.count(b"\n", 0, start) + 1,
+                text=text,
+            ))
+        if last + 1 >= len(spans):
+            break
+
+        # Volgende passage begint zo dat de laatste overlap_bytes opnieuw meegenomen worden
+        following = last + 1
+        while following - 1 > first and end - spans[following - 1][0] <= overlap_bytes:
+            following -= 1
+        first = following
+
+    return passages
+
+
+class PassageStore:
+    """Passages per blob, re-chunked only when a blob's ETag changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._blobs: Dict[str, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Passage] = {}
+        self._listeners: List[Callable[[str, Optional[List[Passage]]], None]] = []
+
+    def subscribe(self, listener: Callable[[str, Optional[List[Passage]]], None]) -> None:
+        """Register a callback for (blob_name, passages) changes; passages is None when a blob is removed."""
+        self._listeners.append(listener)
+
+    def _notify(self, blob_name: str, passages: Optional[List[Passage]]) -> None:
+        """Inform listeners about a changed or removed blob."""
+        for listener in self._listeners:
+            listener(blob_name, passages)
+
+    def etag(self, blob_name: str) -> Optional[str]:
+        """Return the ETag the stored passages of a blob were chunked from."""
+        entry = self._blobs.get(blob_name)
+        return entry["etag"] if entry else None
+
+    def update_blob(self, blob_name: str, etag: Optional[str], data: Any) -> List[Passage]:
+        """Chunk one blob and replace its passages."""
+        passages = chunk_document(blob_name, data)
+        with self._lock:
+            previous = self._blobs.get(blob_name)
+            if previous:
+                for passage in previous["passages"]:
+                    self._by_id.pop(passage.passage_id, None)
+            self._blobs[blob_name] = {"etag": etag, "passages": passages}
+            for passage in passages:
+                self._by_id[passage.passage_id] = passage
+        self._notify(blob_name, passages)
+        return passages
+
+    def remove_blob(self, blob_name: str) -> None:
+        """Drop all passages of a blob."""
+        with self._lock:
+            previous = self._blobs.pop(blob_name, None)
+            if previous is None:
+                return
+            for passage in previous["passages"]:
+                self._by_id.pop(passage.passage_id, None)
+        self._notify(blob_name, None)
+
+    def sync(
+        self,
+        list_entries: Callable[[], Dict[str, Dict[str, Any]]],
+        fetch: Callable[[str], Any],
+        max_document_bytes: int = 10 * 1024 * 1024,
+    ) -> Dict[str, int]:
+        """Re-chunk only blobs whose ETag changed and drop blobs that disappeared."""
+        with self._sync_lock:
+            entries = list_entries()
+            rechunked = 0
+            for blob_name, entry in entries.items():
+                if self.etag(blob_name) == entry.get("etag") and blob_name in self._blobs:
+                    continue
+                if (entry.get("size") or 0) > max_document_bytes:
+                    continue
+                self.update_blob(blob_name, entry.get("etag"), fetch(blob_name))
+                rechunked += 1
+
+            removed = [name for name in self._blobs if name not in entries]
+            for blob_name in removed:
+                self.remove_blob(blob_name)
+
+            return {"blobs": len(entries), "rechunked": rechunked, "removed": len(removed)}
+
+    def get(self, passage_id: str) -> Optional[Passage]:
+        """Look up a passage by ID."""
+        return self._by_id.get(passage_id)
+
+    def passages(self, blob_name: str) -> List[Passage]:
+        """Return the passages of one blob in document order."""
+        entry = self._blobs.get(blob_name)
+        return list(entry["passages"]) if entry else []
+
+
+store = PassageStore()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any, Dict, List, Pattern
+
+from agent_framework import ai_function
+from pydantic import Field
+
+from .blob_storage import _blob_url, _fetch_blob_bytes, _list_blob_entries
+from ...telemetry import traced_tool
+
+# Maximaal aantal gelijktijdige downloads tijdens het doorzoeken
+grep_concurrency = int(os.getenv("KNOWLEDGE_GREP_CONCURRENCY", "16"))
+_executor = ThreadPoolExecutor(max_workers=grep_concurrency, thread_name_prefix="knowledge-grep")
+
+
+def _grep_document(name: str, data: Any, compiled: Pattern[str], context_lines: int) -> List[Dict[str, Any]]:
+    """Return all matching lines of one document with line number and surrounding context."""
+    text = str(data, "utf-8", errors="replace")
+    # Snelle check op het hele document voordat er per regel gezocht wordt
+    if not compiled.search(text):
+        return []
+
+    lines = text.splitlines()
+    matches: List[Dict[str, Any]] = []
+    for index, line in enumerate(lines):
+        if not compiled.search(line):
+            continue
+        matches.append({
+            "file": name,
+            "file_url": _blob_url(name),
+            "line": index + 1,
+            "text": line,
+            "context_before": lines[max(index - context_lines, 0):index],
+            "context_after": lines[index + 1:index + 1 + context_lines],
+        })
+    return matches
+
+
+@ai_function(
+    name="grep_knowledge_base",
+    description="Doorzoek alle bestanden in de knowledge base op een exacte tekst of reguliere expressie (zoals grep). Gebruik dit voor exacte zoekvragen zoals IP-adressen of poortnummers, waar AI Search slecht op werkt.",
+    approval_mode="never_require"
+)
+@traced_tool
+async def grep_knowledge_base(
+    pattern: Annotated[
+        str,
+        Field(description="De exacte tekst (of reguliere expressie als regex True is) om te zoeken, bijv. '198.51.100.50' of '3389'")
+    ],
+    prefix: Annotated[
+        str,
+        Field(description="Optioneel: doorzoek alleen bestanden onder dit pad (bijv. 'Beleid/')", default="")
+    ] = "",
+    regex: Annotated[
+        bool,
+        Field(description="True = pattern is een reguliere expressie, False = letterlijke tekst", default=False)
+    ] = False,
+    ignore_case: Annotated[
+        bool,
+        Field(description="Hoofdletterongevoelig zoeken (standaard True)", default=True)
+    ] = True,
+    context_lines: Annotated[
+        int,
+        Field(description="Aantal regels context voor en na elke match (standaard 1)", default=1)
+    ] = 1,
+    max_matches: Annotated[
+        int,
+        Field(description="Maximaal aantal matches om terug te geven (standaard 100)", default=100)
+    ] = 100
+) -> List[Dict[str, Any]]:
+    """Doorzoek alle blobs in de knowledge base op een letterlijke tekst of regex."""
+    try:
+        flags = re.IGNORECASE if ignore_case else 0
+        compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+        context_lines = max(0, min(context_lines, 5))
+        max_matches = max(1, min(max_matches, 500))
+
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(_executor, _list_blob_entries, prefix)
+
+        async def scan(name: str) -> List[Dict[str, Any]]:
+            # De eigen thread pool begrenst het aantal gelijktijdige downloads
+            data = await loop.run_in_executor(_executor, _fetch_blob_bytes, name)
+            return _grep_document(name, data, compiled, context_lines)
+
+        tasks = [asyncio.create_task(scan(name)) for name in entries]
+        matches: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        truncated = False
+        try:
+            # Resultaten verwerken zodra een document klaar is; stoppen bij max_matches
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    matches.extend(await finished)
+                except Exception as e:
+                    errors.append(str(e))
+                if len(matches) >= max_matches:
+                    truncated = True
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        matches.sort(key=lambda m: (m["file"], m["line"]))
+        matches = matches[:max_matches]
+        if truncated:
+            matches.append({"message": f"Maximaal aantal matches ({max_matches}) bereikt, resultaten zijn mogelijk afgekapt"})
+        if errors:
+            matches.append({"error": f"{len(errors)} bestand(en) konden niet gelezen worden: {errors[0]}"})
+
+        return matches if matches else [{"message": f"Geen matches gevonden voor '{pattern}' in {len(entries)} bestanden"}]
+
+    except re.error as e:
+        return [{"error": f"Ongeldige reguliere expressie '{pattern}': {e}"}]
+    except Exception as e:
+        return [{"error": f"Fout bij doorzoeken van knowledge base: {e}"}]
@@ -0,0 +1,155 @@
+import base64
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .. import azure_clients, shared_cache
+from .ai_search import api_key, endpoint, index_name
+from .chunking import store
+
+logger = logging.getLogger(__name__)
+
+# Wijzigingen worden gebundeld: wacht debounce_seconds na de laatste write, maximaal max_delay_seconds
+debounce_seconds = float(os.getenv("KNOWLEDGE_INDEX_PUSH_DEBOUNCE", "0.5"))
+max_delay_seconds = float(os.getenv("KNOWLEDGE_INDEX_PUSH_MAX_DELAY", "5"))
+max_batch_size = 100
+max_attempts = 5
+
+
+def document_id(blob_url: str) -> str:
+    """Encode a blob URL as search document key, like the blob indexer's base64Encode mapping (URL-safe, unpadded)."""
+    return base64.urlsafe_b64encode(blob_url.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _push_to_search_index(changes: List[Dict[str, Any]]) -> None:
+    """Push a batch of document changes to the Azure AI Search index."""
+    if not endpoint or not index_name:
+        return
+    search_client = azure_clients.search_client(endpoint, index_name, api_key)
+
+    uploads = [
+        {"id": document_id(c["blob_url"]), "title": c["blob_name"], "content": c["content"]}
+        for c in changes if c["action"] == "upload"
+    ]
+    deletes = [{"id": document_id(c["blob_url"])} for c in changes if c["action"] == "delete"]
+    if uploads:
+        search_client.merge_or_upload_documents(documents=uploads)
+    if deletes:
+        search_client.delete_documents(documents=deletes)
+
+
+def _update_local_indexes(changes: List[Dict[str, Any]]) -> None:
+    """Apply changes to the in-process passage store (and with it the semantic index)."""
+    for change in changes:
+        if change["action"] == "upload":
+            store.update_blob(change["blob_name"], change.get("etag"), change["content"].encode("utf-8"))
+        else:
+            store.remove_blob(change["blob_name"])
+
+
+class IndexSyncQueue:
+    """Debounced, batched and retried index pushes that run off the request path."""
+
+    def __init__(self, push: Callable[[List[Dict[str, Any]]], None], local_update: Callable[[List[Dict[str, Any]]], None]):
+        self._push = push
+        self._local_update = local_update
+        self._condition = threading.Condition()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._first_enqueued: Optional[float] = None
+        self._last_enqueued = 0.0
+        self._in_flight = 0
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"enqueued": 0, "pushed": 0, "batches": 0, "retries": 0, "failed": 0}
+
+    def _ensure_worker(self) -> None:
+        """Start the background worker thread on first use."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="knowledge-index-sync", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, blob_name: str, blob_url: str, action: str, content: Optional[str] = None, etag: Optional[str] = None) -> None:
+        """Queue a changed document; repeated writes to the same blob collapse into the latest one."""
+        with self._condition:
+            now = time.monotonic()
+            self._pending[blob_name] = {
+                "blob_name": blob_name,
+                "blob_url": blob_url,
+                "action": action,
+                "content": content,
+                "etag": etag,
+            }
+            self._first_enqueued = self._first_enqueued or now
+            self._last_enqueued = now
+            self.stats["enqueued"] += 1
+            self._ensure_worker()
+            self._condition.notify_all()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """Wait for the debounce window to close and take up to max_batch_size changes."""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            while True:
+                now = time.monotonic()
+                quiet_for = now - self._last_enqueued
+                waited = now - (self._first_enqueued or now)
+                if quiet_for >= debounce_seconds or waited >= max_delay_seconds or len(self._pending) >= max_batch_size:
+                    break
+                self._condition.wait(timeout=debounce_seconds - quiet_for)
+
+            names = list(self._pending)[:max_batch_size]
+            batch = [self._pending.pop(name) for name in names]
+            self._first_enqueued = time.monotonic() if self._pending else None
+            self._in_flight += 1
+            return batch
+
+    def _run(self) -> None:
+        """Worker loop: update local indexes, then push to the search index with jittered backoff."""
+        while True:
+            batch = self._take_batch()
+            try:
+                try:
+                    self._local_update(batch)
+                except Exception:
+                    logger.exception("Lokale index update mislukt")
+
+                for attempt in range(max_attempts):
+                    try:
+                        self._push(batch)
+                    except Exception:
+                        if attempt == max_attempts - 1:
+                            self.stats["failed"] += len(batch)
+                            logger.exception("Push naar search index mislukt na %d pogingen", max_attempts)
+                            break
+                        self.stats["retries"] += 1
+                        time.sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+                        continue
+                    self.stats["pushed"] += len(batch)
+                    self.stats["batches"] += 1
+                    # De write tool invalideerde al vóór deze push; zoekresultaten van daartussen zijn nu verouderd
+                    try:
+                        shared_cache.invalidate("knowledge")
+                    except Exception:
+                        logger.exception("Gedeelde cache niet geïnvalideerd na index push")
+                    break
+            finally:
+                with self._condition:
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Block until all queued changes are pushed (mainly for scripts and shutdown)."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(timeout=remaining)
+        return True
+
+
+queue = IndexSyncQueue(_push_to_search_index, _update_local_indexes)
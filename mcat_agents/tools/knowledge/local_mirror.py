@@ -0,0 +1,188 @@
+import json
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class KnowledgeMirror:
+    """On-disk mirror of the knowledge container, synced by listing diff and read through mmap."""
+
+    def __init__(
+        self,
+        root: str,
+        container_client_factory: Callable[[], Any],
+        sync_interval: float = 60.0,
+        max_staleness: float = 300.0,
+    ):
+        self.root = Path(root)
+        self.blob_root = self.root / "blobs"
+        self.manifest_path = self.root / "manifest.json"
+        self.sync_interval = sync_interval
+        self.max_staleness = max_staleness
+        self._container_client_factory = container_client_factory
+        self._lock = threading.Lock()
+        self._maps: Dict[str, Tuple[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+        self.blob_root.mkdir(parents=True, exist_ok=True)
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self.last_sync = 0.0
+        try:
+            saved = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            self._manifest = saved.get("blobs", {})
+            self.last_sync = float(saved.get("last_sync", 0.0))
+        except (OSError, ValueError):
+            pass
+
+    def _local_path(self, blob_name: str) -> Path:
+        """Map a blob name to its file in the mirror, refusing paths outside the mirror root."""
+        path = (self.blob_root / blob_name).resolve()
+        if self.blob_root.resolve() not in path.parents:
+            raise ValueError(f"Ongeldige blob naam: {blob_name}")
+        return path
+
+    def _save_manifest(self) -> None:
+        """Atomically write the manifest next to the mirrored blobs."""
+        # Per proces een eigen tijdelijk bestand: meerdere workers kunnen dezelfde mirror delen
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps({"last_sync": self.last_sync, "blobs": self._manifest}),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, self.manifest_path)
+
+    def is_fresh(self) -> bool:
+        """True when the last successful sync is within the freshness bound."""
+        return time.time() - self.last_sync <= self.max_staleness
+
+    def sync(self) -> Dict[str, int]:
+        """Download new and changed blobs (by ETag) and drop blobs that no longer exist."""
+        # Vóór de listing: een write daarna vervangt de entry en is zo hieronder te herkennen
+        with self._lock:
+            local = dict(self._manifest)
+
+        container_client = self._container_client_factory()
+        remote: Dict[str, Dict[str, Any]] = {}
+        for blob in container_client.list_blobs():
+            remote[blob.name] = {
+                "etag": blob.etag,
+                "size": blob.size,
+                "last_modified": blob.last_modified.isoformat() if blob.last_modified else None,
+                "content_type": blob.content_settings.content_type if blob.content_settings else None,
+            }
+
+        downloaded = 0
+        for name, entry in remote.items():
+            known = local.get(name, {})
+            if known.get("etag") == entry["etag"] and not known.get("stale"):
+                continue
+            path = self._local_path(name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.part")
+            with open(tmp_path, "wb") as handle:
+                container_client.get_blob_client(name).download_blob(max_concurrency=1).readinto(handle)
+            os.replace(tmp_path, path)
+            with self._lock:
+                # Intussen geschreven (invalidate): de entry blijft stale, de volgende sync haalt de nieuwe inhoud op
+                if self._manifest.get(name) is not local.get(name):
+                    continue
+                self._manifest[name] = entry
+                self._maps.pop(name, None)
+            downloaded += 1
+
+        removed = 0
+        for name in set(local) - set(remote):
+            with self._lock:
+                # Geschreven na de listing hierboven: niet verwijderen
+                if self._manifest.get(name) is not local.get(name):
+                    continue
+                self._manifest.pop(name, None)
+                self._maps.pop(name, None)
+            try:
+                self._local_path(name).unlink()
+            except OSError:
+                pass
+            removed += 1
+
+        with self._lock:
+            self.last_sync = time.time()
+            self._save_manifest()
+
+        return {"blobs": len(remote), "downloaded": downloaded, "removed": removed}
+
+    def invalidate(self, blob_name: str, etag: Optional[str] = None, size: Optional[int] = None, deleted: bool = False) -> None:
+        """Stop serving a blob's bytes locally until the next sync, e.g. right after it was written.
+
+        A written blob stays in the listing, marked stale, so grep and the semantic index still see it
+        (with its new ETag when known) and read its content from the container instead.
+        """
+        with self._lock:
+            self._maps.pop(blob_name, None)
+            if deleted:
+                self._manifest.pop(blob_name, None)
+                return
+            entry = dict(self._manifest.get(blob_name) or {"last_modified": None, "content_type": None})
+            entry["etag"] = etag or entry.get("etag")
+            entry["size"] = size if size is not None else entry.get("size")
+            entry["stale"] = True
+            self._manifest[blob_name] = entry
+
+    def entry(self, blob_name: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry of a mirrored blob."""
+        with self._lock:
+            return self._manifest.get(blob_name)
+
+    def listing(self, prefix: str = "") -> Optional[Dict[str, Dict[str, Any]]]:
+        """Return the mirrored blobs under a prefix, or None when the mirror is not fresh."""
+        if not self.is_fresh():
+            return None
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._manifest.items() if name.startswith(prefix)}
+
+    def view(self, blob_name: str) -> Optional[Tuple[memoryview, Dict[str, Any]]]:
+        """Return a zero-copy view on the mirrored blob, or None when it cannot be served locally."""
+        if not self.is_fresh():
+            return None
+        with self._lock:
+            entry = self._manifest.get(blob_name)
+            if entry is None or entry.get("stale"):
+                return None
+            cached = self._maps.get(blob_name)
+            if cached and cached[0] == entry["etag"]:
+                return memoryview(cached[1]), entry
+
+            try:
+                with open(self._local_path(blob_name), "rb") as handle:
+                    if os.fstat(handle.fileno()).st_size == 0:
+                        mapped: Any = b""
+                    else:
+                        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+            # Oude mappings worden niet expliciet gesloten: lopende views blijven geldig
+            self._maps[blob_name] = (entry["etag"], mapped)
+            return memoryview(mapped), entry
+
+    def _sync_loop(self) -> None:
+        """Keep the mirror within its freshness bound."""
+        while True:
+            try:
+                self.sync()
+            except Exception:
+                pass
+            time.sleep(self.sync_interval)
+
+    def ensure_background_sync(self) -> None:
+        """Start the background sync thread if it is not running yet.
+
+        A thread rather than a task on the caller's event loop: tools also run on short-lived worker
+        loops (see coalescing.py), where a task would only make progress during the next tool call.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._sync_loop, name="knowledge-mirror-sync", daemon=True)
+            self._thread.start()
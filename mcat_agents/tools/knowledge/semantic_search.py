@@ -0,0 +1,174 @@
+import asyncio
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Annotated, Any, Callable, Dict, List, Optional
+
+import numpy as np
+from agent_framework import ai_function
+from pydantic import Field
+
+from .blob_storage import _blob_url, _fetch_blob_bytes, _list_blob_entries
+from .chunking import Passage, PassageStore, store
+from ...telemetry import traced_tool
+
+# Lokale semantische index: dimensie van de gehashte vectoren en hoe vaak de listing opnieuw gecontroleerd wordt
+embedding_dim = int(os.getenv("SEMANTIC_INDEX_DIM", "4096"))
+refresh_interval = float(os.getenv("SEMANTIC_INDEX_REFRESH_INTERVAL", "30"))
+max_document_bytes = 10 * 1024 * 1024
+
+_token_pattern = re.compile(r"\w+", re.UNICODE)
+
+
+def _features(text: str) -> List[str]:
+    """Extract word unigrams, word bigrams and character trigrams from a text."""
+    words = _token_pattern.findall(text.lower())
+    features: List[str] = []
+    for i, word in enumerate(words):
+        features.append(word)
+        if i + 1 < len(words):
+            features.append(f"{word} {words[i + 1]}")
+        padded = f"#{word}#"
+        features.extend(padded[j:j + 3] for j in range(len(padded) - 2))
+    return features
+
+
+def embed(text: str) -> np.ndarray:
+    """Embed a text as an L2-normalised hashed n-gram vector (no model, no network)."""
+    vector = np.zeros(embedding_dim, dtype=np.float32)
+    counts: Dict[int, float] = {}
+    for feature in _features(text):
+        # crc32 is stabiel tussen processen, in tegenstelling tot hash()
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        index = hashed % embedding_dim
+        sign = 1.0 if hashed & 0x80000000 else -1.0
+        counts[index] = counts.get(index, 0.0) + sign
+    if not counts:
+        return vector
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    # Sublineaire term frequency zodat herhaalde woorden niet domineren
+    vector[indices] = np.sign(values) * np.log1p(np.abs(values))
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """Vector index over the passage store, stored as one contiguous float32 matrix."""
+
+    def __init__(self, passage_store: PassageStore):
+        self._store = passage_store
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._blob_passages: Dict[str, List[str]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._row_ids: List[str] = []
+        self._dirty = False
+        self._last_refresh = 0.0
+        passage_store.subscribe(self._on_blob_changed)
+
+    def _on_blob_changed(self, blob_name: str, passages: Optional[List[Passage]]) -> None:
+        """Embed new passages of a changed blob; passages that kept their ID keep their vector."""
+        new_vectors = {
+            p.passage_id: embed(p.text)
+            for p in passages or []
+            if p.passage_id not in self._vectors
+        }
+        with self._lock:
+            self._vectors.update(new_vectors)
+            previous = self._blob_passages.pop(blob_name, [])
+            if passages is not None:
+                self._blob_passages[blob_name] = [p.passage_id for p in passages]
+            current = set(self._blob_passages.get(blob_name, []))
+            for passage_id in previous:
+                if passage_id not in current:
+                    self._vectors.pop(passage_id, None)
+            self._dirty = True
+
+    def _rebuild(self) -> None:
+        """Concatenate the passage vectors into the search matrix (caller holds the lock)."""
+        row_ids = [pid for name in sorted(self._blob_passages) for pid in self._blob_passages[name]]
+        if row_ids:
+            self._matrix = np.ascontiguousarray(np.vstack([self._vectors[pid] for pid in row_ids]))
+        else:
+            self._matrix = None
+        self._row_ids = row_ids
+        self._dirty = False
+
+    def refresh(
+        self,
+        list_entries: Callable[[], Dict[str, Dict[str, Any]]],
+        fetch: Callable[[str], Any],
+        force: bool = False,
+    ) -> Dict[str, int]:
+        """Sync the passage store, which re-chunks and re-embeds only blobs whose ETag changed."""
+        with self._refresh_lock:
+            if not force and time.time() - self._last_refresh < refresh_interval:
+                return {"rechunked": 0, "removed": 0}
+            result = self._store.sync(list_entries, fetch, max_document_bytes)
+            self._last_refresh = time.time()
+            return result
+
+    def search(self, query: str, top: int) -> List[Dict[str, Any]]:
+        """Return the top passages by cosine similarity in one vectorised pass."""
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            matrix, row_ids = self._matrix, self._row_ids
+        if matrix is None or not row_ids:
+            return []
+
+        scores = matrix @ embed(query)
+        k = min(top, len(row_ids))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        results: List[Dict[str, Any]] = []
+        for row in best:
+            score = float(scores[row])
+            if score <= 0:
+                break
+            passage = self._store.get(row_ids[row])
+            if passage is None:
+                continue
+            results.append({
+                "title": passage.blob_name,
+                "content": passage.text,
+                "score": round(score, 4),
+                "file_url": _blob_url(passage.blob_name),
+                **passage.to_dict(),
+            })
+        return results
+
+
+index = SemanticIndex(store)
+
+
+@ai_function(
+    name="semantic_search_knowledge_base",
+    description="Zoek semantisch (op betekenis) in de knowledge base met een lokale vectorindex. Gebruik dit voor vragen in gewone taal of omschrijvingen, wanneer zoeken op een enkel trefwoord niets oplevert.",
+    approval_mode="never_require"
+)
+@traced_tool
+async def semantic_search_knowledge_base(
+    query: Annotated[
+        str,
+        Field(description="De vraag of omschrijving in gewone taal, bijv. 'wie mag via SSH beheren'")
+    ],
+    top: Annotated[
+        int,
+        Field(description="Aantal resultaten om terug te geven (standaard 5)", default=5)
+    ] = 5
+) -> List[Dict[str, Any]]:
+    """Zoek semantisch in de lokale vectorindex van de knowledge base."""
+    try:
+        await asyncio.to_thread(index.refresh, _list_blob_entries, _fetch_blob_bytes)
+        results = index.search(query, max(1, min(top, 20)))
+        return results if results else [{"message": f"Geen documenten gevonden voor '{query}'"}]
+
+    except Exception as e:
+        return [{"error": f"Fout bij semantisch zoeken in knowledge base: {e}"}]
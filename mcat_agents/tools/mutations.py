@@ -0,0 +1,15 @@
+# Tools die Azure of de knowledge base wijzigen. Antwoorden waarin een van deze tools is aangeroepen
+# worden nooit gecached en maken gecachte antwoorden van dezelfde agent ongeldig.
+MUTATING_TOOLS = frozenset({
+    # Network
+    "add_nsg_rule",
+    "remove_nsg_rule",
+    # Resource
+    "start_vm",
+    "stop_vm",
+    # Knowledge
+    "replace_blob_file_content",
+    "append_to_blob_file",
+    "create_blob_file",
+    "delete_blob_file",
+})
@@ -3,19 +3,13 @@ import os
 from typing import Annotated, Any, Dict, List, Optional
 
 from agent_framework import ai_function
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.compute import ComputeManagementClient
-from azure.mgmt.network import NetworkManagementClient
-from azure.mgmt.network.models import SecurityRule
-from dotenv import load_dotenv
 from ipaddress import ip_address, ip_network
 from pydantic import Field
 
-load_dotenv()
-
-credential = DefaultAzureCredential()
-subscription_id = "0818ef22-4784-4365-8a35-1f03e8c5e27d"
-default_resource_group = "north-river-resource-group"
+from ..azure_clients import compute_client, default_resource_group, network_client, subscription_id
+from ..coalescing import coalesced, invalidates_coalesced
+from ..shared_cache import cached, invalidates_cache
+from ...telemetry import traced_tool
 
 
 def _parse_name_from_id(resource_id: str, type_segment: str) -> Optional[str]:
@@ -85,15 +79,143 @@ def _prefix_allows_ip(prefix: str, ip: str) -> bool:
         return False
 
 
+def _port_matches(rule: Any, port: int) -> bool:
+    """Check whether a rule's destination port, port ranges ('20-30') or '*' cover a port."""
+    ranges: List[str] = []
+    if getattr(rule, "destination_port_range", None):
+        ranges.append(rule.destination_port_range)
+    ranges.extend(getattr(rule, "destination_port_ranges", None) or [])
+    for value in ranges:
+        if value == "*":
+            return True
+        try:
+            if "-" in value:
+                low, high = value.split("-", 1)
+                if int(low) <= port <= int(high):
+                    return True
+            elif int(value) == port:
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+# Adresruimte die de VirtualNetwork service tag benadert (VNet adressen zijn RFC 1918)
+_virtual_network_ranges = [ip_network(n) for n in ("10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16")]
+
+
+def _prefix_matches_ip(prefix: str, ip: str) -> bool:
+    """Check whether a source prefix or service tag covers an IP, following NSG semantics."""
+    try:
+        address = ip_address(ip)
+        in_virtual_network = any(address in n for n in _virtual_network_ranges)
+        if prefix in ("*", "Any", "0.0.0.0/0"):
+            return True
+        if prefix == "Internet":
+            return not in_virtual_network
+        if prefix == "VirtualNetwork":
+            return in_virtual_network
+        if prefix == "AzureLoadBalancer":
+            return ip == "168.63.129.16"
+        return address in ip_network(prefix, strict=False)
+    except ValueError:
+        return False
+
+
+def _rule_summary(rule: Any, is_default: bool) -> Dict[str, Any]:
+    """Compact description of an NSG rule for evaluation results."""
+    return {
+        "name": rule.name,
+        "priority": rule.priority,
+        "access": rule.access,
+        "protocol": rule.protocol,
+        "source_prefixes": _source_prefixes(rule),
+        "destination_prefixes": _dest_prefixes(rule),
+        "ports": _rule_ports(rule) or [rule.destination_port_range or "*"],
+        "default_rule": is_default,
+    }
+
+
+def _address_match(rule: Any, source_ip: str, destination_ips: Optional[List[str]]) -> Optional[bool]:
+    """Whether a rule's source and destination cover the traffic; None when that cannot be determined.
+
+    Membership of an application security group is not resolved, and without the VM's private IPs a
+    specific destination prefix is undetermined as well.
+    """
+    if getattr(rule, "source_application_security_groups", None):
+        source = None
+    else:
+        source = any(_prefix_matches_ip(p, source_ip) for p in _source_prefixes(rule) or ["*"])
+    if source is False:
+        return False
+
+    destinations = _dest_prefixes(rule) or ["*"]
+    if getattr(rule, "destination_application_security_groups", None):
+        destination = None
+    elif any(p in ("*", "Any", "0.0.0.0/0") for p in destinations):
+        destination = True
+    elif destination_ips:
+        destination = any(_prefix_matches_ip(p, ip) for p in destinations for ip in destination_ips)
+    else:
+        destination = None
+    if destination is False:
+        return False
+    return None if source is None or destination is None else True
+
+
+def _evaluate_inbound(
+    nsg: Any,
+    port: int,
+    source_ip: str,
+    protocol: str = "Tcp",
+    destination_ips: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Evaluate an NSG like Azure does: the first matching inbound rule by priority decides, default rules included.
+
+    Rules that may or may not match (application security groups, see _address_match) are collected;
+    when one of them precedes the deciding rule with a different access, the access is "Unknown".
+    """
+    candidates = [(r, False) for r in getattr(nsg, "security_rules", None) or []]
+    candidates += [(r, True) for r in getattr(nsg, "default_security_rules", None) or []]
+    candidates.sort(key=lambda item: item[0].priority)
+
+    undetermined: List[Dict[str, Any]] = []
+    for rule, is_default in candidates:
+        if rule.direction != "Inbound":
+            continue
+        if rule.protocol not in ("*", "Any") and rule.protocol.lower() != protocol.lower():
+            continue
+        if not _port_matches(rule, port):
+            continue
+        match = _address_match(rule, source_ip, destination_ips)
+        if match is False:
+            continue
+        if match is None:
+            undetermined.append(_rule_summary(rule, is_default))
+            continue
+        # Een onbepaalde regel met hogere priority en andere uitkomst kan deze regel voor zijn
+        unsure = [u for u in undetermined if u["access"] != rule.access]
+        return {
+            "nsg_name": nsg.name,
+            "access": "Unknown" if unsure else rule.access,
+            "rule": _rule_summary(rule, is_default),
+            "undetermined_rules": unsure,
+        }
+    return {"nsg_name": nsg.name, "access": "Unknown" if undetermined else "Deny", "rule": None, "undetermined_rules": undetermined}
+
+
 @ai_function(
     name="list_nsgs_in_resource_group",
     description="Lijst alle Network Security Groups (NSGs) in north-river-resource-group.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("network")
+@coalesced
 async def list_nsgs_in_resource_group() -> List[Dict[str, Any]]:
     """Lijst alle NSGs in de resource group."""
     try:
-        network = NetworkManagementClient(credential, subscription_id)
+        network = network_client(subscription_id)
         nsgs = network.network_security_groups.list(default_resource_group)
         results: List[Dict[str, Any]] = []
         for nsg in nsgs:
@@ -113,6 +235,9 @@ async def list_nsgs_in_resource_group() -> List[Dict[str, Any]]:
     description="Haal alle inbound en outbound security rules op voor een specifieke NSG in north-river-resource-group.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("network")
+@coalesced
 async def get_nsg_rules(
     nsg_name: Annotated[
         str,
@@ -121,7 +246,7 @@ async def get_nsg_rules(
 ) -> Dict[str, Any]:
     """Haal NSG rules op."""
     try:
-        network = NetworkManagementClient(credential, subscription_id)
+        network = network_client(subscription_id)
         nsg = network.network_security_groups.get(default_resource_group, nsg_name)
         rules = getattr(nsg, "security_rules", [])
         inbound: List[Dict[str, Any]] = []
@@ -159,6 +284,9 @@ async def get_nsg_rules(
     description="Lijst welke NSG gekoppeld is aan elke NIC van een VM in north-river-resource-group.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource", "network")
+@coalesced
 async def list_vm_nsg_associations(
     vm_name: Annotated[
         str,
@@ -167,8 +295,8 @@ async def list_vm_nsg_associations(
 ) -> Dict[str, Any]:
     """Lijst NSG associaties voor een VM."""
     try:
-        compute = ComputeManagementClient(credential, subscription_id)
-        network = NetworkManagementClient(credential, subscription_id)
+        compute = compute_client(subscription_id)
+        network = network_client(subscription_id)
         vm = compute.virtual_machines.get(default_resource_group, vm_name)
         nic_refs = getattr(getattr(vm, "network_profile", None), "network_interfaces", [])
 
@@ -197,6 +325,9 @@ async def list_vm_nsg_associations(
     description="Controleer of een NSG inbound verkeer toestaat op een specifieke poort vanaf een bron IP-adres.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("network")
+@coalesced
 async def check_nsg_port_allow(
     nsg_name: Annotated[
         str,
@@ -213,7 +344,7 @@ async def check_nsg_port_allow(
 ) -> Dict[str, Any]:
     """Controleer of een poort toegankelijk is vanaf een bron IP."""
     try:
-        network = NetworkManagementClient(credential, subscription_id)
+        network = network_client(subscription_id)
         nsg = network.network_security_groups.get(default_resource_group, nsg_name)
         rules = getattr(nsg, "security_rules", [])
 
@@ -261,6 +392,9 @@ async def check_nsg_port_allow(
     description="Controleer of een VM inbound verkeer toestaat op een poort vanaf een bron IP, door alle NICs en hun NSGs te controleren.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource", "network")
+@coalesced
 async def check_vm_port_access(
     vm_name: Annotated[
         str,
@@ -277,8 +411,8 @@ async def check_vm_port_access(
 ) -> Dict[str, Any]:
     """Controleer of een VM toegankelijk is op een poort vanaf een bron IP."""
     try:
-        compute = ComputeManagementClient(credential, subscription_id)
-        network = NetworkManagementClient(credential, subscription_id)
+        compute = compute_client(subscription_id)
+        network = network_client(subscription_id)
         vm = compute.virtual_machines.get(default_resource_group, vm_name)
         nic_refs = getattr(getattr(vm, "network_profile", None), "network_interfaces", [])
 
@@ -322,11 +456,190 @@ async def check_vm_port_access(
         return {"error": f"Fout bij controleren VM poort toegang: {e}"}
 
 
+@ai_function(
+    name="diagnose_vm_access",
+    description="Volledige diagnose in één aanroep: waarom kan een bron IP (niet) bij een VM op een poort? Haalt gelijktijdig de power state, NIC/IP configuratie en NSG rules (NIC en subnet) op en geeft één verdict met de beslissende regel.",
+    approval_mode="never_require"
+)
+@traced_tool
+@cached("resource", "network")
+@coalesced
+async def diagnose_vm_access(
+    vm_name: Annotated[
+        str,
+        Field(description="Naam van de Virtual Machine (bijv. VM-Authenticatie)")
+    ],
+    port: Annotated[
+        int,
+        Field(description="Poort nummer om te controleren (bijv. 22 voor SSH, 3389 voor RDP)")
+    ],
+    source_ip: Annotated[
+        str,
+        Field(description="Bron IP-adres om te testen (bijv. 203.0.113.10)")
+    ],
+    protocol: Annotated[
+        str,
+        Field(description="Protocol: 'Tcp' of 'Udp' (standaard Tcp)", default="Tcp")
+    ] = "Tcp"
+) -> Dict[str, Any]:
+    """Diagnoseer de bereikbaarheid van een VM op een poort vanaf een bron IP."""
+    try:
+        compute = compute_client(subscription_id)
+        network = network_client(subscription_id)
+
+        # VM definitie en power state gelijktijdig ophalen
+        vm, instance_view = await asyncio.gather(
+            asyncio.to_thread(compute.virtual_machines.get, default_resource_group, vm_name),
+            asyncio.to_thread(compute.virtual_machines.instance_view, default_resource_group, vm_name),
+        )
+        power_state = next(
+            (s.code.split("/", 1)[1] for s in instance_view.statuses or [] if s.code and s.code.startswith("PowerState/")),
+            "unknown",
+        )
+
+        nic_refs = getattr(getattr(vm, "network_profile", None), "network_interfaces", None) or []
+        nic_names = [_parse_name_from_id(ref.id, "networkInterfaces") or ref.id for ref in nic_refs]
+        nics = await asyncio.gather(*(
+            asyncio.to_thread(network.network_interfaces.get, default_resource_group, name)
+            for name in nic_names
+        ))
+
+        # Alle NSGs (NIC en subnet) en public IPs van alle NICs gelijktijdig ophalen
+        nsg_names: Dict[str, None] = {}
+        public_ip_names: Dict[str, None] = {}
+        subnet_refs: Dict[str, None] = {}
+        for nic in nics:
+            nsg_id = getattr(getattr(nic, "network_security_group", None), "id", None)
+            if nsg_id:
+                nsg_names[_parse_name_from_id(nsg_id, "networkSecurityGroups")] = None
+            for ip_config in nic.ip_configurations or []:
+                if ip_config.public_ip_address:
+                    public_ip_names[_parse_name_from_id(ip_config.public_ip_address.id, "publicIPAddresses")] = None
+                if ip_config.subnet:
+                    subnet_refs[ip_config.subnet.id] = None
+
+        subnets = await asyncio.gather(*(
+            asyncio.to_thread(
+                network.subnets.get,
+                default_resource_group,
+                _parse_name_from_id(subnet_id, "virtualNetworks"),
+                _parse_name_from_id(subnet_id, "subnets"),
+            )
+            for subnet_id in subnet_refs
+        ))
+        subnet_nsg = {}
+        for subnet_id, subnet in zip(subnet_refs, subnets):
+            nsg_id = getattr(getattr(subnet, "network_security_group", None), "id", None)
+            if nsg_id:
+                subnet_nsg[subnet_id] = _parse_name_from_id(nsg_id, "networkSecurityGroups")
+                nsg_names[subnet_nsg[subnet_id]] = None
+
+        nsg_list, public_ip_list = await asyncio.gather(
+            asyncio.gather(*(
+                asyncio.to_thread(network.network_security_groups.get, default_resource_group, name)
+                for name in nsg_names
+            )),
+            asyncio.gather(*(
+                asyncio.to_thread(network.public_ip_addresses.get, default_resource_group, name)
+                for name in public_ip_names
+            )),
+        )
+        nsgs = {nsg.name: nsg for nsg in nsg_list}
+        public_ips = {p.name: p.ip_address for p in public_ip_list}
+
+        nic_results: List[Dict[str, Any]] = []
+        for nic_name, nic in zip(nic_names, nics):
+            nic_nsg_id = getattr(getattr(nic, "network_security_group", None), "id", None)
+            nic_nsg = _parse_name_from_id(nic_nsg_id, "networkSecurityGroups") if nic_nsg_id else None
+            ip_config = (nic.ip_configurations or [None])[0]
+            subnet_id = ip_config.subnet.id if ip_config is not None and ip_config.subnet else None
+            public_ip_name = (
+                _parse_name_from_id(ip_config.public_ip_address.id, "publicIPAddresses")
+                if ip_config is not None and ip_config.public_ip_address else None
+            )
+
+            # Destination prefixes gelden voor de private IPs van de NIC
+            private_ips = [c.private_ip_address for c in nic.ip_configurations or [] if c.private_ip_address]
+            # Inbound: eerst de subnet NSG, daarna de NIC NSG; beide moeten toestaan
+            path = [
+                _evaluate_inbound(nsgs[n], port, source_ip, protocol, private_ips)
+                for n in (subnet_nsg.get(subnet_id), nic_nsg) if n
+            ]
+            denied = next((e for e in path if e["access"] == "Deny"), None)
+            unknown = next((e for e in path if e["access"] == "Unknown"), None)
+            nic_results.append({
+                "nic_name": nic_name,
+                "private_ip": ip_config.private_ip_address if ip_config is not None else None,
+                "public_ip": public_ips.get(public_ip_name),
+                "nic_nsg": nic_nsg,
+                "subnet_nsg": subnet_nsg.get(subnet_id),
+                # None: hangt af van regels die niet te bepalen zijn (application security groups)
+                "allowed": False if denied else None if unknown else True,
+                "undetermined_rules": [dict(u, nsg_name=e["nsg_name"]) for e in path for u in e["undetermined_rules"]],
+                "deciding": denied or unknown or (path[-1] if path else None),
+            })
+
+        allowed_nic = next((n for n in nic_results if n["allowed"]), None)
+        unknown_nic = next((n for n in nic_results if n["allowed"] is None), None)
+        decisive = allowed_nic or unknown_nic or (nic_results[0] if nic_results else None)
+        deciding = decisive["deciding"] if decisive else None
+        deciding_rule = dict(deciding["rule"], nsg_name=deciding["nsg_name"]) if deciding and deciding["rule"] else None
+
+        if power_state != "running":
+            verdict = "vm_not_running"
+            reason = f"VM {vm_name} is niet actief (power state: {power_state})"
+        elif not nic_results:
+            verdict = "denied"
+            reason = f"VM {vm_name} heeft geen netwerkinterfaces"
+        elif allowed_nic is None and unknown_nic is not None:
+            verdict = "unknown"
+            rules = ", ".join(f"'{u['name']}' ({u['nsg_name']})" for u in unknown_nic["undetermined_rules"])
+            reason = (
+                f"Poort {port} vanaf {source_ip} hangt af van regels met application security groups "
+                f"of destination prefixes die niet te bepalen zijn: {rules}"
+            )
+        elif allowed_nic is None:
+            verdict = "denied"
+            if deciding_rule:
+                reason = (
+                    f"Poort {port} vanaf {source_ip} wordt geweigerd door regel '{deciding_rule['name']}' "
+                    f"(priority {deciding_rule['priority']}) in {deciding_rule['nsg_name']}"
+                )
+            else:
+                reason = f"Geen regel in de NSG's van {vm_name} staat poort {port} vanaf {source_ip} toe"
+        else:
+            verdict = "allowed"
+            if deciding_rule:
+                reason = (
+                    f"Poort {port} vanaf {source_ip} is toegestaan door regel '{deciding_rule['name']}' "
+                    f"(priority {deciding_rule['priority']}) in {deciding_rule['nsg_name']}"
+                )
+            else:
+                reason = f"Geen NSG gekoppeld aan {allowed_nic['nic_name']}: verkeer wordt niet gefilterd"
+
+        return {
+            "vm_name": vm_name,
+            "port": port,
+            "source_ip": source_ip,
+            "protocol": protocol,
+            "verdict": verdict,
+            "reason": reason,
+            "power_state": power_state,
+            "deciding_rule": deciding_rule,
+            "nics": [{k: v for k, v in n.items() if k != "deciding"} for n in nic_results],
+        }
+    except Exception as e:
+        return {"error": f"Fout bij diagnose van VM toegang voor {vm_name}: {e}"}
+
+
 @ai_function(
     name="add_nsg_rule",
     description="Voeg een nieuwe security rule toe aan een NSG of update een bestaande rule. Gebruik dit om poorten te openen of regels aan te passen.",
     approval_mode="never_require"
 )
+@traced_tool
+@invalidates_cache("network")
+@invalidates_coalesced
 async def add_nsg_rule(
     nsg_name: Annotated[
         str,
@@ -371,7 +684,9 @@ async def add_nsg_rule(
 ) -> Dict[str, Any]:
     """Voeg een NSG security rule toe of update deze."""
     try:
-        network = NetworkManagementClient(credential, subscription_id)
+        from azure.mgmt.network.models import SecurityRule
+
+        network = network_client(subscription_id)
 
         # Ports handling
         dest_port_range = "*"
@@ -447,6 +762,9 @@ async def add_nsg_rule(
     description="Verwijder een security rule uit een NSG. Gebruik dit ALLEEN na expliciete bevestiging.",
     approval_mode="never_require"
 )
+@traced_tool
+@invalidates_cache("network")
+@invalidates_coalesced
 async def remove_nsg_rule(
     nsg_name: Annotated[
         str,
@@ -459,7 +777,7 @@ async def remove_nsg_rule(
 ) -> Dict[str, Any]:
     """Verwijder een NSG security rule."""
     try:
-        network = NetworkManagementClient(credential, subscription_id)
+        network = network_client(subscription_id)
         poller = network.security_rules.begin_delete(
             default_resource_group,
             nsg_name,
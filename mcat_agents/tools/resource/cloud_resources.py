@@ -1,20 +1,33 @@
 import asyncio
 import os
+import time
 from typing import Annotated, Any, Dict, List
 
 from agent_framework import ai_function
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.compute import ComputeManagementClient
-from azure.mgmt.network import NetworkManagementClient
-from azure.mgmt.resource import ResourceManagementClient
-from dotenv import load_dotenv
 from pydantic import Field
 
-load_dotenv()
+from .. import azure_clients
+from ..azure_clients import subscription_id
+from ..coalescing import coalesced, invalidates_coalesced
+from ..shared_cache import cached, invalidates_cache
+from ...middleware.progress import report_progress
+from ...telemetry import traced_tool
 
-credential = DefaultAzureCredential()
-subscription_id = "0818ef22-4784-4365-8a35-1f03e8c5e27d"
-default_resource_group = "north-river-resource-group"
+# Interval waarmee de voortgang van langlopende operaties (start/stop VM) gemeld wordt
+progress_interval_seconds = 5.0
+
+
+async def _wait_for_operation(poller: Any, description: str) -> None:
+    """Wait for a long-running Azure operation without blocking the event loop, reporting progress meanwhile."""
+    started = time.monotonic()
+    report_progress(f"{description}: {poller.status()}")
+    while not poller.done():
+        await asyncio.to_thread(poller.wait, progress_interval_seconds)
+        if not poller.done():
+            report_progress(f"{description}: {poller.status()} ({time.monotonic() - started:.0f}s)")
+    # Geeft de fout van de operatie door, net als wait()
+    poller.result()
+    report_progress(f"{description}: voltooid na {time.monotonic() - started:.0f}s")
 
 
 @ai_function(
@@ -22,6 +35,9 @@ default_resource_group = "north-river-resource-group"
     description="Gebruik deze functie om alle resource groups in de subscription op te lijsten.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource")
+@coalesced
 async def list_resource_groups(
     subscription_id: Annotated[
         str,
@@ -34,10 +50,7 @@ async def list_resource_groups(
     """Lijst alle resource groups in een subscription."""
     try:
         resource_group_list = []
-        resource_client = ResourceManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        resource_client = azure_clients.resource_client(subscription_id)
 
         for resource_group in resource_client.resource_groups.list():
             resource_group_list.append({
@@ -56,6 +69,9 @@ async def list_resource_groups(
     description="Lijst alle resources in de north-river-resource-group. Kan geen gedetailleerde informatie over individuele resources geven.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource")
+@coalesced
 async def get_resources_in_resource_group(
     subscription_id: Annotated[
         str,
@@ -68,10 +84,7 @@ async def get_resources_in_resource_group(
     """Geef alle resources in een specifieke resource group terug."""
     try:
         resource_group = "north-river-resource-group"
-        resource_client = ResourceManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        resource_client = azure_clients.resource_client(subscription_id)
 
         resources = resource_client.resources.list_by_resource_group(
             resource_group_name=resource_group
@@ -97,6 +110,9 @@ async def get_resources_in_resource_group(
     description="Lijst alle VMs in de north-river-resource-group met hun basisinformatie.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource")
+@coalesced
 async def list_vms_in_resource_group(
     subscription_id: Annotated[
         str,
@@ -109,10 +125,7 @@ async def list_vms_in_resource_group(
     """Lijst alle VMs in een resource group."""
     try:
         resource_group = "north-river-resource-group"
-        compute_client = ComputeManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        compute_client = azure_clients.compute_client(subscription_id)
 
         vms = compute_client.virtual_machines.list(resource_group_name=resource_group)
 
@@ -136,6 +149,9 @@ async def list_vms_in_resource_group(
     description="Haal de huidige status (running, stopped, deallocated) van een specifieke VM op in north-river-resource-group.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource")
+@coalesced
 async def get_vm_status(
     vm_name: Annotated[
         str,
@@ -152,10 +168,7 @@ async def get_vm_status(
     """Geef de status van een specifieke VM terug."""
     try:
         resource_group = "north-river-resource-group"
-        compute_client = ComputeManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        compute_client = azure_clients.compute_client(subscription_id)
 
         instance_view = compute_client.virtual_machines.instance_view(
             resource_group_name=resource_group,
@@ -184,6 +197,9 @@ async def get_vm_status(
     description="Haal netwerkinformatie op van een VM in north-river-resource-group, inclusief NIC, private IP, public IP en gekoppelde NSG.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("resource", "network")
+@coalesced
 async def get_vm_network_info(
     vm_name: Annotated[
         str,
@@ -200,14 +216,8 @@ async def get_vm_network_info(
     """Geef netwerkinformatie van een VM terug."""
     try:
         resource_group = "north-river-resource-group"
-        compute_client = ComputeManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
-        network_client = NetworkManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        compute_client = azure_clients.compute_client(subscription_id)
+        network_client = azure_clients.network_client(subscription_id)
 
         # Haal VM op
         vm = compute_client.virtual_machines.get(
@@ -274,6 +284,9 @@ async def get_vm_network_info(
     description="Haal informatie op over een Network Security Group (NSG), inclusief alle inbound en outbound security rules.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("network")
+@coalesced
 async def get_nsg_info(
     nsg_name: Annotated[
         str,
@@ -290,10 +303,7 @@ async def get_nsg_info(
     """Geef gedetailleerde informatie over een NSG terug."""
     try:
         resource_group = "north-river-resource-group"
-        network_client = NetworkManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        network_client = azure_clients.network_client(subscription_id)
 
         nsg = network_client.network_security_groups.get(
             resource_group_name=resource_group,
@@ -348,6 +358,9 @@ async def get_nsg_info(
     description="Lijst alle Network Security Groups (NSGs) in north-river-resource-group op.",
     approval_mode="never_require"
 )
+@traced_tool
+@cached("network")
+@coalesced
 async def list_nsgs(
     subscription_id: Annotated[
         str,
@@ -360,10 +373,7 @@ async def list_nsgs(
     """Lijst alle NSGs in een resource group."""
     try:
         resource_group = "north-river-resource-group"
-        network_client = NetworkManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        network_client = azure_clients.network_client(subscription_id)
 
         nsgs = network_client.network_security_groups.list(resource_group_name=resource_group)
 
@@ -386,6 +396,9 @@ async def list_nsgs(
     description="Start een VM in north-river-resource-group die momenteel gestopt of deallocated is.",
     approval_mode="always_require"
 )
+@traced_tool
+@invalidates_cache("resource")
+@invalidates_coalesced
 async def start_vm(
     vm_name: Annotated[
         str,
@@ -402,16 +415,14 @@ async def start_vm(
     """Start een VM."""
     try:
         resource_group = "north-river-resource-group"
-        compute_client = ComputeManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        compute_client = azure_clients.compute_client(subscription_id)
 
-        async_vm_start = compute_client.virtual_machines.begin_start(
+        async_vm_start = await asyncio.to_thread(
+            compute_client.virtual_machines.begin_start,
             resource_group_name=resource_group,
             vm_name=vm_name
         )
-        async_vm_start.wait()
+        await _wait_for_operation(async_vm_start, f"VM {vm_name} starten")
 
         return {
             "success": True,
@@ -426,6 +437,9 @@ async def start_vm(
     description="Stop een VM (deallocate) in north-river-resource-group om kosten te besparen.",
     approval_mode="always_require"
 )
+@traced_tool
+@invalidates_cache("resource")
+@invalidates_coalesced
 async def stop_vm(
     vm_name: Annotated[
         str,
@@ -442,16 +456,14 @@ async def stop_vm(
     """Stop (deallocate) een VM."""
     try:
         resource_group = "north-river-resource-group"
-        compute_client = ComputeManagementClient(
-            credential=credential,
-            subscription_id=subscription_id
-        )
+        compute_client = azure_clients.compute_client(subscription_id)
 
-        async_vm_stop = compute_client.virtual_machines.begin_deallocate(
+        async_vm_stop = await asyncio.to_thread(
+            compute_client.virtual_machines.begin_deallocate,
             resource_group_name=resource_group,
             vm_name=vm_name
         )
-        async_vm_stop.wait()
+        await _wait_for_operation(async_vm_stop, f"VM {vm_name} stoppen")
 
         return {
             "success": True,
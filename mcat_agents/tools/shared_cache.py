@@ -0,0 +1,300 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .coalescing import call_key
+from .mutations import MUTATING_TOOLS
+
+logger = logging.getLogger(__name__)
+
+# Gedeelde cache tussen worker processen: "memory" (alleen dit proces), "sqlite:///pad/naar/cache.db" of "redis://host:6379/0".
+# Leeg: geen cache van tool resultaten en een proces-lokale response cache (zoals zonder workers)
+cache_url = os.getenv("MCAT_SHARED_CACHE", "")
+# Hoe lang een tool resultaat per namespace bruikbaar blijft; wijzigingen via de tools maken het direct ongeldig,
+# wijzigingen buiten de agents om (portal, Terraform) zijn na hooguit deze tijd zichtbaar
+namespace_ttls = {
+    "network": float(os.getenv("SHARED_CACHE_TTL_NETWORK", "60")),
+    "resource": float(os.getenv("SHARED_CACHE_TTL_RESOURCE", "30")),
+    "knowledge": float(os.getenv("SHARED_CACHE_TTL_KNOWLEDGE", "300")),
+}
+memory_max_entries = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "4096"))
+# Verlopen entries in SQLite opruimen na zoveel writes
+sqlite_prune_every = 256
+
+stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "errors": 0}
+
+
+class MemoryCache:
+    """Process-local cache tier with TTL, LRU eviction and generation counters."""
+
+    def __init__(self, max_entries: int = memory_max_entries):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[(namespace, key)]
+                return None
+            self._entries.move_to_end((namespace, key))
+            return entry[1]
+
+    def set(self, namespace: str, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[(namespace, key)] = (time.time() + ttl, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str) -> int:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            return self._generations[namespace]
+
+
+class SqliteCache:
+    """Cache tier in a SQLite database in WAL mode, shared by all worker processes on one host."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, value TEXT, expires REAL, "
+                "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, generation INTEGER)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Eén verbinding per thread; WAL laat lezers doorgaan terwijl een ander proces schrijft
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires >= ?", (namespace, key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace: str, key: str, value: str, ttl: float) -> None:
+        db = self._connection()
+        db.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, key, value, time.time() + ttl),
+        )
+        self._writes += 1
+        if self._writes % sqlite_prune_every == 0:
+            db.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+
+    def generation(self, namespace: str) -> int:
+        row = self._connection().execute("SELECT generation FROM generations WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace: str) -> int:
+        row = self._connection().execute(
+            "INSERT INTO generations (namespace, generation) VALUES (?, 1) "
+            "ON CONFLICT (namespace) DO UPDATE SET generation = generation + 1 RETURNING generation",
+            (namespace,),
+        ).fetchone()
+        return row[0]
+
+
+class RedisCache:
+    """Cache tier in Redis (or a Redis-compatible server), shared by workers on several hosts or containers."""
+
+    def __init__(self, url: str, prefix: str = "mcat"):
+        import redis
+
+        self._client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self._prefix = prefix
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        value = self._client.get(f"{self._prefix}:{namespace}:{key}")
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, namespace: str, key: str, value: str, ttl: float) -> None:
+        self._client.set(f"{self._prefix}:{namespace}:{key}", value, px=max(int(ttl * 1000), 1))
+
+    def generation(self, namespace: str) -> int:
+        return int(self._client.get(f"{self._prefix}:generation:{namespace}") or 0)
+
+    def bump(self, namespace: str) -> int:
+        return int(self._client.incr(f"{self._prefix}:generation:{namespace}"))
+
+
+def cache_from_url(url: str) -> Any:
+    """Create the cache tier for a MCAT_SHARED_CACHE value."""
+    if url == "memory":
+        return MemoryCache()
+    if url.startswith("sqlite:///"):
+        return SqliteCache(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    raise ValueError(f"Onbekende MCAT_SHARED_CACHE: {url}")
+
+
+_cache: Any = None
+_cache_lock = threading.Lock()
+
+
+def shared_cache() -> Any:
+    """Return the process-wide cache tier, or None when MCAT_SHARED_CACHE is not set."""
+    global _cache
+    if not cache_url:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = cache_from_url(cache_url)
+        return _cache
+
+
+def lookup(namespace: str, key: str) -> Optional[Any]:
+    """Cached JSON value, or None on a miss or when the cache tier is unavailable."""
+    cache = shared_cache()
+    if cache is None:
+        return None
+    try:
+        value = cache.get(namespace, key)
+    except Exception:
+        stats["errors"] += 1
+        logger.warning("Gedeelde cache niet leesbaar; wordt overgeslagen", exc_info=True)
+        return None
+    if value is None:
+        stats["misses"] += 1
+        return None
+    stats["hits"] += 1
+    return json.loads(value)
+
+
+def store(namespace: str, key: str, value: Any, ttl: float) -> None:
+    """Store a JSON-serialisable value; failures of the cache tier are logged and ignored."""
+    cache = shared_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(namespace, key, json.dumps(value, ensure_ascii=False, default=str), ttl)
+        stats["stores"] += 1
+    except Exception:
+        stats["errors"] += 1
+        logger.warning("Gedeelde cache niet schrijfbaar; wordt overgeslagen", exc_info=True)
+
+
+def generations(*namespaces: str) -> Optional[Tuple[int, ...]]:
+    """Current generation of each namespace, or None when the cache tier is unavailable."""
+    cache = shared_cache()
+    if cache is None:
+        return None
+    try:
+        return tuple(cache.generation(namespace) for namespace in namespaces)
+    except Exception:
+        stats["errors"] += 1
+        logger.warning("Gedeelde cache niet bereikbaar; wordt overgeslagen", exc_info=True)
+        return None
+
+
+def invalidate(*namespaces: str) -> None:
+    """Make every cached value of the namespaces unreachable, in all workers."""
+    cache = shared_cache()
+    if cache is None:
+        return
+    for namespace in namespaces:
+        try:
+            cache.bump(namespace)
+            stats["invalidations"] += 1
+        except Exception:
+            stats["errors"] += 1
+            logger.warning("Gedeelde cache: invalidatie van %s mislukt", namespace, exc_info=True)
+
+
+async def _cache_io(call: Callable[..., Any], *args: Any) -> Any:
+    """Run a cache tier operation; SQLite and Redis I/O goes to a worker thread so it never blocks the event loop."""
+    if isinstance(shared_cache(), MemoryCache):
+        return call(*args)
+    return await asyncio.to_thread(call, *args)
+
+
+def _is_error(result: Any) -> bool:
+    """Tools report failures as {"error": ...} (or a list with one); those are never cached."""
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return any(isinstance(item, dict) and "error" in item for item in result)
+    return False
+
+
+def cached(*namespaces: str) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Cache a read-only tool's results in the shared tier, keyed by arguments and the generations of the namespaces it reads.
+
+    Place it under @traced_tool and above @coalesced: a hit skips the call, a miss goes through
+    single-flight. The TTL is the shortest of the namespaces' TTLs.
+    """
+
+    def decorate(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        name = func.__name__
+        if name in MUTATING_TOOLS:
+            raise ValueError(f"{name} wijzigt Azure of de knowledge base en kan niet gecached worden")
+        signature = inspect.signature(func)
+        ttl = min(namespace_ttls[namespace] for namespace in namespaces)
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            current = await _cache_io(generations, *namespaces)
+            if current is None:
+                return await func(*args, **kwargs)
+            raw = json.dumps([name, call_key(signature, args, kwargs), current])
+            key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+            hit = await _cache_io(lookup, "tools", key)
+            if hit is not None:
+                return hit
+            result = await func(*args, **kwargs)
+            if not _is_error(result):
+                await _cache_io(store, "tools", key, result, ttl)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def invalidates_cache(*namespaces: str) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Mark a mutating tool: it invalidates the namespaces in all workers before and after the write."""
+
+    def decorate(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            # Vóór: niemand leest tijdens de wijziging een oud resultaat; na: een lezing die tijdens de wijziging begon wordt niet hergebruikt
+            await _cache_io(invalidate, *namespaces)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                await _cache_io(invalidate, *namespaces)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,211 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from azure.core.exceptions import ServiceRequestTimeoutError
+from azure.core.pipeline.policies import RetryPolicy, SansIOHTTPPolicy
+
+from ..telemetry import azure_retries, azure_throttle_wait, azure_throttled
+
+logger = logging.getLogger(__name__)
+
+
+def _limit(name: str, default: str) -> Tuple[float, float]:
+    """Parse a "requests_per_second/burst" limit; a rate of 0 disables the bucket."""
+    rate, _, burst = os.getenv(name, default).partition("/")
+    return float(rate), float(burst or rate)
+
+
+# Token bucket per service ("requests per seconde/burst"); ARM geldt per subscription, dus compute, network en resource delen één bucket
+service_limits = {
+    "arm": _limit("MCAT_THROTTLE_ARM", "20/200"),
+    "search": _limit("MCAT_THROTTLE_SEARCH", "15/30"),
+    "storage": _limit("MCAT_THROTTLE_STORAGE", "200/400"),
+}
+# Onder dit aantal resterende requests (x-ms-ratelimit-remaining-*) remt de bucket evenredig af
+low_remaining = int(os.getenv("MCAT_THROTTLE_LOW_REMAINING", "50"))
+# Retries met jitter en een deadline per aanroep, inclusief wachttijd in de bucket en Retry-After
+retry_total = int(os.getenv("MCAT_AZURE_RETRY_TOTAL", "6"))
+retry_backoff = float(os.getenv("MCAT_AZURE_RETRY_BACKOFF", "0.8"))
+retry_backoff_max = float(os.getenv("MCAT_AZURE_RETRY_BACKOFF_MAX", "20"))
+call_deadline = float(os.getenv("MCAT_AZURE_CALL_DEADLINE", "60"))
+throttle_statuses = {429, 503}
+# Wachttijd na een 429/503 zonder Retry-After
+default_pause = 1.0
+_deadline_key = "mcat_deadline"
+
+
+class ThrottleTimeoutError(ServiceRequestTimeoutError):
+    """The token bucket cannot hand out a request slot before the call's deadline."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket for one Azure service, paused by Retry-After and slowed down when the service's remaining quota runs low."""
+
+    def __init__(self, service: str, rate: float, burst: float):
+        self.service = service
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._factor = 1.0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate * self._factor)
+        self._updated = now
+
+    def acquire(self, deadline: Optional[float] = None) -> float:
+        """Take one token, waiting for it if needed; returns the wait in seconds and raises when it would pass the deadline."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / (self.rate * self._factor)
+            if deadline is not None and now + wait > deadline:
+                raise ThrottleTimeoutError(
+                    f"Azure {self.service} throttled: wachttijd {wait:.1f}s overschrijdt de deadline van de aanroep"
+                )
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds` (the service asked to back off) and start again from an empty bucket."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def observe_remaining(self, remaining: int) -> bool:
+        """Slow the refill down in proportion to a low remaining quota; True when the bucket is now slowed down."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._factor = 1.0 if remaining >= low_remaining else max(remaining / low_remaining, 0.1)
+            return self._factor < 1.0
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(service: str) -> TokenBucket:
+    """Return the process-wide token bucket of a service."""
+    with _buckets_lock:
+        if service not in _buckets:
+            rate, burst = service_limits.get(service, (0.0, 0.0))
+            _buckets[service] = TokenBucket(service, rate, burst)
+        return _buckets[service]
+
+
+def _remaining_quota(headers: Any) -> Optional[int]:
+    """Lowest x-ms-ratelimit-remaining-* value of a response (ARM reports reads, writes and deletes per subscription and tenant)."""
+    values = []
+    for name, value in headers.items():
+        if name.lower().startswith("x-ms-ratelimit-remaining-"):
+            try:
+                values.append(int(value))
+            except ValueError:
+                continue
+    return min(values) if values else None
+
+
+class ThrottlingPolicy(SansIOHTTPPolicy):
+    """Per-retry pipeline policy: waits for a token before every attempt and feeds throttling responses back into the bucket."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+        self.bucket = bucket(service)
+        self._headers = RetryPolicy.no_retries()
+
+    def on_request(self, request: Any) -> None:
+        waited = self.bucket.acquire(request.context.get(_deadline_key))
+        if waited:
+            azure_throttle_wait.record(waited, {"mcat.azure.service": self.service})
+
+    def on_response(self, request: Any, response: Any) -> None:
+        self.observe(response)
+
+    def observe(self, response: Any) -> None:
+        """Pause the bucket on 429/503 (for Retry-After or a default pause) and adapt it to the remaining quota."""
+        http_response = response.http_response
+        if http_response.status_code in throttle_statuses:
+            retry_after = self._headers.get_retry_after(response)
+            self.bucket.pause(retry_after or default_pause)
+            azure_throttled.add(1, {"mcat.azure.service": self.service, "mcat.azure.reason": str(http_response.status_code)})
+            logger.warning("Azure %s throttled (%s), pauze %.1fs", self.service, http_response.status_code, retry_after or default_pause)
+            return
+        remaining = _remaining_quota(http_response.headers)
+        if remaining is not None and self.bucket.observe_remaining(remaining):
+            azure_throttled.add(1, {"mcat.azure.service": self.service, "mcat.azure.reason": "low_remaining"})
+
+
+class DeadlineRetryPolicy(RetryPolicy):
+    """Retry policy with jittered exponential backoff that honours Retry-After and never waits past the call's deadline."""
+
+    def __init__(self, service: str, **kwargs: Any):
+        kwargs.setdefault("retry_total", retry_total)
+        kwargs.setdefault("retry_backoff_factor", retry_backoff)
+        kwargs.setdefault("retry_backoff_max", retry_backoff_max)
+        kwargs.setdefault("timeout", call_deadline)
+        super().__init__(**kwargs)
+        self.service = service
+
+    def get_backoff_time(self, settings: Dict[str, Any]) -> float:
+        # Exponentieel vanaf de eerste retry, met "equal jitter" zodat gelijktijdige sessies niet tegelijk terugkomen
+        attempts = max(len(settings["history"]), 1)
+        backoff = min(settings["max_backoff"], settings["backoff"] * (2 ** (attempts - 1)))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def send(self, request: Any) -> Any:
+        # De bucket (per retry) en is_retry lezen de deadline uit de gedeelde pipeline context
+        request.context[_deadline_key] = time.monotonic() + request.context.options.get("timeout", self.timeout)
+        return super().send(request)
+
+    def is_retry(self, settings: Dict[str, Any], response: Any) -> bool:
+        if not super().is_retry(settings, response):
+            return False
+        deadline = response.context.get(_deadline_key)
+        wait = self.get_retry_after(response) or self.get_backoff_time({**settings, "history": settings["history"] + [None]})
+        if deadline is not None and time.monotonic() + wait > deadline:
+            logger.warning("Azure %s: geen retry meer binnen de deadline (%s)", self.service, response.http_response.status_code)
+            return False
+        return True
+
+    def increment(self, settings: Dict[str, Any], response: Any = None, error: Any = None) -> bool:
+        if isinstance(error, ThrottleTimeoutError):
+            return False
+        retrying = super().increment(settings, response=response, error=error)
+        if retrying:
+            reason = type(error).__name__ if error is not None else str(response.http_response.status_code)
+            azure_retries.add(1, {"mcat.azure.service": self.service, "mcat.azure.reason": reason})
+        return retrying
+
+
+def client_options(service: str) -> Dict[str, Any]:
+    """Keyword arguments for an azure-core based client (ARM management clients, AI Search): retries and the service's bucket."""
+    return {"retry_policy": DeadlineRetryPolicy(service), "per_retry_policies": [ThrottlingPolicy(service)]}
+
+
+def storage_options() -> Dict[str, Any]:
+    """Keyword arguments for a Storage client: its own jittered ExponentialRetry, with the bucket attached via the per-attempt hooks."""
+    policy = ThrottlingPolicy("storage")
+    return {
+        "retry_total": retry_total,
+        "initial_backoff": retry_backoff,
+        "increment_base": 2,
+        "raw_request_hook": policy.on_request,
+        "raw_response_hook": policy.observe,
+    }
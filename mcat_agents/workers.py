@@ -0,0 +1,111 @@
+"""Multi-worker DevUI: several worker processes serving helper_agent, sharing one cache tier.
+
+Each worker is a full DevUI process on its own port (port, port+1, ...), so CPU-bound work such as
+JSON serialisation, rule evaluation and index search runs in parallel instead of behind one GIL. Tool
+results (NSG snapshots, topology, blob contents, search results) and sub-agent answers are shared
+through MCAT_SHARED_CACHE: a SQLite database in WAL mode for workers on one host, or Redis for workers
+in several containers. Writes through the tools invalidate the cached values in every worker.
+
+DevUI keeps conversations and entity IDs inside the process, so put a load balancer with session
+affinity in front of the workers, or give each engineer their own worker.
+
+Run from the repository root:
+
+    python -m mcat_agents.workers --workers 4 --port 8080
+    MCAT_SHARED_CACHE=redis://localhost:6379/0 python -m mcat_agents.workers --workers 4 --host 0.0.0.0
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+default_cache = "sqlite:///.cache/mcat-shared-cache.db"
+# Een worker die vaker dan dit binnen restart_window_seconds stopt wordt niet meer herstart
+max_restarts = 5
+restart_window_seconds = 60.0
+
+
+def _start_worker(port: int, host: str, cache: str) -> subprocess.Popen:
+    environment = {**os.environ, "MCAT_SHARED_CACHE": cache}
+    return subprocess.Popen([sys.executable, "-m", "mcat_agents.workers", "--worker-port", str(port), "--host", host], env=environment)
+
+
+def supervise(ports: List[int], host: str, cache: str) -> int:
+    """Start a worker per port, restart workers that stop, and stop all workers on SIGINT/SIGTERM."""
+    workers: Dict[int, subprocess.Popen] = {port: _start_worker(port, host, cache) for port in ports}
+    restarts: Dict[int, List[float]] = {port: [] for port in ports}
+    stopping = False
+
+    def stop(signum: int, frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for port, worker in workers.items():
+        print(f"Worker op {host}:{port} (pid {worker.pid})", file=sys.stderr)
+
+    exit_code = 0
+    while not stopping and workers:
+        time.sleep(0.5)
+        for port, worker in list(workers.items()):
+            if worker.poll() is None:
+                continue
+            now = time.monotonic()
+            restarts[port] = [t for t in restarts[port] if now - t < restart_window_seconds] + [now]
+            if len(restarts[port]) > max_restarts:
+                print(f"Worker op poort {port} blijft stoppen (exit code {worker.returncode}); niet meer herstart", file=sys.stderr)
+                del workers[port]
+                exit_code = 1
+                continue
+            print(f"Worker op poort {port} gestopt (exit code {worker.returncode}); herstart", file=sys.stderr)
+            workers[port] = _start_worker(port, host, cache)
+
+    for worker in workers.values():
+        worker.terminate()
+    for worker in workers.values():
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+    return exit_code
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Number of worker processes")
+    parser.add_argument("--port", type=int, default=8080, help="Port of the first worker; the others follow")
+    parser.add_argument("--host", default="127.0.0.1", help="Host the workers bind to")
+    parser.add_argument("--cache", help=f"Shared cache tier (default: MCAT_SHARED_CACHE, else {default_cache})")
+    parser.add_argument("--worker-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_port:
+        from mcat_agents.observation_experiment import main as serve_worker
+
+        serve_worker(port=args.worker_port, host=args.host)
+        return 0
+
+    cache = args.cache or os.getenv("MCAT_SHARED_CACHE") or default_cache
+    if cache == "memory":
+        print("Fout bij starten workers: MCAT_SHARED_CACHE=memory wordt niet gedeeld tussen processen", file=sys.stderr)
+        return 1
+    # Eén keer openen vóór de workers starten: schema aanmaken, of een onbereikbare Redis meteen melden
+    from mcat_agents.tools.shared_cache import cache_from_url
+
+    try:
+        cache_from_url(cache).generation("responses")
+    except Exception as e:
+        print(f"Fout bij openen gedeelde cache {cache}: {e}", file=sys.stderr)
+        return 1
+    return supervise([args.port + i for i in range(args.workers)], args.host, cache)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
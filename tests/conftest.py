@@ -0,0 +1,5 @@
+import os
+
+# Geen model of Azure nodig: de tests lezen alleen de agent definities
+os.environ.setdefault("MCAT_CHAT_CLIENT", "scripted")
+os.environ.setdefault("MCAT_AZURE_BACKEND", "inmemory")
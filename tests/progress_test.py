@@ -0,0 +1,54 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from agent_framework import FunctionInvocationContext
+from agent_framework._middleware import FunctionMiddlewarePipeline
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcat_agents.agents.helper_agent import helper_agent
+from mcat_agents.agents.knowledge_agent import knowledge_agent
+from mcat_agents.agents.network_agent import network_agent
+from mcat_agents.agents.resource_agent import resource_agent
+from mcat_agents.middleware import progress
+from mcat_agents.middleware.compaction import tool_result_compaction
+
+agents = [helper_agent, knowledge_agent, network_agent, resource_agent]
+
+
+def _progress_lines(middleware, result):
+    """Progress lines of one tool call that returns `result`, through the middleware in the agent's order."""
+
+    async def run():
+        channel = progress.ProgressChannel()
+        progress._channel.set(channel)
+        pipeline = FunctionMiddlewarePipeline(middleware)
+        context = FunctionInvocationContext(function=SimpleNamespace(name="get_nsg_rules"), arguments=None)
+
+        async def tool(_):
+            return result
+
+        await pipeline.execute(context.function, None, context, tool)
+        lines = []
+        while not channel.queue.empty():
+            lines.append(channel.queue.get_nowait().contents[0].text.strip())
+        return lines
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("agent", agents, ids=[agent.name for agent in agents])
+@pytest.mark.parametrize("length", range(20, 36))
+def test_error_result_is_reported_as_error(agent, length):
+    # Compactie maakt van een fout dict een JSON string zodra dat (geschat) tokens scheelt; dat hangt af van de lengte
+    middleware = [m for m in agent.middleware if m in (tool_result_compaction, progress.tool_progress_events)]
+    lines = _progress_lines(middleware, {"error": "x" * length})
+    assert lines[-1].startswith("✗ get_nsg_rules gaf een fout"), lines
+
+
+def test_result_is_reported_as_done():
+    lines = _progress_lines([tool_result_compaction, progress.tool_progress_events], {"rules": [{"name": "a", "id": None}]})
+    assert lines[-1].startswith("✓ get_nsg_rules klaar"), lines
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcat_agents.agents.router import Route, match_route
+
+
+@pytest.mark.parametrize("text, route", [
+    ("Draait VM-Rapportage?", Route("vm_status", "VM-Rapportage")),
+    ("Wat is de status van VM-Rapportage?", Route("vm_status", "VM-Rapportage")),
+    ("Staat VM Rapportage aan?", Route("vm_status", "VM-Rapportage")),
+    ("Is VM-Authenticatie nog online?", Route("vm_status", "VM-Authenticatie")),
+    ("What is the power state of VM-Klantregistratie?", Route("vm_status", "VM-Klantregistratie")),
+    ("Welke NSG hoort bij VM-Rapportage?", Route("vm_nsg", "VM-Rapportage")),
+    ("Welke regels heeft NSG-Authenticatie?", Route("nsg_rules", "NSG-Authenticatie")),
+    ("Welke VMs draaien?", Route("vm_power_states")),
+    ("Welke VMs zijn er?", Route("list_vms")),
+    ("Welke documenten zijn er?", Route("list_documents")),
+])
+def test_matches(text, route):
+    assert match_route(text) == route
+
+
+@pytest.mark.parametrize("text", [
+    # Een ander onderwerp dan de power state van de VM
+    "What is the status of the backup for VM-Rapportage?",
+    "Staat de firewall van VM-Rapportage aan?",
+    "Is de disk van VM-Rapportage online?",
+    "Wat is de status van de service op VM-Orderverwerking?",
+    "Draait de webserver op VM-Rapportage?",
+    # Wijzigingen en documenten
+    "Zet VM-Rapportage aan",
+    "Schakel VM-Rapportage uit",
+    "Is de rapportage over Q3 al uit?",
+    "Is er een document over VM-Rapportage status?",
+    "Welk beleid geldt voor VM-Rapportage?",
+    # Diagnose
+    "Waarom draait VM-Rapportage niet?",
+    "Kan ik via SSH bij VM-Authenticatie?",
+])
+def test_falls_through_to_the_llm(text):
+    assert match_route(text) is None
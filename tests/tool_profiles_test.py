@@ -0,0 +1,50 @@
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from mcat_agents.agents.knowledge_agent import knowledge_agent, knowledge_tool_profiles
+from mcat_agents.agents.network_agent import network_agent, network_tool_profiles
+from mcat_agents.agents.resource_agent import resource_agent, resource_tool_profiles
+
+agents = [
+    (knowledge_agent, knowledge_tool_profiles),
+    (network_agent, network_tool_profiles),
+    (resource_agent, resource_tool_profiles),
+]
+
+
+def _examples(agent):
+    """(question, tools the instructions prescribe for it) for every example in the agent's instructions."""
+    instructions = agent.chat_options.instructions
+    tool_names = [tool.name for tool in agent.chat_options.tools]
+    examples = []
+    # "- Helper vraagt: "..." → Gebruik tool_a, dan tool_b"
+    for question, answer in re.findall(r'Helper vraagt: "(.+?)" → (.+)', instructions):
+        examples.append((question, {name for name in tool_names if re.search(rf"\b{name}\b", answer)}))
+    # "Vraag: "..."" gevolgd door een genummerde workflow van tool aanroepen
+    for question, workflow in re.findall(r'Vraag: "(.+?)"\nAntwoord workflow:\n((?:\d+\..*\n)+)', instructions):
+        examples.append((question, set(re.findall(r"^\d+\. (\w+)\(", workflow, re.MULTILINE))))
+    return [(agent.name, question, tools) for question, tools in examples]
+
+
+cases = [case for agent, _ in agents for case in _examples(agent)]
+profiles_by_agent = {agent.name: profiles for agent, profiles in agents}
+
+
+def test_every_agent_has_examples():
+    assert {name for name, _, _ in cases} == set(profiles_by_agent)
+
+
+@pytest.mark.parametrize("agent_name, question, tools", cases, ids=[question for _, question, _ in cases])
+def test_example_gets_its_tools(agent_name, question, tools):
+    assert tools, f"Geen tools gevonden in het voorbeeld {question!r}"
+    matched = profiles_by_agent[agent_name].classify(question)
+    if not matched:
+        # Geen profiel: het model krijgt alle tools
+        return
+    selected = set().union(*(profile.tools for profile in matched))
+    assert tools <= selected, f"{[p.name for p in matched]} mist {sorted(tools - selected)}"